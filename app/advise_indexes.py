@@ -0,0 +1,174 @@
+"""
+Index advisor for the Heroku chat tables.
+
+Inspects pg_indexes / pg_stat_user_tables / pg_stats on the configured DB, compares
+them with the access paths of the analytics and accounts endpoints and prints the
+CREATE INDEX CONCURRENTLY DDL for the paths no index serves. With --apply the
+indexes are built (without blocking writes) and each endpoint is timed before and
+after, in-process through the ASGI app with auth bypassed.
+
+Usage:
+    uv run python -m app.advise_indexes [--url URL] [--apply] [--runs 5] [--account ID]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.database import (
+    dispose_heroku_engine,
+    get_live_heroku_engine,
+    init_heroku_engine,
+    init_local_db,
+)
+from app.dependencies import get_current_user
+from app.main import app
+from app.models.heroku import HChatSession
+from app.services import analytics_service, index_advisor
+from app.services.principal_cache import Principal
+from app.services.stats import percentile
+
+ENDPOINTS = [
+    "/analytics/sessions/series?bucket=day",
+    "/analytics/messages/series?bucket=day",
+    "/analytics/messages/by-sentiment/series?bucket=day",
+    "/analytics/sources/top",
+    "/accounts/{account}/sessions/count",
+    "/accounts/{account}/messages/count",
+    "/accounts/{account}/messages/by-sentiment",
+    "/accounts/{account}/sessions/series?bucket=day",
+    "/accounts/{account}/sessions",
+]
+
+
+async def busiest_account(conn) -> str:
+    """
+    The account with the most sessions in the analytics window (worst case per
+    account).
+    """
+    result = await conn.execute(
+        select(HChatSession.account_unique_id)
+        .where(HChatSession.start_time >= analytics_service.cutoff())
+        .group_by(HChatSession.account_unique_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    )
+    account = result.scalar_one_or_none()
+    if account is None:
+        sys.exit("No chat sessions in the analytics window; pass --account.")
+    return account
+
+
+async def time_endpoints(paths: List[str], runs: int) -> Dict[str, float]:
+    """Median latency (ms) of each endpoint over `runs` sequential requests."""
+    medians = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://advisor"
+    ) as client:
+        for path in paths:
+            latencies = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    print(f"  {path}: HTTP {response.status_code}")
+            medians[path] = percentile(latencies, 50) * 1000
+    return medians
+
+
+def print_report(
+    stats: Dict[str, index_advisor.TableStats],
+    indexes: List[index_advisor.ExistingIndex],
+    recommendations: List[index_advisor.Recommendation],
+) -> None:
+    print("Tables:")
+    for s in stats.values():
+        print(
+            f"  {s.table}: ~{s.live_rows} rows, {s.seq_scans} seq scans "
+            f"({s.seq_rows_read} rows read), {s.index_scans} index scans"
+        )
+    print("Indexes:")
+    for index in indexes:
+        columns = ", ".join(index.columns)
+        print(f"  {index.table}.{index.name}: {index.method} ({columns})")
+    print("Access paths:")
+    for rec in recommendations:
+        columns = ", ".join(rec.path.columns)
+        status = f"served by {rec.covered_by}" if rec.covered_by else "MISSING"
+        print(f"  {rec.path.table} ({columns}) [{rec.path.used_by}]: {status}")
+    missing = [rec for rec in recommendations if not rec.covered_by]
+    if missing:
+        print("Recommended DDL:")
+        for rec in missing:
+            print(f"  {rec.ddl};")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Recommend indexes for the Heroku DB.")
+    parser.add_argument("--url", default=settings.database_url)
+    parser.add_argument(
+        "--apply", action="store_true", help="build the missing indexes"
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="requests per endpoint timing"
+    )
+    parser.add_argument(
+        "--account", help="account for /accounts/... (default: busiest)"
+    )
+    args = parser.parse_args()
+
+    if not args.url:
+        sys.exit("Pass --url or set DATABASE_URL.")
+
+    app.dependency_overrides[get_current_user] = lambda: Principal(
+        id=0, email="advisor@localhost", is_active=True, is_superuser=True
+    )
+    await init_local_db()
+    init_heroku_engine(args.url)
+    engine = get_live_heroku_engine(args.url)
+    try:
+        async with engine.connect() as conn:
+            stats = await index_advisor.table_stats(conn)
+            indexes = await index_advisor.existing_indexes(conn)
+            account = args.account or await busiest_account(conn)
+        recommendations = index_advisor.recommend(indexes, stats)
+        print_report(stats, indexes, recommendations)
+
+        paths = [path.format(account=account) for path in ENDPOINTS]
+        before = await time_endpoints(paths, args.runs)
+        missing = [rec for rec in recommendations if not rec.covered_by]
+        if not args.apply or not missing:
+            print("Endpoint latency (median ms):")
+            for path, ms in before.items():
+                print(f"  {path:<60} {ms:>9.1f}")
+            return
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for rec in missing:
+                started = time.monotonic()
+                print(f"Building {rec.name}...", flush=True)
+                await index_advisor.apply(conn, rec)
+                print(f"  done in {time.monotonic() - started:.1f}s")
+
+        after = await time_endpoints(paths, args.runs)
+        print(f"{'endpoint':<60} {'before ms':>9} {'after ms':>9} {'change':>7}")
+        for path in paths:
+            was, now = before[path], after[path]
+            change = (now - was) / was * 100 if was else 0.0
+            print(f"{path:<60} {was:>9.1f} {now:>9.1f} {change:>6.0f}%")
+    finally:
+        await dispose_heroku_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
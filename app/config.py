@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,15 +12,121 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Verified token -> user cache; bounds how long a user change can go unnoticed
+    # by other processes (this process invalidates on update/delete)
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_entries: int = 1024
+
+    # Password hashing: bcrypt runs in a bounded worker pool, never on the event loop.
+    # Changing bcrypt_rounds rehashes each user's password on their next login.
+    bcrypt_rounds: int = 12
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 32
+
+    # Login throttling (sliding window): attempts per client IP, failures per email
+    login_max_attempts_per_ip: int = 20
+    login_max_failures_per_email: int = 5
+    login_throttle_window_seconds: int = 300
 
     # Local SQLite (admin users)
     local_db_url: str = "sqlite+aiosqlite:///./local.db"
 
     # Heroku Postgres (optional; written by /db-connection/save)
     database_url: Optional[str] = None
+    # Optional read replicas (comma-separated Postgres URLs) for analytics/account reads
+    database_follower_urls: Optional[str] = None
+    database_follower_strategy: Literal["round_robin", "least_connections"] = (
+        "round_robin"
+    )
+    database_follower_max_lag_seconds: float = 30.0
+    database_follower_health_interval_seconds: float = 15.0
+    # Heroku engine connection pool (applies to the primary and each follower)
+    heroku_pool_size: int = 5
+    heroku_max_overflow: int = 10
+    heroku_pool_timeout_seconds: float = 30.0
+    # Reconnect connections older than this; Heroku/PgBouncer drop idle ones eventually
+    heroku_pool_recycle_seconds: int = 1800
+    # Test each connection on checkout (pessimistic) vs. rely on recycle (optimistic)
+    heroku_pool_pre_ping: bool = True
+    # On reconfiguration: connections opened on the new engine before it goes live, and
+    # how long the old engine may keep serving in-flight requests before it is disposed
+    heroku_pool_warm_connections: int = 2
+    heroku_pool_drain_timeout_seconds: float = 60.0
+    # asyncpg's per-connection prepared statement cache
+    heroku_statement_cache_size: int = 100
+    # Set when DATABASE_URL points at PgBouncer in transaction mode: prepared statements
+    # can't be reused across server connections there, so all statement caches are off
+    heroku_pgbouncer: bool = False
+    # Heroku DB health: /db-connection/status serves the last result for up to the TTL;
+    # a background heartbeat refreshes it and keeps a latency history
+    db_health_ttl_seconds: float = 15.0
+    db_health_interval_seconds: float = 10.0
+    db_health_history_size: int = 120
+    # Opt-in slow-query log for Heroku queries: statements over the threshold are
+    # logged, a sampled fraction also gets EXPLAIN (ANALYZE, BUFFERS); the last N
+    # are kept locally
+    slow_query_log_enabled: bool = False
+    slow_query_threshold_ms: float = 500.0
+    slow_query_explain_sample_rate: float = 0.1
+    slow_query_buffer_size: int = 500
 
     # Stripe (optional; needed for live customer/payment/invoice data)
     stripe_secret_key: Optional[str] = None
+    stripe_api_base: str = "https://api.stripe.com"
+    stripe_max_concurrency: int = 8
+    stripe_max_retries: int = 3
+    stripe_timeout_seconds: float = 10.0
+    # Signing secret of the Stripe webhook endpoint (enables POST /stripe/webhook)
+    stripe_webhook_secret: Optional[str] = None
+    # Without webhooks only the bulk sync refreshes the local mirror; a customer is
+    # then read from it for this long after its last sync, and live afterwards
+    stripe_mirror_max_age_seconds: int = 3600
+
+    # Stripe lookup cache: fresh for the per-type TTL, then served stale (while
+    # refreshing in the background) for up to stripe_cache_stale_seconds more.
+    stripe_cache_backend: Literal["memory", "sqlite"] = "memory"
+    stripe_cache_max_entries: int = 2048
+    stripe_cache_ttl_customer_seconds: int = 3600
+    stripe_cache_ttl_payment_methods_seconds: int = 900
+    stripe_cache_ttl_invoices_seconds: int = 300
+    stripe_cache_stale_seconds: int = 86400
+
+    # Raw data exports: rows fetched per server-side cursor batch
+    export_batch_size: int = 1000
+    # Parquet snapshots (app.export_parquet / POST /analytics/export/parquet)
+    parquet_export_dir: str = "./exports/parquet"
+    # Each run re-reads this window before the previous mark for rows that committed
+    # late with an earlier timestamp (rows already exported are skipped by key)
+    parquet_export_overlap_seconds: int = 3600
+
+    # Message search: local SQLite FTS5 index, refreshed in the background
+    search_index_batch_size: int = 2000
+    search_index_interval_seconds: float = 60.0
+    # Trailing window re-read on each refresh, for messages that commit late with an
+    # earlier timestamp than ones already indexed
+    search_index_overlap_seconds: float = 300.0
+
+    # Analytics rollups (daily pre-aggregates of Heroku chat data, stored locally)
+    analytics_rollup_backfill_days: int = 30
+    # Trailing complete days rolled up again on each refresh, for late-arriving rows
+    analytics_rollup_overlap_days: int = 2
+    # accuracy=approx counts: share of the table's blocks sampled (TABLESAMPLE SYSTEM);
+    # tables too small to yield this many sampled blocks are counted exactly instead
+    approx_count_sample_percent: float = 1.0
+    approx_count_min_sample_blocks: int = 100
+    # Alternative: Postgres materialized views of daily counts on the Heroku DB,
+    # refreshed in the background (needs CREATE/REFRESH rights there). Count
+    # endpoints fall back to live queries while the last refresh is older than the
+    # staleness limit.
+    analytics_matviews_enabled: bool = False
+    analytics_matview_refresh_interval_seconds: float = 300.0
+    analytics_matview_max_staleness_seconds: float = 900.0
+
+    @property
+    def follower_urls(self) -> List[str]:
+        urls = (self.database_follower_urls or "").split(",")
+        return [u.strip() for u in urls if u.strip()]
 
 
 settings = Settings()
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import re
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
 
+from sqlalchemy import make_url, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -10,7 +17,8 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase
 
-from app.config import settings
+from app.config import Settings, settings
+from app.services.metrics import TimedQueuePool, instrument_engine
 
 
 class Base(DeclarativeBase):
@@ -24,6 +32,7 @@ local_engine: AsyncEngine = create_async_engine(
     echo=False,
 )
 LocalSessionFactory = async_sessionmaker(local_engine, expire_on_commit=False)
+instrument_engine(local_engine, "local")
 
 
 async def init_local_db() -> None:
@@ -33,33 +42,337 @@ async def init_local_db() -> None:
 
 
 # --- On-demand Heroku Postgres engine factory ---
-def make_heroku_engine(url: str) -> AsyncEngine:
+def heroku_engine_options(config: Settings = settings) -> Dict[str, Any]:
+    """
+    create_async_engine() keyword arguments for the configured pool and
+    statement cache.
+    """
+    connect_args: Dict[str, Any] = {
+        "statement_cache_size": config.heroku_statement_cache_size
+    }
+    if config.heroku_pgbouncer:
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            # Unique names, so a statement never collides with one left on a shared
+            # server connection by another client
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        # Times each checkout's wait for a connection (db_pool_wait_seconds)
+        "poolclass": TimedQueuePool,
+        "pool_size": config.heroku_pool_size,
+        "max_overflow": config.heroku_max_overflow,
+        "pool_timeout": config.heroku_pool_timeout_seconds,
+        "pool_recycle": config.heroku_pool_recycle_seconds,
+        "pool_pre_ping": config.heroku_pool_pre_ping,
+        "connect_args": connect_args,
+    }
+
+
+def make_heroku_engine(url: str, config: Settings = settings) -> AsyncEngine:
     """Return an ephemeral asyncpg engine for a given Postgres URL."""
-    normalized = re.sub(r"^postgres(ql)?://", "postgresql+asyncpg://", url)
-    return create_async_engine(normalized, pool_pre_ping=True)
+    return create_async_engine(_normalize(url), **heroku_engine_options(config))
 
 
 # --- Persistent Heroku engine (set at startup, reused across requests) ---
+# Engines are reference-counted per session. Reconfiguring warms a new engine,
+# publishes it in one step, and disposes the old one only once its in-flight
+# sessions have finished.
+
+@dataclass(eq=False)
+class HerokuEngineHandle:
+    url: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    refs: int = 0
+    retired: bool = False
+    drained: asyncio.Event = field(default_factory=asyncio.Event)
+    drain_task: Optional[asyncio.Task] = None
+
+    def release(self) -> None:
+        self.refs -= 1
+        if self.retired and self.refs == 0:
+            self.drained.set()
+
+
 # Using a dict so init/dispose functions can mutate it without `global`.
-_heroku: dict = {"engine": None, "session_factory": None}
+# "engine"/"session_factory"/"url" mirror the published handle.
+_heroku: dict = {
+    "handle": None,
+    "engine": None,
+    "session_factory": None,
+    "url": None,
+    "draining": set(),
+}
+
+
+def _normalize(url: str) -> str:
+    return re.sub(r"^postgres(ql)?://", "postgresql+asyncpg://", url)
+
+
+def heroku_source_id(url: str) -> str:
+    """Stable identity of a Heroku DB (host:port/database, no credentials)."""
+    u = make_url(_normalize(url))
+    return f"{u.host}:{u.port}/{u.database}"
+
+
+def _make_handle(url: str, config: Settings) -> HerokuEngineHandle:
+    engine = make_heroku_engine(url, config)
+    instrument_engine(engine, "heroku")
+    return HerokuEngineHandle(
+        url=url,
+        engine=engine,
+        session_factory=async_sessionmaker(
+            engine, expire_on_commit=False, info={"source": heroku_source_id(url)}
+        ),
+    )
+
+
+def _publish(handle: Optional[HerokuEngineHandle]) -> Optional[HerokuEngineHandle]:
+    """
+    Make `handle` the active engine (no await, so atomic); returns the
+    previous one.
+    """
+    previous = _heroku["handle"]
+    _heroku["handle"] = handle
+    _heroku["engine"] = handle.engine if handle else None
+    _heroku["session_factory"] = handle.session_factory if handle else None
+    _heroku["url"] = handle.url if handle else None
+    return previous
 
 
-def init_heroku_engine(url: str) -> None:
+async def warm_engine(engine: AsyncEngine, connections: int) -> None:
+    """
+    Open `connections` pooled connections up front so first requests don't
+    pay for them.
+    """
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def _drain(handle: HerokuEngineHandle, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(handle.drained.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await handle.engine.dispose()
+        _heroku["draining"].discard(handle)
+
+
+def _retire(handle: HerokuEngineHandle, timeout: float) -> None:
+    handle.retired = True
+    if handle.refs == 0:
+        handle.drained.set()
+    handle.drain_task = asyncio.create_task(_drain(handle, timeout))
+    _heroku["draining"].add(handle)
+
+
+def init_heroku_engine(url: str, config: Settings = settings) -> None:
     """Create and store a persistent Heroku Postgres engine."""
-    engine = make_heroku_engine(url)
-    _heroku["engine"] = engine
-    _heroku["session_factory"] = async_sessionmaker(engine, expire_on_commit=False)
+    _publish(_make_handle(url, config))
+
+
+async def swap_heroku_engine(url: str, config: Settings = settings) -> None:
+    """
+    Replace the active engine without a gap: the new engine is warmed first (if that
+    fails the old one stays active and the error propagates), then published, and the
+    old one is disposed in the background once its sessions finish.
+    """
+    handle = _make_handle(url, config)
+    try:
+        warm = min(config.heroku_pool_warm_connections, config.heroku_pool_size)
+        await warm_engine(handle.engine, warm)
+    except BaseException:
+        await handle.engine.dispose()
+        raise
+    previous = _publish(handle)
+    if previous is not None:
+        _retire(previous, config.heroku_pool_drain_timeout_seconds)
 
 
 async def dispose_heroku_engine() -> None:
-    """Dispose the persistent Heroku engine on shutdown."""
-    engine: AsyncEngine | None = _heroku.get("engine")
-    if engine is not None:
-        await engine.dispose()
-        _heroku["engine"] = None
-        _heroku["session_factory"] = None
+    """Dispose the persistent Heroku engine (and any still draining) on shutdown."""
+    handle = _publish(None)
+    if handle is not None:
+        await handle.engine.dispose()
+    for draining in list(_heroku["draining"]):
+        # Cancelling skips the wait; _drain still disposes the engine
+        draining.drain_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await draining.drain_task
+
+
+@asynccontextmanager
+async def heroku_session() -> AsyncIterator[AsyncSession]:
+    """
+    A session on the active engine, holding a reference so a swap can't
+    dispose it.
+    """
+    handle: Optional[HerokuEngineHandle] = _heroku["handle"]
+    if handle is None:
+        raise RuntimeError("Heroku database not configured")
+    handle.refs += 1
+    try:
+        async with handle.session_factory() as session:
+            yield session
+    finally:
+        handle.release()
 
 
 def get_heroku_session_factory() -> async_sessionmaker | None:
     """Return the active Heroku session factory, or None if not configured."""
     return _heroku.get("session_factory")
+
+
+def get_heroku_url() -> Optional[str]:
+    """URL of the active Heroku engine, or None if not configured."""
+    return _heroku.get("url")
+
+
+def get_live_heroku_engine(url: str) -> Optional[AsyncEngine]:
+    """The active Heroku engine if it was created for `url`, else None."""
+    live_url = _heroku.get("url")
+    if live_url is None or _normalize(live_url) != _normalize(url):
+        return None
+    return _heroku.get("engine")
+
+
+# --- Heroku followers (read replicas for read-only analytics/account queries) ---
+
+@dataclass
+class HerokuFollower:
+    source: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    # Unhealthy until the first health check proves it reachable and caught up
+    healthy: bool = False
+    lag_seconds: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+
+_followers: dict = {"followers": [], "next": 0}
+
+# Replication lag in seconds (0 when run against a primary). A follower that has
+# replayed all the WAL it received is caught up, however long ago its last replayed
+# transaction was: on an idle primary the replay timestamp alone keeps growing.
+_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+def init_heroku_followers(urls: List[str], primary_url: Optional[str]) -> None:
+    """
+    Create an engine per follower URL. Sessions report the primary as their
+    source.
+    """
+    primary_source = heroku_source_id(primary_url) if primary_url else None
+    followers = []
+    for url in urls:
+        engine = make_heroku_engine(url)
+        instrument_engine(engine, "heroku_follower")
+        source = heroku_source_id(url)
+        followers.append(
+            HerokuFollower(
+                source=source,
+                engine=engine,
+                session_factory=async_sessionmaker(
+                    engine,
+                    expire_on_commit=False,
+                    info={"source": primary_source or source, "follower": source},
+                ),
+            )
+        )
+    _followers["followers"] = followers
+
+
+async def dispose_heroku_followers() -> None:
+    for follower in _followers["followers"]:
+        await follower.engine.dispose()
+    _followers["followers"] = []
+
+
+async def check_followers() -> None:
+    """Probe every follower once: reachable and within the allowed replication lag."""
+    for follower in _followers["followers"]:
+        try:
+            async with follower.engine.connect() as conn:
+                lag = float((await conn.execute(_LAG_SQL)).scalar() or 0)
+            follower.lag_seconds = lag
+            follower.healthy = lag <= settings.database_follower_max_lag_seconds
+            follower.last_error = None if follower.healthy else f"lag {lag:.1f}s"
+        except Exception as exc:
+            follower.healthy = False
+            follower.last_error = str(exc)
+        follower.last_checked = datetime.now(timezone.utc)
+
+
+async def follower_health_loop() -> None:
+    """
+    Background task (started in the app lifespan) that keeps follower health
+    current.
+    """
+    while True:
+        await check_followers()
+        await asyncio.sleep(settings.database_follower_health_interval_seconds)
+
+
+def get_heroku_read_session_factory() -> async_sessionmaker | None:
+    """
+    Session factory for read-only queries: a healthy follower if there is one
+    (round-robin or least checked-out connections), otherwise the primary.
+    """
+    healthy = [f for f in _followers["followers"] if f.healthy]
+    if not healthy:
+        return get_heroku_session_factory()
+    if settings.database_follower_strategy == "least_connections":
+        chosen = min(healthy, key=lambda f: f.engine.pool.checkedout())
+    else:
+        chosen = healthy[_followers["next"] % len(healthy)]
+        _followers["next"] += 1
+    return chosen.session_factory
+
+
+def _pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if fn is not None:
+            stats[name] = fn()
+    return stats
+
+
+def heroku_engine_stats() -> List[dict]:
+    """Per-engine role, health and connection pool metrics."""
+    stats = []
+    engine: AsyncEngine | None = _heroku.get("engine")
+    if engine is not None:
+        stats.append({"role": "primary", "healthy": True, **_pool_stats(engine)})
+    for handle in _heroku["draining"]:
+        stats.append({
+            "role": "draining",
+            "source": heroku_source_id(handle.url),
+            "healthy": True,
+            **_pool_stats(handle.engine),
+        })
+    for f in _followers["followers"]:
+        stats.append({
+            "role": "follower",
+            "source": f.source,
+            "healthy": f.healthy,
+            "lag_seconds": f.lag_seconds,
+            "last_checked": f.last_checked,
+            "last_error": f.last_error,
+            **_pool_stats(f.engine),
+        })
+    return stats
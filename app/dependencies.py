@@ -7,9 +7,14 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import LocalSessionFactory, get_heroku_session_factory
-from app.models.user import User
-from app.services.auth_service import decode_token
+from app.database import (
+    LocalSessionFactory,
+    get_heroku_read_session_factory,
+    get_heroku_session_factory,
+    heroku_session,
+)
+from app.services.auth_service import decode_token_claims
+from app.services.principal_cache import Principal, principal_cache
 from app.services.user_service import get_user_by_email
 
 bearer_scheme = HTTPBearer()
@@ -23,35 +28,72 @@ async def get_local_db() -> AsyncGenerator[AsyncSession, None]:
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: AsyncSession = Depends(get_local_db),
-) -> User:
+) -> Principal:
+    token = credentials.credentials
+    # Fast path: token verified recently, no JWT decode or DB lookup needed
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        email = decode_token(credentials.credentials)
-    except JWTError:
-        raise credentials_exception
+        email, expires_at = decode_token_claims(token)
+    except (JWTError, KeyError, TypeError, ValueError) as exc:
+        raise credentials_exception from exc
 
     user = await get_user_by_email(db, email)
     if user is None or not user.is_active:
         raise credentials_exception
-    return user
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+    )
+    principal_cache.set(token, principal, expires_at)
+    return principal
 
 
 async def get_heroku_db() -> AsyncGenerator[AsyncSession, None]:
-    factory = get_heroku_session_factory()
-    if factory is None:
+    if get_heroku_session_factory() is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Heroku database not configured. Use POST /db-connection/save to set it up.",
+            detail=(
+                "Heroku database not configured. "
+                "Use POST /db-connection/save to set it up."
+            ),
         )
-    async with factory() as session:
+    async with heroku_session() as session:
         yield session
 
 
-async def require_superuser(current_user: User = Depends(get_current_user)) -> User:
+async def get_heroku_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Like get_heroku_db, but routed to a healthy follower when one is configured."""
+    factory = get_heroku_read_session_factory()
+    if factory is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=(
+                "Heroku database not configured. "
+                "Use POST /db-connection/save to set it up."
+            ),
+        )
+    if factory is get_heroku_session_factory():
+        # No healthy follower: a reference-counted session on the primary
+        async with heroku_session() as session:
+            yield session
+    else:
+        async with factory() as session:
+            yield session
+
+
+async def require_superuser(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,65 @@
+"""
+Parquet export job: append new chat sessions and messages to the partitioned
+Parquet snapshot (by account and month) for offline analysis.
+
+Each run exports only the rows since the previous run's high-water mark; schedule it
+nightly. Requires the optional pyarrow dependency (`uv sync --extra parquet`).
+
+Usage:
+    uv run python -m app.export_parquet [--kind sessions|messages] [--out DIR] \
+        [--restart]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.database import LocalSessionFactory, init_local_db, make_heroku_engine
+from app.services.parquet_export import KINDS, ParquetUnavailable, run_export
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Append chat data to the Parquet snapshot."
+    )
+    parser.add_argument("--kind", choices=KINDS, action="append", dest="kinds")
+    parser.add_argument("--out", default=settings.parquet_export_dir)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="delete existing files and export everything",
+    )
+    args = parser.parse_args()
+
+    if not settings.database_url:
+        sys.exit("DATABASE_URL must be set.")
+
+    await init_local_db()
+    engine = make_heroku_engine(settings.database_url)
+    started = time.monotonic()
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as heroku_db:
+            async with LocalSessionFactory() as local_db:
+                results = await run_export(
+                    heroku_db, local_db, args.out, args.kinds or KINDS, args.restart
+                )
+    except ParquetUnavailable as exc:
+        sys.exit(str(exc))
+    finally:
+        await engine.dispose()
+
+    for result in results:
+        print(
+            f"{result.kind}: {result.rows} rows in {len(result.files)} files "
+            f"(through {result.exported_through.isoformat()})"
+        )
+    print(f"Done in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,38 @@
 from __future__ import annotations
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import settings
-from app.database import dispose_heroku_engine, init_heroku_engine, init_local_db
-from app.routers import accounts, analytics, auth, db_connection, users
+from app.database import (
+    LocalSessionFactory,
+    dispose_heroku_engine,
+    dispose_heroku_followers,
+    follower_health_loop,
+    init_heroku_engine,
+    init_heroku_followers,
+    init_local_db,
+    local_engine,
+)
+from app.routers import (
+    accounts,
+    analytics,
+    auth,
+    db_connection,
+    search,
+    stripe_webhooks,
+    users,
+)
+from app.services import matview_service, metrics, slow_query_log
+from app.services.auth_service import PasswordHasherBusy, shutdown_password_hasher
+from app.services.db_health import heartbeat_loop
+from app.services.search_service import index_loop
+from app.services.stripe_client import close_stripe_client, init_stripe_client
 
 
 @asynccontextmanager
@@ -18,9 +42,36 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # If DATABASE_URL is already configured, connect to Heroku DB immediately
     if settings.database_url:
         init_heroku_engine(settings.database_url)
+    # Opt-in slow-query log / EXPLAIN capture for every Heroku engine
+    if settings.slow_query_log_enabled:
+        slow_query_log.install(LocalSessionFactory, exclude=[local_engine])
+    # Read replicas for analytics/account reads, with a background lag/health check
+    follower_task = None
+    if settings.follower_urls:
+        init_heroku_followers(settings.follower_urls, settings.database_url)
+        follower_task = asyncio.create_task(follower_health_loop())
+    # Heroku reachability heartbeat (serves /db-connection/status from memory)
+    heartbeat_task = asyncio.create_task(heartbeat_loop())
+    # Incremental message search indexing into the local FTS5 table
+    search_index_task = asyncio.create_task(index_loop())
+    # Materialized-view analytics mode: create/refresh the views on the Heroku DB
+    matview_task = None
+    if settings.analytics_matviews_enabled:
+        matview_task = asyncio.create_task(matview_service.refresh_loop())
+    # Shared Stripe HTTP client (keep-alive pool), if a Stripe key is configured
+    init_stripe_client()
     yield
-    # Shutdown: release Heroku connection pool
+    # Shutdown: stop background checks, then release Heroku and Stripe connection pools
+    for task in (heartbeat_task, search_index_task, follower_task, matview_task):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await slow_query_log.flush()
+    await dispose_heroku_followers()
     await dispose_heroku_engine()
+    await close_stripe_client()
+    shutdown_password_hasher()
 
 
 app = FastAPI(
@@ -38,14 +89,37 @@ app.add_middleware(
     allow_headers=["*"],
     allow_private_network=True,
 )
+# Outermost, so latency includes CORS handling and every response is counted
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(
+    request: Request, exc: PasswordHasherBusy
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": "Too many concurrent password operations. Try again shortly."
+        },
+        headers={"Retry-After": "1"},
+    )
+
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(db_connection.router)
 app.include_router(analytics.router)
 app.include_router(accounts.router)
+app.include_router(stripe_webhooks.router)
+app.include_router(search.router)
 
 
 @app.get("/health", tags=["health"])
 async def health() -> dict:
     return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
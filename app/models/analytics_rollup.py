@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Date, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# Sentinel stored in place of a NULL sentiment so it can take part in the primary key.
+UNCLASSIFIED = ""
+
+
+class AnalyticsDailyRollup(Base):
+    """Per-day, per-account, per-sentiment session and message counts.
+
+    Only complete UTC days are stored; the current partial day is always read live.
+    """
+
+    __tablename__ = "analytics_daily_rollup"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    account_unique_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    sentiment: Mapped[str] = mapped_column(String(255), primary_key=True)
+    session_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    message_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class AnalyticsRollupState(Base):
+    """High-water marks of the rollup refresh, one row per Heroku source DB."""
+
+    __tablename__ = "analytics_rollup_state"
+
+    source: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # Exclusive upper bounds (UTC midnights) of what has been rolled up so far
+    sessions_through: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    messages_through: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    refreshed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
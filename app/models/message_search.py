@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DDL, DateTime, Integer, String, event
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+# Local full-text index of Heroku chat message text (SQLite FTS5). A virtual table
+# can't be declared as a model, so it is created and dropped alongside Base's tables.
+# Only message_text is tokenised; the other columns are stored for filtering/results.
+MESSAGE_SEARCH_TABLE = "message_search"
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {MESSAGE_SEARCH_TABLE} USING fts5("
+        "message_text, message_id UNINDEXED, chat_session_id UNINDEXED, "
+        "account_unique_id UNINDEXED, sender_type UNINDEXED, timestamp UNINDEXED, "
+        "tokenize = 'porter unicode61')"
+    ),
+)
+event.listen(
+    Base.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {MESSAGE_SEARCH_TABLE}")
+)
+
+
+class SearchIndexState(Base):
+    """High-water mark of the message search index, one row per Heroku source DB."""
+
+    __tablename__ = "search_index_state"
+
+    source: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # (timestamp, message_id) of the last indexed message; messages are indexed
+    # in that order
+    indexed_through: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    last_message_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    messages_indexed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    refreshed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class SearchIndexedMessage(Base):
+    """
+    Ids of the messages in the search index, so re-read messages aren't added
+    twice.
+    """
+
+    __tablename__ = "search_indexed_message"
+
+    message_id: Mapped[str] = mapped_column(String(255), primary_key=True)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class ParquetExportState(Base):
+    """
+    High-water mark of the Parquet export per Heroku source DB and dataset, so each
+    run only appends new rows.
+    """
+
+    __tablename__ = "parquet_export_state"
+
+    source: Mapped[str] = mapped_column(String(255), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # Exclusive upper bound of the last completed run (rows before this are exported)
+    exported_through: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    rows_exported: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class ParquetExportedKey(Base):
+    """
+    Primary keys of the rows exported within the overlap window before the mark.
+    Each run re-reads that window for rows that committed late with an earlier
+    timestamp, and skips the keys listed here; older keys are pruned.
+    """
+
+    __tablename__ = "parquet_exported_key"
+
+    source: Mapped[str] = mapped_column(String(255), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    row_key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # The row's time column value, to prune keys that left the window
+    row_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class SlowQuery(Base):
+    """
+    A Heroku statement that exceeded the slow-query threshold (ring buffer,
+    newest kept).
+    """
+
+    __tablename__ = "slow_query"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    recorded_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    # host:port/database the statement ran against (primary or follower)
+    source: Mapped[str] = mapped_column(String(255), nullable=False)
+    statement: Mapped[str] = mapped_column(Text, nullable=False)
+    # Types of the bound parameters, never their values (JSON)
+    parameter_shapes: Mapped[str] = mapped_column(Text, nullable=False)
+    duration_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    # EXPLAIN (ANALYZE, BUFFERS) output, for the sampled fraction only
+    plan: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import JSON, Float, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class StripeCacheEntry(Base):
+    """Persistent backing store for the Stripe lookup cache."""
+
+    __tablename__ = "stripe_cache"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[Any] = mapped_column(JSON, nullable=True)
+    stored_at: Mapped[float] = mapped_column(Float, nullable=False)
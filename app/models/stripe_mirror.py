@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import JSON, Boolean, DateTime, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class StripeMirrorObject(Base):
+    """Local copy of a Stripe customer, invoice or payment method.
+
+    `data` holds the Stripe object exactly as the API/webhook delivered it; the other
+    columns are extracted from it so a customer's objects can be read by one indexed
+    query.
+    """
+
+    __tablename__ = "stripe_mirror_objects"
+    __table_args__ = (Index("ix_stripe_mirror_customer", "customer_id", "object_type"),)
+
+    id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    object_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    customer_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # unix ts
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    data: Mapped[Any] = mapped_column(JSON, nullable=False)
+    # Stripe `created` of the event (or fetch time) that last wrote this row, so
+    # out-of-order webhook deliveries never overwrite newer data
+    source_ts: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+
+class StripeSyncCheckpoint(Base):
+    """Progress of the bulk Stripe sync job, so an interrupted run can resume."""
+
+    __tablename__ = "stripe_sync_checkpoint"
+
+    job: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # Highest HStripeSubscription.id whose customer has been fully synced
+    last_subscription_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    objects_synced: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class StripeMirrorBackfill(Base):
+    """Customers whose invoices and payment methods have all been mirrored.
+
+    Webhooks only deliver objects as they change, so a customer first seen through a
+    customer.* event has an incomplete mirror until the bulk sync has fetched it.
+    """
+
+    __tablename__ = "stripe_mirror_backfills"
+
+    customer_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    backfilled_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+
+class StripeSyncFailure(Base):
+    """Customers the bulk sync skipped because Stripe rejected them permanently (4xx).
+
+    A deleted customer answers 404 resource_missing on every run; the sync records it
+    here and moves on instead of retrying it forever. Cleared when a later run succeeds.
+    """
+
+    __tablename__ = "stripe_sync_failures"
+
+    customer_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    subscription_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    code: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    message: Mapped[str] = mapped_column(String(1024), nullable=False)
+    failed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
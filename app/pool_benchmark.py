@@ -0,0 +1,150 @@
+"""
+Load harness for the Heroku engine's pool/statement-cache settings.
+
+Fires concurrent requests at the analytics series endpoints (in-process, through
+the ASGI app, with auth bypassed) once per configuration, and reports request
+latency, how long checkouts waited for a pooled connection (the engine's
+TimedQueuePool) and how long each checkout held its connection. A wait p99 well above
+zero means pool_size + max_overflow is too small for the load; a near-zero one with a
+larger pool than needed leaves idle connections on the server.
+
+Point it at a local Postgres holding the Heroku schema, e.g.
+    docker run -e POSTGRES_PASSWORD=pw -p 5432:5432 postgres
+
+Usage:
+    uv run python -m app.pool_benchmark --url postgresql://postgres:pw@localhost/chat \\
+        --requests 500 --concurrency 50 \\
+        --config pool_size=5,max_overflow=10 --config pool_size=20,max_overflow=0 \\
+        --config pgbouncer=true,pool_pre_ping=false
+
+Each --config lists Settings overrides without the `heroku_` prefix; without any
+--config the current settings are measured.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from app.config import Settings, settings
+from app.database import _heroku, dispose_heroku_engine, init_heroku_engine
+from app.dependencies import get_current_user
+from app.main import app
+from app.services.metrics import listen_pool_timings
+from app.services.principal_cache import Principal
+from app.services.stats import percentile
+
+DEFAULT_PATHS = [
+    "/analytics/sessions/series?bucket=day",
+    "/analytics/messages/series?bucket=day",
+    "/analytics/messages/by-sentiment/series?bucket=day",
+]
+
+
+def parse_config(spec: str) -> Dict[str, str]:
+    """
+    'pool_size=5,max_overflow=0'
+        -> {'heroku_pool_size': '5', 'heroku_max_overflow': '0'}
+    """
+    overrides = {}
+    for pair in filter(None, spec.split(",")):
+        key, _, value = pair.partition("=")
+        overrides[f"heroku_{key.strip()}"] = value.strip()
+    return overrides
+
+
+async def measure(
+    url: str, config: Settings, paths: List[str], total: int, concurrency: int
+) -> Dict[str, float]:
+    """
+    Run `total` requests, `concurrency` at a time, against one engine
+    configuration.
+    """
+    init_heroku_engine(url, config)
+    waits: List[float] = []
+    holds: List[float] = []
+    latencies: List[float] = []
+    errors = 0
+    listen_pool_timings(
+        _heroku["engine"],
+        on_connect=lambda seconds: None,
+        on_hold=holds.append,
+        on_wait=waits.append,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client: httpx.AsyncClient, i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    try:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            await asyncio.gather(*(one(client, i) for i in range(total)))
+    finally:
+        await dispose_heroku_engine()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "wait_p50_ms": percentile(waits, 50) * 1000,
+        "wait_p99_ms": percentile(waits, 99) * 1000,
+        "hold_p99_ms": percentile(holds, 99) * 1000,
+        "errors": errors,
+        "rps": total / elapsed,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark Heroku pool configurations."
+    )
+    parser.add_argument("--url", default=settings.database_url)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--path", action="append", dest="paths", help="endpoint to hit")
+    parser.add_argument("--config", action="append", dest="configs", default=[])
+    args = parser.parse_args()
+
+    if not args.url:
+        sys.exit("Pass --url or set DATABASE_URL.")
+
+    app.dependency_overrides[get_current_user] = lambda: Principal(
+        id=0, email="benchmark@localhost", is_active=True, is_superuser=True
+    )
+    print(
+        f"{'config':<40} {'p50 ms':>8} {'p99 ms':>8} {'wait p50':>9} {'wait p99':>9} "
+        f"{'hold p99':>9} {'errors':>6} {'req/s':>7}"
+    )
+    for spec in args.configs or [""]:
+        config = Settings(**parse_config(spec))
+        result = await measure(
+            args.url,
+            config,
+            args.paths or DEFAULT_PATHS,
+            args.requests,
+            args.concurrency,
+        )
+        print(
+            f"{spec or '(current settings)':<40} {result['p50_ms']:>8.1f} "
+            f"{result['p99_ms']:>8.1f} {result['wait_p50_ms']:>9.1f} "
+            f"{result['wait_p99_ms']:>9.1f} {result['hold_p99_ms']:>9.1f} "
+            f"{result['errors']:>6} {result['rps']:>7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,23 +1,37 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timedelta, timezone
-from typing import Optional
-
-import stripe as stripe_lib
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, select
+import base64
+import json
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, func, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
-from app.dependencies import get_current_user, get_heroku_db
+from app.dependencies import get_current_user, get_heroku_read_db, get_local_db
 from app.models.heroku import HAccount, HChatMessage, HChatSession, HStripeSubscription
-from app.schemas.account_read import AccountListResponse, AccountRead
+from app.schemas.account_read import (
+    AccountListResponse,
+    AccountMetrics,
+    AccountOverviewResponse,
+    AccountRead,
+)
 from app.schemas.analytics import (
     CountResponse,
+    CountSeriesResponse,
     SentimentBreakdownResponse,
     SentimentCount,
+    SentimentSeriesResponse,
+    TopSourcesResponse,
+)
+from app.schemas.chat_session import (
+    ChatMessageRead,
+    ChatSessionListResponse,
+    ChatSessionRead,
+    TranscriptResponse,
 )
 from app.schemas.stripe_read import (
     AccountStripeResponse,
@@ -26,6 +40,16 @@ from app.schemas.stripe_read import (
     StripePaymentMethod,
     StripeSubscriptionRead,
 )
+from app.services import (
+    analytics_service,
+    export_service,
+    matview_service,
+    stripe_mirror_service,
+)
+from app.services.analytics_service import Accuracy, Bucket
+from app.services.export_service import ExportFormat, ExportKind
+from app.services.stripe_cache import CUSTOMER, INVOICES, PAYMENT_METHODS, stripe_cache
+from app.services.stripe_client import get_stripe_client
 
 router = APIRouter(
     prefix="/accounts",
@@ -34,10 +58,6 @@ router = APIRouter(
 )
 
 
-def _cutoff() -> datetime:
-    return datetime.now(timezone.utc) - timedelta(days=30)
-
-
 async def _get_account_or_404(account_unique_id: str, db: AsyncSession) -> HAccount:
     result = await db.execute(
         select(HAccount).where(HAccount.account_unique_id == account_unique_id)
@@ -48,6 +68,42 @@ async def _get_account_or_404(account_unique_id: str, db: AsyncSession) -> HAcco
     return account
 
 
+def _activity_by_sentiment(cutoff: datetime, account_ids: Optional[list[str]] = None):
+    """
+    Sessions started and messages sent since the cutoff, grouped by
+    (account_unique_id, initial_query_sentiment), in a single aggregate query.
+    A session belongs to exactly one sentiment, so per-group counts can be summed.
+    """
+    stmt = (
+        select(
+            HChatSession.account_unique_id,
+            HChatSession.initial_query_sentiment,
+            func.count(HChatSession.id.distinct()).filter(
+                HChatSession.start_time >= cutoff
+            ),
+            func.count(HChatMessage.message_id),
+        )
+        .select_from(HChatSession)
+        .outerjoin(
+            HChatMessage,
+            and_(
+                HChatMessage.chat_session_id == HChatSession.id,
+                HChatMessage.timestamp >= cutoff,
+            ),
+        )
+        .where(
+            or_(
+                HChatSession.start_time >= cutoff,
+                HChatMessage.message_id.is_not(None),
+            )
+        )
+        .group_by(HChatSession.account_unique_id, HChatSession.initial_query_sentiment)
+    )
+    if account_ids is not None:
+        stmt = stmt.where(HChatSession.account_unique_id.in_(account_ids))
+    return stmt
+
+
 # --- Stripe response helpers ---
 
 def _parse_customer(res: object) -> Optional[StripeCustomerRead]:
@@ -104,17 +160,191 @@ def _parse_invoices(res: object) -> list[StripeInvoice]:
         return []
 
 
+async def _fetch_stripe(
+    sub: Optional[HStripeSubscription],
+    local_db: AsyncSession,
+    invoice_limit: int = 10,
+    invoices_starting_after: Optional[str] = None,
+) -> AccountStripeResponse:
+    """
+    Build the Stripe response for a subscription row (or its absence).
+    Reads the webhook-fed local mirror first; the live API is only used on a miss.
+    """
+    if sub is None:
+        return AccountStripeResponse(
+            subscription=None, customer=None, payment_methods=[], invoices=[]
+        )
+
+    sub_read = StripeSubscriptionRead.model_validate(sub)
+    cid = sub.stripe_customer_id
+
+    mirrored = await stripe_mirror_service.read_customer(
+        local_db, cid, invoice_limit, invoices_starting_after
+    )
+    if mirrored is not None:
+        customer, payment_methods, invoices, has_more = mirrored
+        return AccountStripeResponse(
+            subscription=sub_read,
+            customer=_parse_customer(customer),
+            payment_methods=_parse_payment_methods({"data": payment_methods}),
+            invoices=_parse_invoices({"data": invoices}),
+            has_more_invoices=has_more,
+        )
+
+    # If Stripe isn't configured, return DB data only (no live API calls)
+    client = get_stripe_client()
+    if client is None:
+        return AccountStripeResponse(
+            subscription=sub_read, customer=None, payment_methods=[], invoices=[]
+        )
+
+    # Only the default first page of invoices is cached
+    if invoice_limit == 10 and invoices_starting_after is None:
+        invoices_call = stripe_cache.get_or_fetch(
+            cid, INVOICES, lambda: client.list_invoices(cid, limit=10)
+        )
+    else:
+        invoices_call = client.list_invoices(
+            cid, limit=invoice_limit, starting_after=invoices_starting_after
+        )
+
+    # Fetch customer, payment methods, and invoices concurrently (cached per customer)
+    customer_res, pm_res, invoices_res = await asyncio.gather(
+        stripe_cache.get_or_fetch(cid, CUSTOMER, lambda: client.retrieve_customer(cid)),
+        stripe_cache.get_or_fetch(
+            cid, PAYMENT_METHODS, lambda: client.list_payment_methods(cid)
+        ),
+        invoices_call,
+        return_exceptions=True,
+    )
+
+    return AccountStripeResponse(
+        subscription=sub_read,
+        customer=_parse_customer(customer_res),
+        payment_methods=_parse_payment_methods(pm_res),
+        invoices=_parse_invoices(invoices_res),
+        has_more_invoices=(
+            isinstance(invoices_res, dict) and bool(invoices_res.get("has_more"))
+        ),
+    )
+
+
 # --- Account listing ---
 
-@router.get("/", response_model=AccountListResponse)
-async def list_accounts(db: AsyncSession = Depends(get_heroku_db)):
-    """List all user accounts from the Heroku DB."""
-    result = await db.execute(select(HAccount).order_by(HAccount.account_organisation))
-    accounts = result.scalars().all()
-    return AccountListResponse(
-        accounts=[AccountRead.model_validate(a) for a in accounts],
-        total=len(accounts),
+# Columns that are always selected: the account identity and the keyset.
+_ACCOUNT_KEY_COLUMNS = ("id", "account_organisation", "account_unique_id")
+
+_ACCOUNT_SORTS = {
+    "organisation": (HAccount.account_organisation, HAccount.id),
+    "id": (HAccount.id,),
+}
+
+
+def _encode_cursor(sort: str, values: tuple) -> str:
+    raw = json.dumps([sort, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(sort: str, cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, *values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return values
+
+
+def _project_columns(fields: Optional[str]) -> list:
+    table = HAccount.__table__
+    if fields is None:
+        return list(table.columns)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in table.columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}"
+        )
+    names = list(_ACCOUNT_KEY_COLUMNS)
+    names += [f for f in requested if f not in _ACCOUNT_KEY_COLUMNS]
+    return [table.columns[name] for name in names]
+
+
+async def _attach_metrics(db: AsyncSession, accounts: list[AccountRead]) -> None:
+    result = await db.execute(
+        _activity_by_sentiment(
+            analytics_service.cutoff(), [a.account_unique_id for a in accounts]
+        )
     )
+    metrics: dict[str, AccountMetrics] = {}
+    top: dict[str, int] = {}
+    for account_unique_id, sentiment, sessions, messages in result.all():
+        m = metrics.setdefault(account_unique_id, AccountMetrics())
+        m.session_count += sessions
+        m.message_count += messages
+        # Dominant = classified sentiment with the most messages
+        if sentiment is not None and messages > top.get(account_unique_id, 0):
+            top[account_unique_id] = messages
+            m.dominant_sentiment = sentiment
+    for account in accounts:
+        account.metrics = metrics.get(account.account_unique_id, AccountMetrics())
+
+
+@router.get(
+    "/",
+    response_model=AccountListResponse,
+    response_model_exclude_unset=True,
+)
+async def list_accounts(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    sort: Literal["organisation", "-organisation", "id", "-id"] = "organisation",
+    search: Optional[str] = Query(None, description="Organisation name prefix"),
+    fields: Optional[str] = Query(None, description="Comma-separated account columns"),
+    include: Optional[Literal["metrics"]] = None,
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """
+    List user accounts from the Heroku DB, one keyset-paginated page at a time.
+    Only the requested columns are selected (id, organisation and unique id always are).
+    `total` counts every account matching the search, not just this page.
+    With include=metrics, each account in the page also carries its 30-day activity,
+    computed for the whole page by one grouped query.
+    """
+    keys = _ACCOUNT_SORTS[sort.lstrip("-")]
+    descending = sort.startswith("-")
+
+    stmt = select(*_project_columns(fields))
+    count_stmt = select(func.count()).select_from(HAccount)
+    if search:
+        matches = HAccount.account_organisation.istartswith(search, autoescape=True)
+        stmt = stmt.where(matches)
+        count_stmt = count_stmt.where(matches)
+    if cursor is not None:
+        values = _decode_cursor(sort, cursor)
+        if len(values) != len(keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        row_key, cursor_key = tuple_(*keys), tuple_(*values)
+        stmt = stmt.where(row_key < cursor_key if descending else row_key > cursor_key)
+    stmt = stmt.order_by(*(k.desc() if descending else k.asc() for k in keys))
+
+    # Fetch one extra row to learn whether another page follows
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = result.mappings().all()
+    page = rows[:limit]
+    accounts = [AccountRead(**row) for row in page]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(sort, tuple(last[k.key] for k in keys))
+
+    if include == "metrics" and accounts:
+        await _attach_metrics(db, accounts)
+
+    total = (await db.execute(count_stmt)).scalar_one()
+    return AccountListResponse(accounts=accounts, total=total, next_cursor=next_cursor)
 
 
 # --- Per-account analytics ---
@@ -122,16 +352,32 @@ async def list_accounts(db: AsyncSession = Depends(get_heroku_db)):
 @router.get("/{account_unique_id}/sessions/count", response_model=CountResponse)
 async def account_session_count(
     account_unique_id: str,
-    db: AsyncSession = Depends(get_heroku_db),
+    accuracy: Accuracy = "exact",
+    db: AsyncSession = Depends(get_heroku_read_db),
 ):
-    """Chat sessions for a specific account in the last 30 days."""
+    """
+    Chat sessions for a specific account in the last 30 days (approx: sampled
+    estimate).
+    """
     await _get_account_or_404(account_unique_id, db)
+    cutoff = analytics_service.cutoff()
+    if accuracy == "approx":
+        estimate = await analytics_service.approximate_count(
+            db, "sessions", cutoff, account_unique_id
+        )
+        if estimate is not None:
+            return CountResponse(
+                count=estimate[0], approximate=True, error_bound=estimate[1]
+            )
+    count = await matview_service.session_count(db, cutoff, account_unique_id)
+    if count is not None:
+        return CountResponse(count=count)
     result = await db.execute(
         select(func.count())
         .select_from(HChatSession)
         .where(
             HChatSession.account_unique_id == account_unique_id,
-            HChatSession.start_time >= _cutoff(),
+            HChatSession.start_time >= cutoff,
         )
     )
     return CountResponse(count=result.scalar_one())
@@ -140,17 +386,33 @@ async def account_session_count(
 @router.get("/{account_unique_id}/messages/count", response_model=CountResponse)
 async def account_message_count(
     account_unique_id: str,
-    db: AsyncSession = Depends(get_heroku_db),
+    accuracy: Accuracy = "exact",
+    db: AsyncSession = Depends(get_heroku_read_db),
 ):
-    """Chat messages for a specific account in the last 30 days."""
+    """
+    Chat messages for a specific account in the last 30 days (approx: sampled
+    estimate).
+    """
     await _get_account_or_404(account_unique_id, db)
+    cutoff = analytics_service.cutoff()
+    if accuracy == "approx":
+        estimate = await analytics_service.approximate_count(
+            db, "messages", cutoff, account_unique_id
+        )
+        if estimate is not None:
+            return CountResponse(
+                count=estimate[0], approximate=True, error_bound=estimate[1]
+            )
+    count = await matview_service.message_count(db, cutoff, account_unique_id)
+    if count is not None:
+        return CountResponse(count=count)
     result = await db.execute(
         select(func.count())
         .select_from(HChatMessage)
         .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
         .where(
             HChatSession.account_unique_id == account_unique_id,
-            HChatMessage.timestamp >= _cutoff(),
+            HChatMessage.timestamp >= cutoff,
         )
     )
     return CountResponse(count=result.scalar_one())
@@ -159,24 +421,236 @@ async def account_message_count(
 @router.get("/{account_unique_id}/messages/by-sentiment", response_model=SentimentBreakdownResponse)
 async def account_messages_by_sentiment(
     account_unique_id: str,
-    db: AsyncSession = Depends(get_heroku_db),
+    db: AsyncSession = Depends(get_heroku_read_db),
 ):
     """Message count by sentiment for a specific account, last 30 days."""
     await _get_account_or_404(account_unique_id, db)
+    cutoff = analytics_service.cutoff()
+    rows = await matview_service.messages_by_sentiment(db, cutoff, account_unique_id)
+    if rows is None:
+        result = await db.execute(
+            select(HChatSession.initial_query_sentiment, func.count(HChatMessage.message_id))
+            .select_from(HChatMessage)
+            .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+            .where(
+                HChatSession.account_unique_id == account_unique_id,
+                HChatMessage.timestamp >= cutoff,
+            )
+            .group_by(HChatSession.initial_query_sentiment)
+            .order_by(func.count(HChatMessage.message_id).desc())
+        )
+        rows = result.all()
+    sentiments = [SentimentCount(sentiment=row[0], count=row[1]) for row in rows]
+    return SentimentBreakdownResponse(sentiments=sentiments)
+
+
+# --- Per-account time series ---
+
+@router.get("/{account_unique_id}/sessions/series", response_model=CountSeriesResponse)
+async def account_session_series(
+    account_unique_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Chat sessions per hour/day/week for an account (default: last 30 days)."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    await _get_account_or_404(account_unique_id, db)
+    points = await analytics_service.session_series(
+        db, start, end, bucket, account_unique_id
+    )
+    return CountSeriesResponse.from_points(bucket, start, end, points)
+
+
+@router.get("/{account_unique_id}/messages/series", response_model=CountSeriesResponse)
+async def account_message_series(
+    account_unique_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Chat messages per hour/day/week for an account (default: last 30 days)."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    await _get_account_or_404(account_unique_id, db)
+    points = await analytics_service.message_series(
+        db, start, end, bucket, account_unique_id
+    )
+    return CountSeriesResponse.from_points(bucket, start, end, points)
+
+
+@router.get(
+    "/{account_unique_id}/messages/by-sentiment/series",
+    response_model=SentimentSeriesResponse,
+)
+async def account_sentiment_series(
+    account_unique_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Messages per bucket by initial_query_sentiment for an account."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    await _get_account_or_404(account_unique_id, db)
+    points = await analytics_service.sentiment_series(
+        db, start, end, bucket, account_unique_id
+    )
+    return SentimentSeriesResponse.from_points(bucket, start, end, points)
+
+
+@router.get("/{account_unique_id}/sources/top", response_model=TopSourcesResponse)
+async def account_top_sources(
+    account_unique_id: str,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Source files the bot cited most often in an account's conversations."""
+    start, end = analytics_service.resolve_window(start, end, "day")
+    await _get_account_or_404(account_unique_id, db)
+    rows = await analytics_service.top_sources(db, start, end, limit, account_unique_id)
+    return TopSourcesResponse.from_rows(start, end, rows)
+
+
+# --- Sessions and transcripts ---
+
+def _session_columns() -> list:
+    return [c for c in HChatSession.__table__.columns if c.key != "account_unique_id"]
+
+
+def _keyset_values(cursor: str, label: str) -> tuple:
+    values = _decode_cursor(label, cursor)
+    try:
+        timestamp, key = values
+        return datetime.fromisoformat(timestamp), key
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+@router.get(
+    "/{account_unique_id}/sessions",
+    response_model=ChatSessionListResponse,
+    response_model_exclude_unset=True,
+)
+async def list_account_sessions(
+    account_unique_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include: Optional[Literal["messages"]] = None,
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """
+    An account's chat sessions, newest first, keyset-paginated on (start_time, id).
+    With include=messages, the messages of every session on the page are loaded by a
+    single IN (...) query, ordered by timestamp.
+    """
+    await _get_account_or_404(account_unique_id, db)
+    stmt = select(*_session_columns()).where(
+        HChatSession.account_unique_id == account_unique_id
+    )
+    if cursor is not None:
+        start_time, session_id = _keyset_values(cursor, "sessions")
+        stmt = stmt.where(
+            tuple_(HChatSession.start_time, HChatSession.id)
+            < tuple_(start_time, session_id)
+        )
+    stmt = stmt.order_by(HChatSession.start_time.desc(), HChatSession.id.desc())
+
+    # Fetch one extra row to learn whether another page follows
+    rows = (await db.execute(stmt.limit(limit + 1))).mappings().all()
+    page = rows[:limit]
+    sessions = [ChatSessionRead(**row) for row in page]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(
+            "sessions", (last["start_time"].isoformat(), last["id"])
+        )
+
+    if include == "messages" and sessions:
+        by_session: dict[int, list[ChatMessageRead]] = {s.id: [] for s in sessions}
+        result = await db.execute(
+            select(HChatMessage)
+            .where(HChatMessage.chat_session_id.in_(list(by_session)))
+            .order_by(HChatMessage.timestamp, HChatMessage.message_id)
+        )
+        for message in result.scalars():
+            by_session[message.chat_session_id].append(ChatMessageRead.model_validate(message))
+        for session in sessions:
+            session.messages = by_session[session.id]
+
+    return ChatSessionListResponse(sessions=sessions, next_cursor=next_cursor)
+
+
+@router.get(
+    "/{account_unique_id}/sessions/{session_id}", response_model=TranscriptResponse
+)
+async def account_session_transcript(
+    account_unique_id: str,
+    session_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """
+    A session's transcript: the newest `limit` messages (oldest first). Long
+    conversations are loaded backwards a range at a time by passing next_before.
+    """
     result = await db.execute(
-        select(HChatSession.initial_query_sentiment, func.count(HChatMessage.message_id))
-        .select_from(HChatMessage)
-        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
-        .where(
+        select(*_session_columns()).where(
+            HChatSession.id == session_id,
             HChatSession.account_unique_id == account_unique_id,
-            HChatMessage.timestamp >= _cutoff(),
         )
-        .group_by(HChatSession.initial_query_sentiment)
-        .order_by(func.count(HChatMessage.message_id).desc())
     )
-    rows = result.all()
-    sentiments = [SentimentCount(sentiment=row[0], count=row[1]) for row in rows]
-    return SentimentBreakdownResponse(sentiments=sentiments)
+    row = result.mappings().one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    stmt = select(HChatMessage).where(HChatMessage.chat_session_id == session_id)
+    if before is not None:
+        timestamp, message_id = _keyset_values(before, "messages")
+        stmt = stmt.where(
+            tuple_(HChatMessage.timestamp, HChatMessage.message_id)
+            < tuple_(timestamp, message_id)
+        )
+    stmt = stmt.order_by(HChatMessage.timestamp.desc(), HChatMessage.message_id.desc())
+    messages = list((await db.execute(stmt.limit(limit + 1))).scalars())
+
+    next_before = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        oldest = messages[-1]
+        next_before = _encode_cursor(
+            "messages", (oldest.timestamp.isoformat(), oldest.message_id)
+        )
+    return TranscriptResponse(
+        session=ChatSessionRead(**row),
+        messages=[ChatMessageRead.model_validate(m) for m in reversed(messages)],
+        next_before=next_before,
+    )
+
+
+# --- Raw data export ---
+
+@router.get("/{account_unique_id}/export/{kind}")
+async def account_export(
+    account_unique_id: str,
+    kind: ExportKind,
+    format: ExportFormat = "ndjson",
+    gzip: bool = False,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """An account's chat sessions or messages in [from, to) as NDJSON or CSV."""
+    await _get_account_or_404(account_unique_id, db)
+    return export_service.export_response(
+        db, kind, format, gzip, start, end, account_unique_id
+    )
 
 
 # --- Stripe ---
@@ -184,7 +658,12 @@ async def account_messages_by_sentiment(
 @router.get("/{account_unique_id}/stripe", response_model=AccountStripeResponse)
 async def account_stripe_data(
     account_unique_id: str,
-    db: AsyncSession = Depends(get_heroku_db),
+    invoice_limit: int = Query(10, ge=1, le=100),
+    invoices_starting_after: Optional[str] = Query(
+        None, description="Last invoice id of the previous page"
+    ),
+    db: AsyncSession = Depends(get_heroku_read_db),
+    local_db: AsyncSession = Depends(get_local_db),
 ):
     """Subscription, payment method, and invoice data from Stripe for an account."""
     await _get_account_or_404(account_unique_id, db)
@@ -195,35 +674,61 @@ async def account_stripe_data(
             HStripeSubscription.account_unique_id == account_unique_id
         )
     )
-    sub = result.scalar_one_or_none()
+    return await _fetch_stripe(
+        result.scalar_one_or_none(), local_db, invoice_limit, invoices_starting_after
+    )
 
-    if sub is None:
-        return AccountStripeResponse(
-            subscription=None, customer=None, payment_methods=[], invoices=[]
-        )
 
-    sub_read = StripeSubscriptionRead.model_validate(sub)
+# --- Composite account overview ---
 
-    # If no Stripe key, return DB data only (no live API calls)
-    if not settings.stripe_secret_key:
-        return AccountStripeResponse(
-            subscription=sub_read, customer=None, payment_methods=[], invoices=[]
+@router.get("/{account_unique_id}/overview", response_model=AccountOverviewResponse)
+async def account_overview(
+    account_unique_id: str,
+    db: AsyncSession = Depends(get_heroku_read_db),
+    local_db: AsyncSession = Depends(get_local_db),
+):
+    """
+    Account, 30-day chat analytics and Stripe data in one call.
+    Replaces the separate sessions/messages/by-sentiment/stripe requests: the account
+    and its subscription are looked up together, all analytics come from a single
+    aggregate query, and the Stripe calls run while that query is in flight.
+    """
+    result = await db.execute(
+        select(HAccount, HStripeSubscription)
+        .outerjoin(
+            HStripeSubscription,
+            HStripeSubscription.account_unique_id == HAccount.account_unique_id,
         )
-
-    stripe_lib.api_key = settings.stripe_secret_key
-    cid = sub.stripe_customer_id
-
-    # Fetch customer, payment methods, and invoices concurrently
-    customer_res, pm_res, invoices_res = await asyncio.gather(
-        asyncio.to_thread(stripe_lib.Customer.retrieve, cid),
-        asyncio.to_thread(stripe_lib.PaymentMethod.list, customer=cid, type="card"),
-        asyncio.to_thread(stripe_lib.Invoice.list, customer=cid, limit=10),
-        return_exceptions=True,
+        .where(HAccount.account_unique_id == account_unique_id)
     )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    account, sub = row
 
-    return AccountStripeResponse(
-        subscription=sub_read,
-        customer=_parse_customer(customer_res),
-        payment_methods=_parse_payment_methods(pm_res),
-        invoices=_parse_invoices(invoices_res),
+    stripe_task = asyncio.create_task(_fetch_stripe(sub, local_db))
+    try:
+        result = await db.execute(
+            _activity_by_sentiment(analytics_service.cutoff(), [account_unique_id])
+        )
+        rows = result.all()
+    except BaseException:
+        stripe_task.cancel()
+        # Let the task unwind (it shares local_db) before the session is closed; the
+        # query's error is the one to report
+        with suppress(asyncio.CancelledError, Exception):
+            await stripe_task
+        raise
+
+    sentiments = [
+        SentimentCount(sentiment=sentiment, count=messages)
+        for _, sentiment, _, messages in sorted(rows, key=lambda r: r[3], reverse=True)
+        if messages
+    ]
+    return AccountOverviewResponse(
+        account=AccountRead.model_validate(account),
+        session_count=sum(sessions for _, _, sessions, _ in rows),
+        message_count=sum(messages for _, _, _, messages in rows),
+        sentiments=sentiments,
+        stripe=await stripe_task,
     )
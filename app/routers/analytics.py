@@ -1,18 +1,36 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_current_user, get_heroku_db
-from app.models.heroku import HChatMessage, HChatSession
+from app.database import LocalSessionFactory, get_heroku_read_session_factory
+from app.dependencies import (
+    get_current_user,
+    get_heroku_read_db,
+    get_local_db,
+    require_superuser,
+)
 from app.schemas.analytics import (
     CountResponse,
+    CountSeriesResponse,
+    ParquetExportResponse,
     SentimentBreakdownResponse,
     SentimentCount,
+    SentimentSeriesResponse,
+    TopSourcesResponse,
+)
+from app.services import (
+    analytics_service,
+    export_service,
+    matview_service,
+    parquet_export,
+    rollup_service,
 )
+from app.services.analytics_service import Accuracy, Bucket
+from app.services.export_service import ExportFormat, ExportKind
 
 router = APIRouter(
     prefix="/analytics",
@@ -21,43 +39,173 @@ router = APIRouter(
 )
 
 
-def _cutoff() -> datetime:
-    return datetime.now(timezone.utc) - timedelta(days=30)
-
+# Complete days are served from the local rollups (or, in materialized-view mode, from
+# the Heroku views while they are fresh); only the most recent day is read live.
 
 @router.get("/sessions/count", response_model=CountResponse)
-async def global_session_count(db: AsyncSession = Depends(get_heroku_db)):
-    """Total chat sessions started in the last 30 days."""
-    result = await db.execute(
-        select(func.count())
-        .select_from(HChatSession)
-        .where(HChatSession.start_time >= _cutoff())
-    )
-    return CountResponse(count=result.scalar_one())
+async def global_session_count(
+    accuracy: Accuracy = "exact",
+    db: AsyncSession = Depends(get_heroku_read_db),
+    local_db: AsyncSession = Depends(get_local_db),
+):
+    """
+    Total chat sessions started in the last 30 days (accuracy=approx: sampled
+    estimate).
+    """
+    cutoff = analytics_service.cutoff()
+    if accuracy == "approx":
+        estimate = await analytics_service.approximate_count(db, "sessions", cutoff)
+        if estimate is not None:
+            return CountResponse(
+                count=estimate[0], approximate=True, error_bound=estimate[1]
+            )
+    count = await matview_service.session_count(db, cutoff)
+    if count is None:
+        count = await rollup_service.session_count(db, local_db, cutoff)
+    return CountResponse(count=count)
 
 
 @router.get("/messages/count", response_model=CountResponse)
-async def global_message_count(db: AsyncSession = Depends(get_heroku_db)):
-    """Total chat messages sent in the last 30 days."""
-    result = await db.execute(
-        select(func.count())
-        .select_from(HChatMessage)
-        .where(HChatMessage.timestamp >= _cutoff())
-    )
-    return CountResponse(count=result.scalar_one())
+async def global_message_count(
+    accuracy: Accuracy = "exact",
+    db: AsyncSession = Depends(get_heroku_read_db),
+    local_db: AsyncSession = Depends(get_local_db),
+):
+    """
+    Total chat messages sent in the last 30 days (accuracy=approx: sampled
+    estimate).
+    """
+    cutoff = analytics_service.cutoff()
+    if accuracy == "approx":
+        estimate = await analytics_service.approximate_count(db, "messages", cutoff)
+        if estimate is not None:
+            return CountResponse(
+                count=estimate[0], approximate=True, error_bound=estimate[1]
+            )
+    count = await matview_service.message_count(db, cutoff)
+    if count is None:
+        count = await rollup_service.message_count(db, local_db, cutoff)
+    return CountResponse(count=count)
 
 
 @router.get("/messages/by-sentiment", response_model=SentimentBreakdownResponse)
-async def global_messages_by_sentiment(db: AsyncSession = Depends(get_heroku_db)):
+async def global_messages_by_sentiment(
+    db: AsyncSession = Depends(get_heroku_read_db),
+    local_db: AsyncSession = Depends(get_local_db),
+):
     """Message count broken down by the session's initial_query_sentiment, last 30 days."""
-    result = await db.execute(
-        select(HChatSession.initial_query_sentiment, func.count(HChatMessage.message_id))
-        .select_from(HChatMessage)
-        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
-        .where(HChatMessage.timestamp >= _cutoff())
-        .group_by(HChatSession.initial_query_sentiment)
-        .order_by(func.count(HChatMessage.message_id).desc())
-    )
-    rows = result.all()
+    cutoff = analytics_service.cutoff()
+    rows = await matview_service.messages_by_sentiment(db, cutoff)
+    if rows is None:
+        rows = await rollup_service.messages_by_sentiment(db, local_db, cutoff)
     sentiments = [SentimentCount(sentiment=row[0], count=row[1]) for row in rows]
     return SentimentBreakdownResponse(sentiments=sentiments)
+
+
+# --- Time series (one date_trunc + GROUP BY query each) ---
+
+@router.get("/sessions/series", response_model=CountSeriesResponse)
+async def global_session_series(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Chat sessions started per hour/day/week (default window: last 30 days)."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    points = await analytics_service.session_series(db, start, end, bucket)
+    return CountSeriesResponse.from_points(bucket, start, end, points)
+
+
+@router.get("/messages/series", response_model=CountSeriesResponse)
+async def global_message_series(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Chat messages sent per hour/day/week (default window: last 30 days)."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    points = await analytics_service.message_series(db, start, end, bucket)
+    return CountSeriesResponse.from_points(bucket, start, end, points)
+
+
+@router.get("/messages/by-sentiment/series", response_model=SentimentSeriesResponse)
+async def global_sentiment_series(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Bucket = "day",
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Messages per bucket broken down by the session's initial_query_sentiment."""
+    start, end = analytics_service.resolve_window(start, end, bucket)
+    points = await analytics_service.sentiment_series(db, start, end, bucket)
+    return SentimentSeriesResponse.from_points(bucket, start, end, points)
+
+
+# --- Source-file citations ---
+
+@router.get("/sources/top", response_model=TopSourcesResponse)
+async def global_top_sources(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """Most cited source files across all accounts (default window: last 30 days)."""
+    start, end = analytics_service.resolve_window(start, end, "day")
+    rows = await analytics_service.top_sources(db, start, end, limit)
+    return TopSourcesResponse.from_rows(start, end, rows)
+
+
+# --- Raw data export (streamed; memory use independent of row count) ---
+
+@router.post(
+    "/export/parquet",
+    response_model=ParquetExportResponse,
+    status_code=202,
+    dependencies=[Depends(require_superuser)],
+)
+async def parquet_export_run(restart: bool = False):
+    """
+    Start appending rows new since the last run to the Parquet snapshot, as a
+    background job (see app.export_parquet). Poll GET /analytics/export/parquet.
+    """
+    heroku_factory = get_heroku_read_session_factory()
+    if heroku_factory is None:
+        raise HTTPException(status_code=503, detail="Heroku database not configured")
+    try:
+        parquet_export.start_export_job(heroku_factory, LocalSessionFactory, restart)
+    except parquet_export.ParquetUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    except parquet_export.ExportAlreadyRunning as exc:
+        raise HTTPException(
+            status_code=409, detail="A Parquet export is already running"
+        ) from exc
+    return ParquetExportResponse.from_job(parquet_export.export_job())
+
+
+@router.get(
+    "/export/parquet",
+    response_model=ParquetExportResponse,
+    dependencies=[Depends(require_superuser)],
+)
+async def parquet_export_status():
+    """State of the latest Parquet export job."""
+    return ParquetExportResponse.from_job(parquet_export.export_job())
+
+
+@router.get("/export/{kind}")
+async def global_export(
+    kind: ExportKind,
+    format: ExportFormat = "ndjson",
+    gzip: bool = False,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_heroku_read_db),
+):
+    """
+    All chat sessions or messages in [from, to) as NDJSON or CSV, optionally
+    gzipped.
+    """
+    return export_service.export_response(db, kind, format, gzip, start, end)
@@ -1,37 +1,79 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.dependencies import get_current_user, get_local_db
-from app.models.user import User
 from app.schemas.auth import LoginRequest, TokenResponse
 from app.schemas.user import UserRead
-from app.services.auth_service import create_access_token, verify_password
-from app.services.user_service import get_user_by_email
+from app.services import login_throttle
+from app.services.auth_service import create_access_token, needs_rehash, verify_password
+from app.services.principal_cache import Principal
+from app.services.user_service import (
+    get_user_by_email,
+    get_user_by_id,
+    upgrade_password_hash,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(body: LoginRequest, db: AsyncSession = Depends(get_local_db)):
+async def login(
+    body: LoginRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_local_db),
+):
+    # Throttle before any bcrypt work so guessing can't saturate the hashing pool
+    ip = request.client.host if request.client else "unknown"
+    email = body.email.lower()
+    retry_after = max(
+        login_throttle.ip_limiter.retry_after(ip),
+        login_throttle.email_failure_limiter.retry_after(email),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    login_throttle.ip_limiter.hit(ip)
+
     user = await get_user_by_email(db, body.email)
-    if not user or not verify_password(body.password, user.hashed_password):
+    if not user or not await verify_password(body.password, user.hashed_password):
+        login_throttle.email_failure_limiter.hit(email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
+    login_throttle.email_failure_limiter.reset(email)
+
+    # Transparently move the stored hash to the configured cost factor
+    if needs_rehash(user.hashed_password):
+        await upgrade_password_hash(db, user, body.password)
+
     token = create_access_token(subject=user.email)
     return TokenResponse(access_token=token)
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(current_user: Principal = Depends(get_current_user)):
     # Stateless JWT logout: the client discards the token.
     # A server-side denylist can be added as a follow-up if needed.
     return None
 
 
 @router.get("/me", response_model=UserRead)
-async def me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def me(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_local_db),
+):
+    # The cached principal only carries auth fields; load the full profile
+    user = await get_user_by_id(db, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    return user
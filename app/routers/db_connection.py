@@ -1,16 +1,30 @@
 from __future__ import annotations
 
-from dotenv import dotenv_values
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import dispose_heroku_engine, init_heroku_engine
-from app.dependencies import require_superuser
+from app.config import settings
+from app.database import (
+    dispose_heroku_followers,
+    get_heroku_url,
+    heroku_engine_stats,
+    swap_heroku_engine,
+)
+from app.dependencies import get_local_db, require_superuser
 from app.schemas.db_connection import (
     DbConnectionRequest,
     DbConnectionStatus,
     DbConnectionTestResult,
+    EngineStatsResponse,
+    LatencyHistoryResponse,
+    LatencySample,
+    MatviewRefreshStatus,
+    MatviewStatusResponse,
+    SlowQueryOffender,
+    SlowQueryReport,
 )
-from app.services import db_connection_service
+from app.services import db_connection_service, matview_service, slow_query_log
+from app.services.db_health import db_health
 
 router = APIRouter(
     prefix="/db-connection",
@@ -33,9 +47,16 @@ async def save_db_connection(body: DbConnectionRequest):
     if not success:
         raise HTTPException(status_code=400, detail=message)
     await db_connection_service.save_connection_url(body.url)
-    # Hot-reload the persistent engine so analytics endpoints work immediately
-    await dispose_heroku_engine()
-    init_heroku_engine(body.url)
+    # Hot-swap the persistent engine: the new one is warmed before it goes live and
+    # the old one keeps serving in-flight requests until they finish
+    try:
+        await swap_heroku_engine(body.url)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=400, detail=f"Connection failed: {exc}"
+        ) from exc
+    # Configured followers replicate the previous database; reads go to the new primary
+    await dispose_heroku_followers()
     return DbConnectionTestResult(
         success=True,
         message="Connection verified, saved to .env, and active.",
@@ -46,15 +67,75 @@ async def save_db_connection(body: DbConnectionRequest):
 @router.get("/status", response_model=DbConnectionStatus)
 async def db_connection_status():
     """Check whether a DATABASE_URL is configured and the DB is currently reachable."""
-    env_values = dotenv_values(".env")
-    url = env_values.get("DATABASE_URL")
+    # The active engine's URL: set from DATABASE_URL at startup and by /save
+    url = get_heroku_url()
 
     if not url:
         return DbConnectionStatus(
             configured=False,
             reachable=False,
-            message="DATABASE_URL is not set in .env",
+            message="DATABASE_URL is not set",
         )
 
-    success, message, _ = await db_connection_service.test_connection(url)
-    return DbConnectionStatus(configured=True, reachable=success, message=message)
+    # Served from the heartbeat's last result while fresh; no new connection per poll
+    result = await db_health.status(url)
+    return DbConnectionStatus(
+        configured=True,
+        reachable=result.reachable,
+        message=result.message,
+        latency_ms=result.latency_ms,
+        checked_at=result.checked_at,
+    )
+
+
+@router.get("/latency", response_model=LatencyHistoryResponse)
+async def db_latency_history():
+    """Recent heartbeat checks of the active Heroku DB (connect + query latency)."""
+    return LatencyHistoryResponse(
+        samples=[
+            LatencySample(
+                checked_at=r.checked_at, reachable=r.reachable, latency_ms=r.latency_ms
+            )
+            for r in db_health.latency_history()
+        ]
+    )
+
+
+@router.get("/engines", response_model=EngineStatsResponse)
+async def db_engine_stats():
+    """Connection pool usage plus follower health and replication lag, per engine."""
+    return EngineStatsResponse(engines=heroku_engine_stats())
+
+
+@router.get("/slow-queries", response_model=SlowQueryReport)
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=100),
+    local_db: AsyncSession = Depends(get_local_db),
+):
+    """Heroku statements recorded over the slow-query threshold, slowest first."""
+    offenders = await slow_query_log.worst_offenders(local_db, limit)
+    return SlowQueryReport(
+        enabled=settings.slow_query_log_enabled,
+        threshold_ms=settings.slow_query_threshold_ms,
+        offenders=[SlowQueryOffender(**offender) for offender in offenders],
+    )
+
+
+@router.get("/matviews", response_model=MatviewStatusResponse)
+async def matview_status():
+    """Refresh timing and freshness of the analytics materialized views."""
+    return MatviewStatusResponse(
+        enabled=settings.analytics_matviews_enabled,
+        max_staleness_seconds=settings.analytics_matview_max_staleness_seconds,
+        views=[
+            MatviewRefreshStatus(
+                view=state.view,
+                fresh=matview_service.is_fresh(state),
+                refreshed_at=state.refreshed_at,
+                last_duration_ms=state.last_duration_ms,
+                refreshes=state.refreshes,
+                last_error=state.last_error,
+            )
+            for state in matview_service.refresh_states()
+        ],
+    )
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import get_current_user, get_local_db
+from app.schemas.search import SearchResponse, SearchResult
+from app.services import search_service
+
+router = APIRouter(
+    prefix="/search",
+    tags=["search"],
+    dependencies=[Depends(get_current_user)],
+)
+
+
+@router.get("/", response_model=SearchResponse)
+async def search_messages(
+    q: str = Query(
+        ...,
+        min_length=1,
+        description="Words to find; end a word with * for a prefix",
+    ),
+    account: Optional[str] = Query(
+        None, description="Restrict to one account_unique_id"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    local_db: AsyncSession = Depends(get_local_db),
+):
+    """
+    Chat messages containing every word of `q`, best match first, from the local
+    full-text index (Heroku is not queried). Paginate with next_cursor.
+    """
+    hits, next_cursor = await search_service.search(local_db, q, account, limit, cursor)
+    state = await search_service.index_state(local_db)
+    return SearchResponse(
+        results=[SearchResult(**vars(hit)) for hit in hits],
+        next_cursor=next_cursor,
+        indexed_through=state.indexed_through if state else None,
+    )
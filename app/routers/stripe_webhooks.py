@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.dependencies import get_local_db
+from app.services import stripe_mirror_service
+from app.services.stripe_cache import stripe_cache
+
+# Called by Stripe, not by users: authenticated by the webhook signature instead of a
+# JWT.
+router = APIRouter(prefix="/stripe", tags=["stripe"])
+
+
+@router.post("/webhook")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_local_db),
+):
+    """Mirror customer.*, invoice.* and payment_method.* events into the local DB."""
+    if not settings.stripe_webhook_secret:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Stripe webhooks not configured. Set STRIPE_WEBHOOK_SECRET.",
+        )
+    payload = await request.body()
+    try:
+        event = stripe_mirror_service.verify_webhook(
+            payload, stripe_signature, settings.stripe_webhook_secret
+        )
+    except stripe_mirror_service.InvalidWebhook as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid webhook: {exc}") from exc
+
+    customer_id = await stripe_mirror_service.apply_event(db, event)
+    if customer_id is not None:
+        # The mirror now has the newer copy; drop any cached live lookups
+        await stripe_cache.invalidate(customer_id)
+    return {"received": True}
@@ -4,23 +4,46 @@ from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
+from app.schemas.analytics import SentimentCount
+from app.schemas.stripe_read import AccountStripeResponse
+
+
+class AccountMetrics(BaseModel):
+    session_count: int = 0
+    message_count: int = 0
+    dominant_sentiment: Optional[str] = None  # classified sentiment with most messages
+
 
 class AccountRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
+    # Always returned; the remaining columns can be projected away with ?fields=
     id: int
     account_organisation: str
     account_unique_id: str
-    relevance_score: Optional[float]
-    k_value: Optional[int]
-    sources_returned: Optional[int]
-    temperature: Optional[float]
-    chunk_size: Optional[int]
-    chunk_overlap: Optional[int]
-    webhook_url: Optional[str]
-    opt_in_webhook_url: Optional[str]
+    relevance_score: Optional[float] = None
+    k_value: Optional[int] = None
+    sources_returned: Optional[int] = None
+    temperature: Optional[float] = None
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    webhook_url: Optional[str] = None
+    opt_in_webhook_url: Optional[str] = None
+    metrics: Optional[AccountMetrics] = None  # only with ?include=metrics
 
 
 class AccountListResponse(BaseModel):
     accounts: List[AccountRead]
-    total: int
+    total: int  # accounts matching the search, across all pages
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+class AccountOverviewResponse(BaseModel):
+    """Everything the account detail page needs, in one response."""
+
+    account: AccountRead
+    session_count: int
+    message_count: int
+    sentiments: List[SentimentCount]
+    stripe: AccountStripeResponse
+    period_days: int = 30
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -8,6 +9,9 @@ from pydantic import BaseModel
 class CountResponse(BaseModel):
     count: int
     period_days: int = 30
+    # accuracy=approx: count is an estimate, within ±error_bound at 95% confidence
+    approximate: bool = False
+    error_bound: Optional[int] = None
 
 
 class SentimentCount(BaseModel):
@@ -18,3 +22,125 @@ class SentimentCount(BaseModel):
 class SentimentBreakdownResponse(BaseModel):
     sentiments: List[SentimentCount]
     period_days: int = 30
+
+
+class SeriesPoint(BaseModel):
+    bucket_start: datetime
+    count: int
+
+
+class CountSeriesResponse(BaseModel):
+    bucket: Literal["hour", "day", "week"]
+    start: datetime
+    end: datetime
+    points: List[SeriesPoint]  # one per bucket, zero-filled
+
+    @classmethod
+    def from_points(
+        cls,
+        bucket: str,
+        start: datetime,
+        end: datetime,
+        points: List[Tuple[datetime, int]],
+    ) -> CountSeriesResponse:
+        return cls(
+            bucket=bucket,
+            start=start,
+            end=end,
+            points=[SeriesPoint(bucket_start=b, count=n) for b, n in points],
+        )
+
+
+class SentimentSeriesPoint(BaseModel):
+    bucket_start: datetime
+    sentiments: List[SentimentCount]
+
+
+class SentimentSeriesResponse(BaseModel):
+    bucket: Literal["hour", "day", "week"]
+    start: datetime
+    end: datetime
+    points: List[SentimentSeriesPoint]
+
+    @classmethod
+    def from_points(
+        cls,
+        bucket: str,
+        start: datetime,
+        end: datetime,
+        points: List[Tuple[datetime, Dict[Optional[str], int]]],
+    ) -> SentimentSeriesResponse:
+        return cls(
+            bucket=bucket,
+            start=start,
+            end=end,
+            points=[
+                SentimentSeriesPoint(
+                    bucket_start=b,
+                    sentiments=[
+                        SentimentCount(sentiment=s, count=n) for s, n in counts.items()
+                    ],
+                )
+                for b, counts in points
+            ],
+        )
+
+
+class ParquetExportResult(BaseModel):
+    kind: str
+    rows: int
+    files: List[str]
+    exported_through: datetime
+
+
+class ParquetExportResponse(BaseModel):
+    status: Literal["idle", "running", "succeeded", "failed"]
+    restart: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    results: List[ParquetExportResult]
+
+    @classmethod
+    def from_job(cls, job) -> ParquetExportResponse:
+        return cls(
+            status=job.status,
+            restart=job.restart,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            error=job.error,
+            results=[
+                ParquetExportResult(
+                    kind=r.kind,
+                    rows=r.rows,
+                    files=r.files,
+                    exported_through=r.exported_through,
+                )
+                for r in job.results
+            ],
+        )
+
+
+class SourceCitationCount(BaseModel):
+    source: str
+    citations: int
+    sessions: int
+
+
+class TopSourcesResponse(BaseModel):
+    start: datetime
+    end: datetime
+    sources: List[SourceCitationCount]
+
+    @classmethod
+    def from_rows(
+        cls, start: datetime, end: datetime, rows: List[Tuple[str, int, int]]
+    ) -> TopSourcesResponse:
+        return cls(
+            start=start,
+            end=end,
+            sources=[
+                SourceCitationCount(source=s, citations=c, sessions=n)
+                for s, c, n in rows
+            ],
+        )
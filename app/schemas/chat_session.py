@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ChatMessageRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    message_id: str
+    sender_type: str
+    message_text: str
+    timestamp: datetime
+    source_files: Optional[List[Any]] = None
+
+
+class ChatSessionRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    visitor_uuid: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    visitor_name: Optional[str] = None
+    visitor_email: Optional[str] = None
+    initial_query_sentiment: Optional[str] = None
+    initial_query_sentiment_explanation: Optional[str] = None
+    conversation_sentiment: Optional[str] = None
+    conversation_sentiment_explanation: Optional[str] = None
+    # Only with ?include=messages on the session list
+    messages: Optional[List[ChatMessageRead]] = None
+
+
+class ChatSessionListResponse(BaseModel):
+    sessions: List[ChatSessionRead]
+    next_cursor: Optional[str] = None
+
+
+class TranscriptResponse(BaseModel):
+    session: ChatSessionRead
+    # Oldest first; the newest `limit` messages before `before` (or the end)
+    messages: List[ChatMessageRead]
+    # Pass as ?before= to load the preceding, older messages
+    next_before: Optional[str] = None
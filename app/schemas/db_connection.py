@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Optional
+from datetime import datetime
+from typing import Any, List, Optional
 
 from pydantic import BaseModel
 
@@ -19,3 +20,65 @@ class DbConnectionStatus(BaseModel):
     configured: bool
     reachable: bool
     message: str
+    latency_ms: Optional[float] = None
+    checked_at: Optional[datetime] = None
+
+
+class LatencySample(BaseModel):
+    checked_at: datetime
+    reachable: bool
+    latency_ms: float
+
+
+class LatencyHistoryResponse(BaseModel):
+    samples: List[LatencySample]
+
+
+class EngineStats(BaseModel):
+    role: str
+    source: Optional[str] = None
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    last_error: Optional[str] = None
+    pool: str
+    size: Optional[int] = None
+    checkedin: Optional[int] = None
+    checkedout: Optional[int] = None
+    overflow: Optional[int] = None
+
+
+class EngineStatsResponse(BaseModel):
+    engines: List[EngineStats]
+
+
+class SlowQueryOffender(BaseModel):
+    statement: str
+    calls: int
+    max_ms: float
+    mean_ms: float
+    last_seen: datetime
+    source: str
+    parameter_shapes: Any
+    plan: Optional[str] = None
+
+
+class SlowQueryReport(BaseModel):
+    enabled: bool
+    threshold_ms: float
+    offenders: List[SlowQueryOffender]
+
+
+class MatviewRefreshStatus(BaseModel):
+    view: str
+    fresh: bool
+    refreshed_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    refreshes: int
+    last_error: Optional[str] = None
+
+
+class MatviewStatusResponse(BaseModel):
+    enabled: bool
+    max_staleness_seconds: float
+    views: List[MatviewRefreshStatus]
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    message_id: str
+    chat_session_id: int
+    account_unique_id: str
+    sender_type: str
+    timestamp: datetime
+    # Matching excerpt, matched terms wrapped in ** **
+    snippet: str
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    next_cursor: Optional[str] = None
+    # Messages up to this timestamp are searchable
+    indexed_through: Optional[datetime] = None
@@ -51,3 +51,4 @@ class AccountStripeResponse(BaseModel):
     customer: Optional[StripeCustomerRead]
     payment_methods: List[StripePaymentMethod]
     invoices: List[StripeInvoice]
+    has_more_invoices: bool = False  # page on with ?invoices_starting_after=<last id>
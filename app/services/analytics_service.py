@@ -0,0 +1,360 @@
+"""
+Shared analytics query helpers: the default reporting window, time-bucketed
+series, source-file citations and sampled (approximate) counts. Each series is one
+date_trunc + GROUP BY query against Heroku; empty buckets are zero-filled here
+rather than queried.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Literal, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    Text,
+    and_,
+    case,
+    cast,
+    func,
+    literal_column,
+    select,
+    tablesample,
+    text,
+    true,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.heroku import HChatMessage, HChatSession
+
+Bucket = Literal["hour", "day", "week"]
+Accuracy = Literal["exact", "approx"]
+CountKind = Literal["sessions", "messages"]
+
+PERIOD_DAYS = 30
+MAX_BUCKETS = 5000
+
+_BUCKET_STEP = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+
+def cutoff(days: int = PERIOD_DAYS) -> datetime:
+    """Start of the default reporting window (the last `days` days)."""
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def truncate(value: datetime, bucket: Bucket) -> datetime:
+    """Python twin of Postgres date_trunc in UTC (weeks start on Monday)."""
+    value = _as_utc(value).astimezone(timezone.utc)
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def resolve_window(
+    start: Optional[datetime], end: Optional[datetime], bucket: Bucket
+) -> Tuple[datetime, datetime]:
+    """
+    Default to the last 30 days, treat naive datetimes as UTC, and bound the
+    series size.
+    """
+    end = _as_utc(end) if end is not None else datetime.now(timezone.utc)
+    start = _as_utc(start) if start is not None else end - timedelta(days=PERIOD_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if (end - truncate(start, bucket)) / _BUCKET_STEP[bucket] > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too large for bucket={bucket} (max {MAX_BUCKETS} buckets)",
+        )
+    return start, end
+
+
+def bucket_starts(start: datetime, end: datetime, bucket: Bucket) -> List[datetime]:
+    """Every bucket start overlapping [start, end)."""
+    step = _BUCKET_STEP[bucket]
+    current = truncate(start, bucket)
+    starts = []
+    while current < end:
+        starts.append(current)
+        current += step
+    return starts
+
+
+def _bucket_expr(column, bucket: Bucket):
+    # Literals rather than bind params, so the SELECT and GROUP BY expressions match
+    return func.date_trunc(
+        literal_column(f"'{bucket}'"), func.timezone(literal_column("'UTC'"), column)
+    )
+
+
+async def session_series(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    bucket: Bucket,
+    account_unique_id: Optional[str] = None,
+) -> List[Tuple[datetime, int]]:
+    """Sessions started per bucket, zero-filled."""
+    b = _bucket_expr(HChatSession.start_time, bucket)
+    stmt = (
+        select(b, func.count())
+        .select_from(HChatSession)
+        .where(HChatSession.start_time >= start, HChatSession.start_time < end)
+        .group_by(b)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    result = await db.execute(stmt)
+    counts = {_as_utc(k): n for k, n in result.all()}
+    return [(s, counts.get(s, 0)) for s in bucket_starts(start, end, bucket)]
+
+
+async def message_series(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    bucket: Bucket,
+    account_unique_id: Optional[str] = None,
+) -> List[Tuple[datetime, int]]:
+    """Messages sent per bucket, zero-filled."""
+    b = _bucket_expr(HChatMessage.timestamp, bucket)
+    stmt = (
+        select(b, func.count())
+        .select_from(HChatMessage)
+        .where(HChatMessage.timestamp >= start, HChatMessage.timestamp < end)
+        .group_by(b)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.join(
+            HChatSession, HChatMessage.chat_session_id == HChatSession.id
+        ).where(HChatSession.account_unique_id == account_unique_id)
+    result = await db.execute(stmt)
+    counts = {_as_utc(k): n for k, n in result.all()}
+    return [(s, counts.get(s, 0)) for s in bucket_starts(start, end, bucket)]
+
+
+async def sentiment_series(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    bucket: Bucket,
+    account_unique_id: Optional[str] = None,
+) -> List[Tuple[datetime, Dict[Optional[str], int]]]:
+    """
+    Messages per bucket broken down by the session's initial_query_sentiment.
+    Every bucket lists every sentiment seen in the range (zero-filled).
+    """
+    b = _bucket_expr(HChatMessage.timestamp, bucket)
+    stmt = (
+        select(
+            b,
+            HChatSession.initial_query_sentiment,
+            func.count(HChatMessage.message_id),
+        )
+        .select_from(HChatMessage)
+        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+        .where(HChatMessage.timestamp >= start, HChatMessage.timestamp < end)
+        .group_by(b, HChatSession.initial_query_sentiment)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    result = await db.execute(stmt)
+
+    counts: Dict[Tuple[datetime, Optional[str]], int] = {}
+    sentiments: Dict[Optional[str], int] = {}
+    for k, sentiment, n in result.all():
+        counts[(_as_utc(k), sentiment)] = n
+        sentiments[sentiment] = sentiments.get(sentiment, 0) + n
+    # Most frequent sentiment first, as in the by-sentiment breakdowns
+    ordered = sorted(sentiments, key=lambda s: sentiments[s], reverse=True)
+    return [
+        (s, {sentiment: counts.get((s, sentiment), 0) for sentiment in ordered})
+        for s in bucket_starts(start, end, bucket)
+    ]
+
+
+# Keys tried, in order, to name a cited source stored as a JSON object
+_SOURCE_NAME_KEYS = ("file_name", "filename", "name", "source", "title", "url")
+
+
+def _literal(value: str):
+    return literal_column(f"'{value}'")
+
+
+def top_sources_statement(
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    account_unique_id: Optional[str] = None,
+):
+    """
+    Most cited source files in [start, end) as (source, citations, sessions), most
+    cited first. The source_files arrays are unnested and counted by Postgres in one
+    query (jsonb_array_elements); no message rows are loaded. Elements may be plain
+    strings or objects naming the file under one of _SOURCE_NAME_KEYS.
+    """
+    files = cast(HChatMessage.source_files, JSONB)
+    elements = (
+        func.jsonb_array_elements(
+            case(
+                (func.jsonb_typeof(files) == _literal("array"), files),
+                else_=literal_column("'[]'::jsonb"),
+            )
+        )
+        .table_valued("value")
+        .alias("cited")
+    )
+    element = elements.c.value
+    # Literals rather than bind params, so the SELECT and GROUP BY expressions match
+    source = case(
+        (
+            func.jsonb_typeof(element) == _literal("string"),
+            element.op("#>>")(_literal("{}")),
+        ),
+        (
+            func.jsonb_typeof(element) == _literal("object"),
+            func.coalesce(
+                *(element.op("->>")(_literal(key)) for key in _SOURCE_NAME_KEYS),
+                cast(element, Text),
+            ),
+        ),
+        else_=cast(element, Text),
+    )
+    stmt = (
+        select(source, func.count(), func.count(HChatSession.id.distinct()))
+        .select_from(HChatMessage)
+        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+        .join(elements, true())
+        .where(
+            HChatMessage.timestamp >= start,
+            HChatMessage.timestamp < end,
+            HChatMessage.source_files.is_not(None),
+        )
+        .group_by(source)
+        .order_by(func.count().desc(), source)
+        .limit(limit)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    return stmt
+
+
+async def top_sources(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    limit: int = 10,
+    account_unique_id: Optional[str] = None,
+) -> List[Tuple[str, int, int]]:
+    """Run top_sources_statement: (source, citations, sessions), most cited first."""
+    result = await db.execute(
+        top_sources_statement(start, end, limit, account_unique_id)
+    )
+    return [(name, citations, sessions) for name, citations, sessions in result.all()]
+
+
+# --- Approximate counts (TABLESAMPLE) ---
+
+# Two-sided 95% normal quantile, for the error bound of sampled counts
+_Z95 = 1.96
+
+_TABLE_BLOCKS = text(
+    "SELECT pg_relation_size(CAST(:table AS regclass)) "
+    "/ current_setting('block_size')::int"
+)
+
+
+def sampled_total(
+    block_counts: List[int], total_blocks: int, sampled_blocks: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Estimate a table-wide count from the matching-row counts of a sample of its blocks
+    (TABLESAMPLE SYSTEM is a simple random sample of blocks, i.e. cluster sampling).
+    `sampled_blocks` is the size of the sample when it is larger than `block_counts`:
+    sampled blocks holding no rows at all yield no group, and count as zero here.
+    Returns (estimate, half-width of the 95% confidence interval).
+    """
+    missing = max((sampled_blocks or 0) - len(block_counts), 0)
+    block_counts = list(block_counts) + [0] * missing
+    sampled = len(block_counts)
+    total_blocks = max(total_blocks, sampled)
+    mean = sum(block_counts) / sampled
+    variance = sum((y - mean) ** 2 for y in block_counts) / (sampled - 1)
+    # Finite population correction: sampling most blocks leaves little uncertainty
+    fpc = 1 - sampled / total_blocks
+    std_error = total_blocks * math.sqrt(fpc * variance / sampled)
+    return round(total_blocks * mean), math.ceil(_Z95 * std_error)
+
+
+def sampled_count_statement(
+    kind: CountKind,
+    since: datetime,
+    percent: float,
+    account_unique_id: Optional[str] = None,
+):
+    """
+    Per-block counts of rows since `since` in a `percent` TABLESAMPLE SYSTEM sample of
+    the sessions or messages table. Every sampled block with a row in it is returned
+    (FILTER rather than WHERE), so blocks without a match count as zero; sampled blocks
+    with no rows at all (empty, or only dead tuples) are missing and must be padded.
+    """
+    method = func.system(literal_column(f"{percent:g}"))
+    if kind == "sessions":
+        sampled = tablesample(HChatSession.__table__, method, name="sampled")
+        source = sampled
+        match = sampled.c.start_time >= since
+        if account_unique_id is not None:
+            match = and_(match, sampled.c.account_unique_id == account_unique_id)
+    else:
+        sampled = tablesample(HChatMessage.__table__, method, name="sampled")
+        source = sampled
+        match = sampled.c.timestamp >= since
+        if account_unique_id is not None:
+            source = sampled.outerjoin(
+                HChatSession, sampled.c.chat_session_id == HChatSession.id
+            )
+            match = and_(match, HChatSession.account_unique_id == account_unique_id)
+    # Block number of each row's physical location
+    block = literal_column("(sampled.ctid::text::point)[0]")
+    return select(block, func.count().filter(match)).select_from(source).group_by(block)
+
+
+async def approximate_count(
+    db: AsyncSession,
+    kind: CountKind,
+    since: datetime,
+    account_unique_id: Optional[str] = None,
+) -> Optional[Tuple[int, int]]:
+    """
+    (estimate, 95% error bound) of the rows since `since`, from a block sample.
+    None where sampling doesn't apply (not Postgres, or a table small enough that the
+    sample would be too few blocks to bound the error); callers count exactly then.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return None
+    model = HChatSession if kind == "sessions" else HChatMessage
+    table = model.__tablename__
+    total_blocks = (await db.execute(_TABLE_BLOCKS, {"table": table})).scalar_one()
+    percent = settings.approx_count_sample_percent
+    # Expected sample size: SYSTEM sampling includes each block with probability percent
+    sampled_blocks = round(total_blocks * percent / 100)
+    if sampled_blocks < max(settings.approx_count_min_sample_blocks, 2):
+        return None
+    result = await db.execute(
+        sampled_count_statement(kind, since, percent, account_unique_id)
+    )
+    block_counts = [count for _, count in result.all()]
+    return sampled_total(block_counts, total_blocks, sampled_blocks)
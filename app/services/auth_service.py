@@ -1,22 +1,92 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Optional, Tuple, TypeVar
 
 import bcrypt
 from jose import JWTError, jwt
 
 from app.config import settings
+from app.services.metrics import password_hash_duration
 
+T = TypeVar("T")
 
-def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
 
+class PasswordHasherBusy(Exception):
+    """Too many password hashing jobs are already queued."""
 
-def verify_password(plain: str, hashed: str) -> bool:
+
+# --- Password hashing (bcrypt, off the event loop) ---
+# Top-level functions so they can be pickled into a process pool.
+
+def _hashpw(plain: str, rounds: int) -> str:
+    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _checkpw(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+# Using a dict so the executor can be created lazily and shut down without `global`.
+_hasher: dict = {"executor": None, "pending": 0}
+
+
+def _get_executor() -> Executor:
+    executor = _hasher["executor"]
+    if executor is None:
+        if settings.password_hash_executor == "process":
+            executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+            )
+        _hasher["executor"] = executor
+    return executor
+
+
+async def _run_hasher(operation: str, fn: Callable[..., T], *args) -> T:
+    # Reject rather than queue without bound: a login burst must not build a backlog
+    # that every later hash has to wait behind.
+    capacity = settings.password_hash_workers + settings.password_hash_max_queue
+    if _hasher["pending"] >= capacity:
+        raise PasswordHasherBusy()
+    _hasher["pending"] += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _hasher["pending"] -= 1
+        password_hash_duration.observe(time.perf_counter() - started, operation)
+
+
+def shutdown_password_hasher() -> None:
+    """Stop the hashing workers (called on app shutdown)."""
+    executor = _hasher["executor"]
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        _hasher["executor"] = None
+
+
+async def hash_password(plain: str) -> str:
+    return await _run_hasher("hash", _hashpw, plain, settings.bcrypt_rounds)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _run_hasher("verify", _checkpw, plain, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True if the hash was made with a different cost factor than configured."""
+    try:
+        return int(hashed.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return False
+
+
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
     now = datetime.now(timezone.utc)
     expire = now + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
@@ -24,10 +94,10 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
     return jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
 
 
-def decode_token(token: str) -> str:
-    """Decode a JWT and return the subject (user email). Raises JWTError if invalid."""
+def decode_token_claims(token: str) -> Tuple[str, float]:
+    """Decode a JWT into (subject, expiry unix time). Raises JWTError if invalid."""
     payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     sub: Optional[str] = payload.get("sub")
     if sub is None:
         raise JWTError("Subject missing from token")
-    return sub
+    return sub, float(payload["exp"])
@@ -4,18 +4,21 @@ from typing import Optional, Tuple
 
 from sqlalchemy import text
 
-from app.database import make_heroku_engine
+from app.database import get_live_heroku_engine, make_heroku_engine
 
 
 async def test_connection(url: str) -> Tuple[bool, str, Optional[str]]:
     """
     Test a Postgres connection URL. Returns (success, message, server_version).
-    The engine is disposed immediately after the test.
+    The live Heroku engine's pool is used when `url` is the active one; otherwise a
+    throwaway engine is created and disposed immediately after the test.
     """
     engine = None
     try:
-        engine = make_heroku_engine(url)
-        async with engine.connect() as conn:
+        live = get_live_heroku_engine(url)
+        if live is None:
+            engine = make_heroku_engine(url)
+        async with (live or engine).connect() as conn:
             result = await conn.execute(text("SELECT version()"))
             version: Optional[str] = result.scalar()
         return True, "Connection successful", version
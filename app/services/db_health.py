@@ -0,0 +1,100 @@
+"""
+Heroku DB reachability, served from memory.
+
+A background heartbeat checks the active URL through the live engine's pool at a
+fixed interval and records the connect + query latency. /db-connection/status reads
+the last result; only when it is older than the TTL (or for a different URL) is a
+check run on demand, shared by concurrent callers.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from app.config import settings
+from app.database import get_heroku_url
+from app.services import db_connection_service
+
+
+@dataclass
+class HealthResult:
+    url: str
+    reachable: bool
+    message: str
+    server_version: Optional[str]
+    latency_ms: float
+    checked_at: datetime
+    checked_monotonic: float
+
+
+class DbHealth:
+    def __init__(self, ttl_seconds: float, history_size: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.latest: Optional[HealthResult] = None
+        self.history: Deque[HealthResult] = deque(maxlen=history_size)
+        self._lock = asyncio.Lock()
+
+    async def check(self, url: str) -> HealthResult:
+        """Run one connection check now and record it."""
+        started = time.perf_counter()
+        success, message, version = await db_connection_service.test_connection(url)
+        result = HealthResult(
+            url=url,
+            reachable=success,
+            message=message,
+            server_version=version,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            checked_at=datetime.now(timezone.utc),
+            checked_monotonic=time.monotonic(),
+        )
+        self.latest = result
+        self.history.append(result)
+        return result
+
+    def _cached(self, url: str) -> Optional[HealthResult]:
+        latest = self.latest
+        if latest is None or latest.url != url:
+            return None
+        if time.monotonic() - latest.checked_monotonic >= self.ttl_seconds:
+            return None
+        return latest
+
+    async def status(self, url: str) -> HealthResult:
+        """
+        The last result for `url` if still within the TTL, otherwise a fresh
+        check.
+        """
+        cached = self._cached(url)
+        if cached is not None:
+            return cached
+        async with self._lock:
+            # Another caller may have refreshed it while we waited
+            return self._cached(url) or await self.check(url)
+
+    def latency_history(self) -> List[HealthResult]:
+        """Recorded checks of the active URL, oldest first."""
+        url = get_heroku_url()
+        return [r for r in self.history if r.url == url]
+
+    def clear(self) -> None:
+        self.latest = None
+        self.history.clear()
+
+
+db_health = DbHealth(
+    ttl_seconds=settings.db_health_ttl_seconds,
+    history_size=settings.db_health_history_size,
+)
+
+
+async def heartbeat_loop() -> None:
+    """Background task (started in the app lifespan) that keeps the status current."""
+    while True:
+        url = get_heroku_url()
+        if url:
+            await db_health.check(url)
+        await asyncio.sleep(settings.db_health_interval_seconds)
@@ -0,0 +1,146 @@
+"""
+Streaming export of raw chat sessions and messages as NDJSON or CSV.
+
+Rows are read through a server-side cursor (`AsyncSession.stream` with yield_per) in
+fixed-size batches, and each batch is encoded and sent before the next is fetched,
+so memory use does not grow with the size of the export. `source_files` is selected
+as the JSON text the database already holds and written out verbatim.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Literal, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, Text, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.heroku import HChatMessage, HChatSession
+from app.services.analytics_service import _as_utc
+
+ExportKind = Literal["messages", "sessions"]
+ExportFormat = Literal["ndjson", "csv"]
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Columns holding JSON text serialised by the database, emitted without re-parsing
+_RAW_JSON = {"source_files"}
+
+
+def export_statement(
+    kind: ExportKind,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    account_unique_id: Optional[str] = None,
+) -> Select:
+    """SELECT for one export, filtered to [start, end) and optionally one account."""
+    if kind == "sessions":
+        time_column = HChatSession.start_time
+        stmt = select(*HChatSession.__table__.columns).order_by(
+            HChatSession.start_time, HChatSession.id
+        )
+    else:
+        time_column = HChatMessage.timestamp
+        stmt = (
+            select(
+                HChatMessage.message_id,
+                HChatMessage.chat_session_id,
+                HChatSession.account_unique_id,
+                HChatMessage.sender_type,
+                HChatMessage.message_text,
+                HChatMessage.timestamp,
+                cast(HChatMessage.source_files, Text).label("source_files"),
+            )
+            .select_from(HChatMessage)
+            .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+            .order_by(HChatMessage.timestamp, HChatMessage.message_id)
+        )
+    if start is not None:
+        stmt = stmt.where(time_column >= start)
+    if end is not None:
+        stmt = stmt.where(time_column < end)
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    return stmt
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson(keys: List[str], rows: Sequence) -> str:
+    prefixes = [f"{json.dumps(key)}:" for key in keys]
+    raw = [key in _RAW_JSON for key in keys]
+    lines = []
+    for row in rows:
+        fields = [
+            prefix
+            + (value if is_raw and value is not None else json.dumps(_plain(value)))
+            for prefix, is_raw, value in zip(prefixes, raw, row)
+        ]
+        lines.append("{" + ",".join(fields) + "}\n")
+    return "".join(lines)
+
+
+def _csv(rows: Sequence) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_export(
+    db: AsyncSession,
+    stmt: Select,
+    fmt: ExportFormat,
+    gzip: bool = False,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Yield the encoded export one batch at a time (gzip-compressed if asked)."""
+    keys = list(stmt.selected_columns.keys())
+    # wbits=31: gzip container
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    if fmt == "csv":
+        yield encode(_csv([keys]))
+    result = await db.stream(
+        stmt.execution_options(yield_per=batch_size or settings.export_batch_size)
+    )
+    async for rows in result.partitions():
+        chunk = encode(_ndjson(keys, rows) if fmt == "ndjson" else _csv(rows))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def export_response(
+    db: AsyncSession,
+    kind: ExportKind,
+    fmt: ExportFormat,
+    gzip: bool,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    account_unique_id: Optional[str] = None,
+) -> StreamingResponse:
+    """StreamingResponse for an export download. Naive from/to are taken as UTC."""
+    start = _as_utc(start) if start is not None else None
+    end = _as_utc(end) if end is not None else None
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    stmt = export_statement(kind, start, end, account_unique_id)
+    filename = f"{kind}-{account_unique_id or 'all'}.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(db, stmt, fmt, gzip),
+        media_type="application/gzip" if gzip else _MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,259 @@
+"""
+Index advice for the Heroku chat tables.
+
+The HerokuBase models only index the foreign keys, but the analytics and accounts
+endpoints filter and page on time: chatsession.start_time (alone and per account)
+and chatmessage.timestamp (alone and per session), and the search index copies
+messages in (timestamp, message_id) keyset order. The existing indexes
+(pg_index) and table statistics (pg_stat_user_tables, pg_stats) of the configured
+DB are compared with those access paths, and CREATE INDEX CONCURRENTLY DDL is
+produced for the ones no index serves yet. INVALID indexes, left behind by an
+interrupted concurrent build, serve nothing and are rebuilt by apply().
+
+Used by the `app.advise_indexes` admin command.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+TABLES = ("chatsession", "chatmessage")
+
+# A time column is indexed with BRIN rather than a B-tree when the table is this large
+# and its rows are stored in (nearly) time order, i.e. it is append-only by time.
+BRIN_MIN_ROWS = 1_000_000
+BRIN_MIN_CORRELATION = 0.95
+
+
+@dataclass(frozen=True)
+class AccessPath:
+    table: str
+    columns: Tuple[str, ...]
+    used_by: str
+    # Range-only access (no ORDER BY on the index) may be served by a BRIN index
+    brin_candidate: bool = False
+
+
+ACCESS_PATHS = (
+    AccessPath(
+        "chatsession",
+        ("account_unique_id", "start_time", "id"),
+        "per-account session counts/series, /accounts/{id}/sessions keyset paging",
+    ),
+    AccessPath(
+        "chatsession",
+        ("start_time",),
+        "/analytics/sessions/* windows, rollups, exports",
+        brin_candidate=True,
+    ),
+    AccessPath(
+        "chatmessage",
+        ("chat_session_id", "timestamp", "message_id"),
+        "per-account message counts (via the session join), transcripts",
+    ),
+    AccessPath(
+        "chatmessage",
+        ("timestamp",),
+        "/analytics/messages/* windows, top sources, rollups, exports",
+        brin_candidate=True,
+    ),
+    AccessPath(
+        "chatmessage",
+        ("timestamp", "message_id"),
+        "search index refresh keyset paging",
+    ),
+)
+
+
+@dataclass
+class TableStats:
+    table: str
+    live_rows: int
+    seq_scans: int
+    seq_rows_read: int
+    index_scans: int
+    # pg_stats.correlation of each column (physical vs. logical order, -1..1)
+    correlation: Dict[str, float]
+
+
+@dataclass
+class ExistingIndex:
+    table: str
+    name: str
+    method: str
+    columns: Tuple[str, ...]
+
+
+@dataclass
+class Recommendation:
+    path: AccessPath
+    method: str
+    covered_by: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        suffix = "_brin" if self.method == "brin" else ""
+        return f"ix_{self.path.table}_{'_'.join(self.path.columns)}{suffix}"
+
+    @property
+    def ddl(self) -> str:
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.path.table} "
+            f"USING {self.method} ({', '.join(self.path.columns)})"
+        )
+
+
+_INDEXDEF = re.compile(r"USING (\w+) \((.*)\)")
+
+
+def parse_indexdef(table: str, name: str, indexdef: str) -> ExistingIndex:
+    """
+    'CREATE INDEX ix ON public.chatsession
+        USING btree (account_unique_id, start_time DESC)'
+    -> btree on (account_unique_id, start_time). Expression columns keep their
+    text.
+    """
+    match = _INDEXDEF.search(indexdef)
+    if match is None:
+        return ExistingIndex(table, name, "unknown", ())
+    method, column_list = match.groups()
+    # Drop a trailing INCLUDE (...) / WHERE ... clause; only key columns matter here
+    column_list = re.split(r"\)\s+(?:INCLUDE|WHERE)\b", column_list)[0]
+    columns = tuple(
+        part.strip().split()[0].strip('"')
+        for part in column_list.split(",")
+        if part.strip()
+    )
+    return ExistingIndex(table, name, method, columns)
+
+
+def _serves(index: ExistingIndex, path: AccessPath) -> bool:
+    if index.method == "brin":
+        # BRIN only narrows a range scan on its column; it can't order or seek
+        return path.brin_candidate and index.columns[:1] == path.columns
+    return (
+        index.method == "btree"
+        and index.columns[: len(path.columns)] == path.columns
+    )
+
+
+def recommend(
+    indexes: List[ExistingIndex], stats: Dict[str, TableStats]
+) -> List[Recommendation]:
+    """
+    One recommendation per access path; `covered_by` is set when nothing is
+    needed.
+    """
+    recommendations = []
+    for path in ACCESS_PATHS:
+        table_stats = stats.get(path.table)
+        method = "btree"
+        if (
+            path.brin_candidate
+            and table_stats is not None
+            and table_stats.live_rows >= BRIN_MIN_ROWS
+            and abs(table_stats.correlation.get(path.columns[0], 0.0))
+            >= BRIN_MIN_CORRELATION
+        ):
+            method = "brin"
+        covering = next(
+            (i.name for i in indexes if i.table == path.table and _serves(i, path)),
+            None,
+        )
+        recommendations.append(Recommendation(path, method, covered_by=covering))
+    # A missing B-tree that is a prefix of another missing one is served by the
+    # wider one
+    missing = [r for r in recommendations if not r.covered_by and r.method == "btree"]
+    for rec in sorted(missing, key=lambda r: len(r.path.columns), reverse=True):
+        rec.covered_by = next(
+            (
+                wider.name
+                for wider in missing
+                if wider is not rec
+                and not wider.covered_by
+                and wider.path.table == rec.path.table
+                and wider.path.columns[: len(rec.path.columns)] == rec.path.columns
+            ),
+            None,
+        )
+    return recommendations
+
+
+# --- Catalog inspection (Postgres only) ---
+
+# Valid indexes only: an INVALID one is never used by the planner
+_INDEXES_SQL = text(
+    "SELECT t.relname, c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+    "JOIN pg_class c ON c.oid = i.indexrelid "
+    "JOIN pg_class t ON t.oid = i.indrelid "
+    "JOIN pg_namespace n ON n.oid = t.relnamespace "
+    "WHERE n.nspname = current_schema() AND t.relname IN :tables AND i.indisvalid"
+).bindparams(bindparam("tables", expanding=True))
+
+_INDEX_VALID_SQL = text(
+    "SELECT i.indisvalid FROM pg_index i "
+    "JOIN pg_class c ON c.oid = i.indexrelid "
+    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = current_schema() AND c.relname = :name"
+)
+
+_TABLE_STATS_SQL = text(
+    "SELECT relname, n_live_tup, seq_scan, seq_tup_read, COALESCE(idx_scan, 0) "
+    "FROM pg_stat_user_tables "
+    "WHERE schemaname = current_schema() AND relname IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+_CORRELATION_SQL = text(
+    "SELECT tablename, attname, correlation FROM pg_stats "
+    "WHERE schemaname = current_schema() AND tablename IN :tables "
+    "AND correlation IS NOT NULL"
+).bindparams(bindparam("tables", expanding=True))
+
+
+async def existing_indexes(conn: AsyncConnection) -> List[ExistingIndex]:
+    result = await conn.execute(_INDEXES_SQL, {"tables": list(TABLES)})
+    return [parse_indexdef(*row) for row in result]
+
+
+async def table_stats(conn: AsyncConnection) -> Dict[str, TableStats]:
+    correlation: Dict[str, Dict[str, float]] = {}
+    for table, column, value in await conn.execute(
+        _CORRELATION_SQL, {"tables": list(TABLES)}
+    ):
+        correlation.setdefault(table, {})[column] = float(value)
+    stats = {}
+    for table, live, seq, seq_read, idx in await conn.execute(
+        _TABLE_STATS_SQL, {"tables": list(TABLES)}
+    ):
+        stats[table] = TableStats(
+            table=table,
+            live_rows=int(live),
+            seq_scans=int(seq),
+            seq_rows_read=int(seq_read),
+            index_scans=int(idx),
+            correlation=correlation.get(table, {}),
+        )
+    return stats
+
+
+async def apply(conn: AsyncConnection, recommendation: Recommendation) -> None:
+    """
+    Build one index without blocking writes. `conn` must be in AUTOCOMMIT mode
+    (CONCURRENTLY can't run in a transaction). A failed concurrent build leaves an
+    INVALID index behind, which is dropped so a later run can retry; one left by an
+    interrupted earlier run is dropped first, since IF NOT EXISTS would keep it.
+    """
+    name = recommendation.name
+    drop = text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    if (await conn.execute(_INDEX_VALID_SQL, {"name": name})).scalar() is False:
+        await conn.execute(drop)
+    try:
+        await conn.execute(text(recommendation.ddl))
+    except Exception:
+        await conn.execute(drop)
+        raise
+    await conn.execute(text(f"ANALYZE {recommendation.path.table}"))
@@ -0,0 +1,64 @@
+"""
+In-memory sliding-window throttling for /auth/login.
+
+Attempts are limited per client IP and failed attempts per email, and both checks
+run before any bcrypt work, so password guessing can't tie up the hashing pool.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from typing import Deque
+
+from app.config import settings
+
+
+class SlidingWindowLimiter:
+    def __init__(
+        self, limit: int, window_seconds: float, max_keys: int = 10_000
+    ) -> None:
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._hits: OrderedDict[str, Deque[float]] = OrderedDict()
+
+    def _window(self, key: str) -> Deque[float]:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        cutoff = time.monotonic() - self.window_seconds
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+        return hits
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may try again; 0 if it is under the limit."""
+        hits = self._window(key)
+        if len(hits) < self.limit:
+            return 0
+        return max(hits[0] + self.window_seconds - time.monotonic(), 0)
+
+    def hit(self, key: str) -> None:
+        self._window(key).append(time.monotonic())
+        self._hits.move_to_end(key)
+
+    def reset(self, key: str) -> None:
+        self._hits.pop(key, None)
+
+    def clear(self) -> None:
+        self._hits.clear()
+
+
+ip_limiter = SlidingWindowLimiter(
+    settings.login_max_attempts_per_ip, settings.login_throttle_window_seconds
+)
+email_failure_limiter = SlidingWindowLimiter(
+    settings.login_max_failures_per_email, settings.login_throttle_window_seconds
+)
+
+
+def clear() -> None:
+    ip_limiter.clear()
+    email_failure_limiter.clear()
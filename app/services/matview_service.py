@@ -0,0 +1,302 @@
+"""
+Materialized-view backed analytics counts (settings.analytics_matviews_enabled).
+
+An alternative to the local rollups: the service creates two Postgres materialized
+views on the Heroku DB, holding per-day, per-account, per-sentiment session and
+message counts for the reporting window, and refreshes them CONCURRENTLY (readers are
+never blocked) from a background task in the app lifespan. This needs a Heroku role
+allowed to CREATE and REFRESH, hence the opt-in.
+
+Every worker runs the refresh loop, but a refresh only happens under a Postgres
+advisory lock and when the view's last refresh (recorded in a small table beside the
+views) is at least a refresh interval old; other workers adopt that recorded time.
+
+Count endpoints read complete days from a view and count partial days (the cutoff's
+and the current one) live. While a view was last refreshed longer than
+analytics_matview_max_staleness_seconds ago (or not yet, as far as this process
+knows), the read functions return None and callers fall back to their live queries.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_heroku_session_factory, heroku_session
+from app.models.analytics_rollup import UNCLASSIFIED
+from app.models.heroku import HChatMessage, HChatSession
+from app.services.analytics_service import PERIOD_DAYS
+from app.services.metrics import Histogram
+from app.services.rollup_service import live_filter, next_midnight, source_of
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_VIEW = "analytics_daily_sessions"
+MESSAGES_VIEW = "analytics_daily_messages"
+
+# One extra day so the cutoff's (partial) day is always inside the window
+_WINDOW = (
+    "(date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC') "
+    f"- interval '{PERIOD_DAYS + 1} days'"
+)
+
+
+def _ddl(view: str, query: str) -> Tuple[str, ...]:
+    return (
+        f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS {query}",
+        # REFRESH ... CONCURRENTLY requires a unique index covering every row
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {view}_key "
+        f"ON {view} (day, account_unique_id, sentiment)",
+    )
+
+
+_DDL = {
+    SESSIONS_VIEW: _ddl(
+        SESSIONS_VIEW,
+        "SELECT (start_time AT TIME ZONE 'UTC')::date AS day, account_unique_id, "
+        f"COALESCE(initial_query_sentiment, '{UNCLASSIFIED}') AS sentiment, "
+        "count(*) AS n "
+        f"FROM chatsession WHERE start_time >= {_WINDOW} GROUP BY 1, 2, 3",
+    ),
+    MESSAGES_VIEW: _ddl(
+        MESSAGES_VIEW,
+        "SELECT (m.timestamp AT TIME ZONE 'UTC')::date AS day, s.account_unique_id, "
+        f"COALESCE(s.initial_query_sentiment, '{UNCLASSIFIED}') AS sentiment, "
+        "count(*) AS n "
+        "FROM chatmessage m JOIN chatsession s ON m.chat_session_id = s.id "
+        f"WHERE m.timestamp >= {_WINDOW} GROUP BY 1, 2, 3",
+    ),
+}
+
+REFRESH_LOG = "analytics_matview_refreshes"
+
+_REFRESH_LOG_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {REFRESH_LOG} "
+    "(view text PRIMARY KEY, refreshed_at timestamptz NOT NULL)"
+)
+# Held until the end of the refresh transaction; every worker uses the same key
+_TRY_LOCK = text(
+    "SELECT pg_try_advisory_xact_lock(hashtext('analytics_matview_refresh'))"
+)
+_LAST_REFRESH = text(f"SELECT refreshed_at FROM {REFRESH_LOG} WHERE view = :view")
+_LOG_REFRESH = text(
+    f"INSERT INTO {REFRESH_LOG} (view, refreshed_at) VALUES (:view, now()) "
+    "ON CONFLICT (view) DO UPDATE SET refreshed_at = excluded.refreshed_at "
+    "RETURNING refreshed_at"
+)
+
+_views = {
+    view: table(
+        view,
+        column("day"),
+        column("account_unique_id"),
+        column("sentiment"),
+        column("n"),
+    )
+    for view in _DDL
+}
+
+refresh_duration = Histogram(
+    "analytics_matview_refresh_duration_seconds",
+    "REFRESH MATERIALIZED VIEW CONCURRENTLY time by view.",
+    ("view",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+
+@dataclass
+class RefreshState:
+    view: str
+    source: Optional[str] = None
+    refreshed_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    refreshes: int = 0
+    last_error: Optional[str] = None
+
+
+_state: Dict[str, RefreshState] = {name: RefreshState(name) for name in _views}
+
+
+def refresh_states() -> List[RefreshState]:
+    return list(_state.values())
+
+
+def is_fresh(state: RefreshState) -> bool:
+    """Refreshed recently enough to be read (within the staleness limit)."""
+    if state.refreshed_at is None:
+        return False
+    age = datetime.now(timezone.utc) - state.refreshed_at
+    return age <= timedelta(seconds=settings.analytics_matview_max_staleness_seconds)
+
+
+def clear() -> None:
+    for name in _state:
+        _state[name] = RefreshState(name)
+
+
+# --- Refresh ---
+
+async def refresh_views(heroku_db: AsyncSession) -> None:
+    """
+    Create the views if missing, then refresh each one (timed) unless another worker
+    holds the refresh lock or refreshed it less than a refresh interval ago.
+    """
+    source = source_of(heroku_db)
+    interval = timedelta(seconds=settings.analytics_matview_refresh_interval_seconds)
+    for name, statements in _DDL.items():
+        state = _state[name]
+        started = time.perf_counter()
+        try:
+            if not (await heroku_db.execute(_TRY_LOCK)).scalar_one():
+                # Another worker is refreshing; adopt its refresh on the next round
+                await heroku_db.rollback()
+                continue
+            await heroku_db.execute(text(_REFRESH_LOG_DDL))
+            for statement in statements:
+                await heroku_db.execute(text(statement))
+            last = (await heroku_db.execute(_LAST_REFRESH, {"view": name})).scalar()
+            if last is not None and datetime.now(timezone.utc) - last < interval:
+                await heroku_db.commit()
+                state.source = source
+                state.refreshed_at = last
+                continue
+            await heroku_db.execute(
+                text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}")
+            )
+            refreshed_at = (
+                await heroku_db.execute(_LOG_REFRESH, {"view": name})
+            ).scalar_one()
+            await heroku_db.commit()
+        except Exception as exc:
+            await heroku_db.rollback()
+            state.last_error = str(exc)
+            raise
+        elapsed = time.perf_counter() - started
+        refresh_duration.observe(elapsed, name)
+        state.source = source
+        state.refreshed_at = refreshed_at
+        state.last_duration_ms = elapsed * 1000
+        state.refreshes += 1
+        state.last_error = None
+
+
+async def refresh_loop() -> None:
+    """Background task (started in the app lifespan when the mode is enabled)."""
+    while True:
+        # Refresh on the primary; followers receive the new contents by replication
+        if get_heroku_session_factory() is not None:
+            try:
+                async with heroku_session() as heroku_db:
+                    await refresh_views(heroku_db)
+            except Exception:
+                logger.exception("Analytics materialized view refresh failed")
+        await asyncio.sleep(settings.analytics_matview_refresh_interval_seconds)
+
+
+# --- Reads ---
+
+def _fresh_through(heroku_db: AsyncSession, view: str) -> Optional[datetime]:
+    """
+    UTC midnight of the view's last refresh: days before it are complete in the view.
+    None when the mode is off or the view is stale (or belongs to another DB).
+    """
+    state = _state[view]
+    if not settings.analytics_matviews_enabled or not is_fresh(state):
+        return None
+    if state.source != source_of(heroku_db):
+        return None
+    return state.refreshed_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _view_counts(
+    heroku_db: AsyncSession,
+    view: str,
+    cutoff: datetime,
+    through: datetime,
+    account_unique_id: Optional[str],
+) -> Dict[Optional[str], int]:
+    v = _views[view]
+    # The cutoff's own day is partial: it is counted live, not from the view
+    stmt = (
+        select(v.c.sentiment, func.sum(v.c.n))
+        .where(v.c.day >= next_midnight(cutoff).date(), v.c.day < through.date())
+        .group_by(v.c.sentiment)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(v.c.account_unique_id == account_unique_id)
+    return {
+        (sentiment if sentiment != UNCLASSIFIED else None): int(count)
+        for sentiment, count in (await heroku_db.execute(stmt)).all()
+    }
+
+
+async def session_count(
+    heroku_db: AsyncSession, cutoff: datetime, account_unique_id: Optional[str] = None
+) -> Optional[int]:
+    """Sessions since the cutoff (view + live partial days), or None if unavailable."""
+    through = _fresh_through(heroku_db, SESSIONS_VIEW)
+    if through is None:
+        return None
+    counts = await _view_counts(
+        heroku_db, SESSIONS_VIEW, cutoff, through, account_unique_id
+    )
+    stmt = (
+        select(func.count())
+        .select_from(HChatSession)
+        .where(live_filter(HChatSession.start_time, cutoff, through))
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    return sum(counts.values()) + (await heroku_db.execute(stmt)).scalar_one()
+
+
+async def _message_counts(
+    heroku_db: AsyncSession, cutoff: datetime, account_unique_id: Optional[str]
+) -> Optional[Dict[Optional[str], int]]:
+    through = _fresh_through(heroku_db, MESSAGES_VIEW)
+    if through is None:
+        return None
+    counts = await _view_counts(
+        heroku_db, MESSAGES_VIEW, cutoff, through, account_unique_id
+    )
+    stmt = (
+        select(
+            HChatSession.initial_query_sentiment, func.count(HChatMessage.message_id)
+        )
+        .select_from(HChatMessage)
+        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+        .where(live_filter(HChatMessage.timestamp, cutoff, through))
+        .group_by(HChatSession.initial_query_sentiment)
+    )
+    if account_unique_id is not None:
+        stmt = stmt.where(HChatSession.account_unique_id == account_unique_id)
+    for sentiment, count in (await heroku_db.execute(stmt)).all():
+        counts[sentiment] = counts.get(sentiment, 0) + count
+    return counts
+
+
+async def message_count(
+    heroku_db: AsyncSession, cutoff: datetime, account_unique_id: Optional[str] = None
+) -> Optional[int]:
+    """Messages since the cutoff (view + live partial days), or None if unavailable."""
+    counts = await _message_counts(heroku_db, cutoff, account_unique_id)
+    return sum(counts.values()) if counts is not None else None
+
+
+async def messages_by_sentiment(
+    heroku_db: AsyncSession, cutoff: datetime, account_unique_id: Optional[str] = None
+) -> Optional[List[Tuple[Optional[str], int]]]:
+    """Message counts per sentiment, most frequent first, or None if unavailable."""
+    counts = await _message_counts(heroku_db, cutoff, account_unique_id)
+    if counts is None:
+        return None
+    return sorted(
+        ((s, c) for s, c in counts.items() if c), key=lambda item: item[1], reverse=True
+    )
@@ -0,0 +1,320 @@
+"""
+In-process performance metrics, rendered in the Prometheus text format at /metrics.
+
+Covers HTTP requests (per-route latency, in-flight count, response size), SQL
+queries and pool checkouts per engine, Stripe API calls and bcrypt work, so a slow
+page can be attributed to the DB, Stripe or password hashing.
+"""
+from __future__ import annotations
+
+import re
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts, total = self._series.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            series = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series} {total[0]}")
+            lines.append(f"{self.name}_count{series} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# --- Metrics ---
+
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route"),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being served."
+)
+http_response_size = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by engine.", ("engine",)
+)
+db_pool_checkouts = Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool by engine.",
+    ("engine",),
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time a checkout waited for a pooled connection (TimedQueuePool), by engine.",
+    ("engine",),
+)
+db_pool_connect = Histogram(
+    "db_pool_connect_seconds",
+    "Time to open a new database connection for the pool, by engine.",
+    ("engine",),
+)
+db_pool_hold = Histogram(
+    "db_pool_hold_seconds",
+    "Time a connection stays checked out of the pool, by engine.",
+    ("engine",),
+)
+stripe_request_duration = Histogram(
+    "stripe_request_duration_seconds",
+    "Stripe API call latency by endpoint and status.",
+    ("method", "endpoint", "status"),
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt work time, including waiting for a hashing worker.",
+    ("operation",),
+)
+
+
+# --- SQLAlchemy instrumentation ---
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The async queue pool, timing how long each checkout waits in _do_get: queueing
+    for a free connection once the pool is exhausted, plus opening a new one when
+    there is room. The pool has no event for this, so the time is left on the
+    connection record for the engine's checkout event (see listen_pool_timings).
+    recreate() builds the same class, so engine.dispose() keeps it.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        record = super()._do_get()
+        record.info["pool_wait"] = time.perf_counter() - started
+        return record
+
+
+def listen_pool_timings(
+    engine: AsyncEngine,
+    on_connect: Callable[[float], None],
+    on_hold: Callable[[float], None],
+    on_wait: Optional[Callable[[float], None]] = None,
+) -> None:
+    """
+    Report how long each new connection took to open, how long each checkout held
+    its connection and, for an engine created with poolclass=TimedQueuePool, how long
+    each checkout waited for one. These are engine events, so they carry over to the
+    new pool that engine.dispose() creates.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "do_connect")
+    def _opening(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "connect")
+    def _opened(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            on_connect(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        waited = connection_record.info.pop("pool_wait", None)
+        if waited is not None and on_wait is not None:
+            on_wait(waited)
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            on_hold(time.perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Record query timings, pool checkouts and pool wait/connect/hold times."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_query_duration.observe(time.perf_counter() - started, name)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is None:
+            return
+        stack = context.connection.info.get("query_started")
+        if stack:
+            stack.pop()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts.inc(name)
+
+    listen_pool_timings(
+        engine,
+        on_connect=lambda seconds: db_pool_connect.observe(seconds, name),
+        on_hold=lambda seconds: db_pool_hold.observe(seconds, name),
+        on_wait=lambda seconds: db_pool_wait.observe(seconds, name),
+    )
+
+
+# --- Stripe ---
+
+# Stripe object ids (cus_..., in_..., pm_...) in paths, collapsed to keep label
+# sets small.
+# Ids always contain a digit or capital, which tells them apart from /payment_methods.
+_STRIPE_ID = re.compile(r"/[a-z]+_(?=[a-z]*[A-Z0-9])[A-Za-z0-9]+(?=/|$)")
+
+
+def stripe_endpoint(path: str) -> str:
+    return _STRIPE_ID.sub("/{id}", path)
+
+
+# --- HTTP middleware ---
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status, in-flight count and body size
+    per route.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+        size = 0
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope; use its path template
+            # (not the raw URL) so label sets stay bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_response_size.observe(size, method, route)
+            http_requests.inc(method, route, status)
@@ -0,0 +1,370 @@
+"""
+Columnar export of chat sessions and messages to Parquet, for offline analysis.
+
+Rows are streamed from Heroku in batches (the same queries as the NDJSON/CSV export),
+converted to Arrow record batches and written to Hive-style partitions:
+
+    <parquet_export_dir>/<kind>/account=<account_unique_id>/month=<YYYY-MM>/part-<run>.parquet
+
+Each run exports [last high-water mark, run start) and records the new mark in the
+local DB (per Heroku source DB), so nightly runs append new part files containing
+only new rows. A row can commit after a run with a timestamp before that run's mark,
+so each run also re-reads parquet_export_overlap_seconds before the mark and skips
+the rows already exported, whose keys are kept locally for that window. Files are
+written under a temporary name and renamed once the whole
+run has succeeded. A restart (explicit, or because the Heroku DB was switched)
+writes a complete new snapshot beside the old one and swaps it in at the end. Arrow
+conversion and file writes run in a worker thread, off the event loop; from the API
+an export runs as a background job whose progress is polled.
+
+pyarrow is an optional dependency: `uv sync --extra parquet`.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.models.parquet_export import ParquetExportedKey, ParquetExportState
+from app.services.export_service import ExportKind, export_statement
+from app.services.rollup_service import source_of
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+KINDS: Tuple[ExportKind, ...] = ("sessions", "messages")
+
+# Column that decides a row's month partition (and the incremental window)
+_TIME_COLUMN = {"sessions": "start_time", "messages": "timestamp"}
+# Primary key, to skip rows of the overlap window that were already exported
+_KEY_COLUMN = {"sessions": "id", "messages": "message_id"}
+
+
+# One export at a time per process (the job appends to the same files and marks)
+export_lock = asyncio.Lock()
+
+
+class ParquetUnavailable(Exception):
+    """pyarrow is not installed."""
+
+
+class ExportAlreadyRunning(Exception):
+    """An export job is already in progress."""
+
+
+@dataclass
+class ExportResult:
+    kind: str
+    rows: int
+    files: List[str]
+    exported_through: datetime
+
+
+def _arrow_type(sql_type) -> pa.DataType:
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+def arrow_schema(stmt) -> pa.Schema:
+    return pa.schema(
+        [
+            pa.field(column.key, _arrow_type(column.type))
+            for column in stmt.selected_columns
+        ]
+    )
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+class _PartitionWriters:
+    """One ParquetWriter per (account, month) partition, opened on first use."""
+
+    def __init__(self, root: Path, schema: pa.Schema, run_id: str) -> None:
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self._writers: Dict[Tuple[str, str], Tuple[Path, pq.ParquetWriter]] = {}
+
+    def write(self, key: Tuple[str, str], rows: List[dict]) -> None:
+        if key not in self._writers:
+            account, month = key
+            directory = (
+                self.root / f"account={quote(account, safe='')}" / f"month={month}"
+            )
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{self.run_id}.parquet"
+            tmp = path.with_name(path.name + ".tmp")
+            self._writers[key] = (path, pq.ParquetWriter(str(tmp), self.schema))
+        _, writer = self._writers[key]
+        writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def _close(self) -> None:
+        for _, writer in self._writers.values():
+            writer.close()
+
+    def commit(self) -> List[str]:
+        """Close every file and move it into place."""
+        self._close()
+        files = []
+        for path, _ in self._writers.values():
+            path.with_name(path.name + ".tmp").rename(path)
+            files.append(str(path))
+        return files
+
+    def abort(self) -> None:
+        self._close()
+        for path, _ in self._writers.values():
+            path.with_name(path.name + ".tmp").unlink(missing_ok=True)
+
+
+def _partition_rows(
+    keys: List[str], rows: Sequence, time_column: str
+) -> Dict[Tuple[str, str], List[dict]]:
+    grouped: Dict[Tuple[str, str], List[dict]] = {}
+    for row in rows:
+        record = dict(zip(keys, row))
+        for key, value in record.items():
+            if isinstance(value, datetime):
+                record[key] = _as_utc(value)
+        month = record[time_column].strftime("%Y-%m")
+        grouped.setdefault((record["account_unique_id"], month), []).append(record)
+    return grouped
+
+
+def _write_rows(
+    writers: _PartitionWriters, keys: List[str], rows: Sequence, time_column: str
+) -> None:
+    for key, records in _partition_rows(keys, rows, time_column).items():
+        writers.write(key, records)
+
+
+async def _load_state(
+    local_db: AsyncSession, source: str, kind: str, restart: bool
+) -> Tuple[ParquetExportState, bool]:
+    """The dataset's mark for `source`, and whether this run must start from scratch."""
+    state = await local_db.get(ParquetExportState, (source, kind))
+    if state is None:
+        # First run, or the Heroku DB was switched: files from another source are
+        # replaced by a full export of this one.
+        await local_db.execute(
+            delete(ParquetExportState).where(ParquetExportState.kind == kind)
+        )
+        state = ParquetExportState(source=source, kind=kind, rows_exported=0)
+        local_db.add(state)
+        restart = True
+    if restart:
+        state.exported_through = None
+        state.rows_exported = 0
+        await local_db.execute(
+            delete(ParquetExportedKey).where(ParquetExportedKey.kind == kind)
+        )
+    return state, restart
+
+
+def _swap_in(staging: Path, target: Path) -> None:
+    """Replace `target` with the freshly written `staging` snapshot."""
+    retired = target.with_name(f".{target.name}.old-{staging.name}")
+    if target.exists():
+        target.rename(retired)
+    staging.rename(target)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+async def export_kind(
+    heroku_db: AsyncSession,
+    local_db: AsyncSession,
+    kind: ExportKind,
+    root: Path,
+    until: datetime,
+    restart: bool = False,
+    batch_size: Optional[int] = None,
+) -> ExportResult:
+    """
+    Append every `kind` row from the stored high-water mark up to `until`, plus any
+    row of the overlap window before the mark that wasn't exported yet.
+    """
+    source = source_of(heroku_db)
+    state, restart = await _load_state(local_db, source, kind, restart)
+
+    overlap = timedelta(seconds=settings.parquet_export_overlap_seconds)
+    start = _as_utc(state.exported_through)
+    if start is not None:
+        start -= overlap
+    exported = ParquetExportedKey.source == source, ParquetExportedKey.kind == kind
+    seen = set(
+        await local_db.scalars(select(ParquetExportedKey.row_key).where(*exported))
+    )
+    # Keys a later run's overlap window can still reach
+    horizon = until - overlap
+    recent: List[dict] = []
+
+    stmt = export_statement(kind, start, until)
+    keys = list(stmt.selected_columns.keys())
+    key_index = keys.index(_KEY_COLUMN[kind])
+    time_index = keys.index(_TIME_COLUMN[kind])
+    run_id = until.strftime("%Y%m%dT%H%M%S%f")
+    target = root / kind
+    # A restart leaves the current snapshot untouched until the new one is complete
+    out = root / f".{kind}.restart-{run_id}" if restart else target
+    if restart:
+        shutil.rmtree(out, ignore_errors=True)
+    writers = _PartitionWriters(out, arrow_schema(stmt), run_id)
+    rows_written = 0
+    try:
+        result = await heroku_db.stream(
+            stmt.execution_options(yield_per=batch_size or settings.export_batch_size)
+        )
+        async for rows in result.partitions():
+            rows = [row for row in rows if str(row[key_index]) not in seen]
+            if not rows:
+                continue
+            # Arrow conversion and Parquet writes are CPU/disk work: off the loop
+            await asyncio.to_thread(
+                _write_rows, writers, keys, rows, _TIME_COLUMN[kind]
+            )
+            rows_written += len(rows)
+            for row in rows:
+                row_time = _as_utc(row[time_index])
+                if row_time >= horizon:
+                    recent.append(
+                        {
+                            "source": source,
+                            "kind": kind,
+                            "row_key": str(row[key_index]),
+                            "row_time": row_time,
+                        }
+                    )
+    except BaseException:
+        await asyncio.to_thread(writers.abort)
+        if restart:
+            shutil.rmtree(out, ignore_errors=True)
+        raise
+    files = await asyncio.to_thread(writers.commit)
+    if restart:
+        out.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(_swap_in, out, target)
+        files = [str(target / Path(f).relative_to(out)) for f in files]
+
+    if recent:
+        await local_db.execute(insert(ParquetExportedKey), recent)
+    await local_db.execute(
+        delete(ParquetExportedKey).where(
+            *exported, ParquetExportedKey.row_time < horizon
+        )
+    )
+    state.exported_through = until
+    state.rows_exported += rows_written
+    state.updated_at = datetime.now(timezone.utc)
+    await local_db.commit()
+    return ExportResult(
+        kind=kind, rows=rows_written, files=files, exported_through=until
+    )
+
+
+async def run_export(
+    heroku_db: AsyncSession,
+    local_db: AsyncSession,
+    root: Optional[Path] = None,
+    kinds: Sequence[ExportKind] = KINDS,
+    restart: bool = False,
+) -> List[ExportResult]:
+    """
+    Incrementally export each dataset; `restart` discards previous files and
+    marks.
+    """
+    if pa is None:
+        raise ParquetUnavailable("pyarrow is not installed (uv sync --extra parquet)")
+    root = Path(root or settings.parquet_export_dir)
+    async with export_lock:
+        until = datetime.now(timezone.utc)
+        return [
+            await export_kind(heroku_db, local_db, kind, root, until, restart)
+            for kind in kinds
+        ]
+
+
+# --- Background job (POST /analytics/export/parquet) ---
+
+@dataclass
+class ExportJob:
+    status: Literal["idle", "running", "succeeded", "failed"] = "idle"
+    restart: bool = False
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: List[ExportResult] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+_job: Dict[str, object] = {"job": ExportJob(), "task": None}
+
+
+def export_job() -> ExportJob:
+    """State of the latest export job started from the API."""
+    return _job["job"]
+
+
+async def _run_job(
+    job: ExportJob,
+    heroku_factory: async_sessionmaker,
+    local_factory: async_sessionmaker,
+    root: Optional[Path],
+) -> None:
+    try:
+        async with heroku_factory() as heroku_db, local_factory() as local_db:
+            job.results = await run_export(
+                heroku_db, local_db, root, restart=job.restart
+            )
+        job.status = "succeeded"
+    except Exception as exc:
+        logger.exception("Parquet export failed")
+        job.status = "failed"
+        job.error = str(exc)
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+
+
+def start_export_job(
+    heroku_factory: async_sessionmaker,
+    local_factory: async_sessionmaker,
+    restart: bool = False,
+    root: Optional[Path] = None,
+) -> asyncio.Task:
+    """Run an export in the background; poll export_job() for its outcome."""
+    if pa is None:
+        raise ParquetUnavailable("pyarrow is not installed (uv sync --extra parquet)")
+    if export_lock.locked() or export_job().status == "running":
+        raise ExportAlreadyRunning()
+    job = ExportJob(
+        status="running", restart=restart, started_at=datetime.now(timezone.utc)
+    )
+    _job["job"] = job
+    # Keep a strong reference; the event loop only holds weak ones to tasks
+    _job["task"] = asyncio.create_task(
+        _run_job(job, heroku_factory, local_factory, root)
+    )
+    return _job["task"]
@@ -0,0 +1,61 @@
+"""
+Short-lived cache of verified bearer tokens -> user principals.
+
+Lets authenticated requests skip JWT decoding and the SQLite user lookup when the
+same token was verified recently. Entries expire after a TTL (never later than the
+token itself) and are dropped whenever the user is updated or deleted.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    is_active: bool
+    is_superuser: bool
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, Tuple[Principal, float]] = OrderedDict()
+
+    def get(self, token: str) -> Optional[Principal]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return principal
+
+    def set(self, token: str, principal: Principal, token_exp: float) -> None:
+        expires = min(time.time() + self.ttl_seconds, token_exp)
+        self._entries[token] = (principal, expires)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for token in [t for t, (p, _) in self._entries.items() if p.id == user_id]:
+            del self._entries[token]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.principal_cache_max_entries,
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+)
@@ -0,0 +1,302 @@
+"""
+Daily analytics rollups.
+
+The Heroku chat tables are aggregated into per-day, per-account, per-sentiment
+session and message counts stored in the local SQLite DB. Complete UTC days are
+rolled up incrementally from the stored high-water marks, and the trailing
+analytics_rollup_overlap_days are rolled up again on every refresh so rows that
+arrive late are picked up. Only partial days (the cutoff's and today) are counted
+live against Heroku.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Date,
+    and_,
+    cast,
+    delete,
+    func,
+    literal_column,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.analytics_rollup import (
+    UNCLASSIFIED,
+    AnalyticsDailyRollup,
+    AnalyticsRollupState,
+)
+from app.models.heroku import HChatMessage, HChatSession
+
+# Serialises refreshes so concurrent requests after midnight roll up a day only once.
+_refresh_lock = asyncio.Lock()
+
+# Rows per INSERT, keeping well under SQLite's bound-parameter limit.
+_UPSERT_BATCH = 500
+
+# In-memory copy of the last known high-water mark, so the hot path skips SQLite.
+_fresh: dict = {"source": None, "through": None}
+
+
+def _today() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite drops tzinfo on the way back out
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def next_midnight(value: datetime) -> datetime:
+    """First UTC midnight at or after `value`; whole days from there are rolled up."""
+    midnight = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight if midnight == value else midnight + timedelta(days=1)
+
+
+def live_filter(column, cutoff: datetime, today: datetime):
+    """
+    Rows since the cutoff that whole-day aggregates don't cover: the cutoff's partial
+    day, and everything from `today` (the first day not aggregated yet) on.
+    """
+    head_end = next_midnight(cutoff)
+    if head_end >= today:
+        return column >= cutoff
+    return or_(and_(column >= cutoff, column < head_end), column >= today)
+
+
+def clear() -> None:
+    _fresh["source"] = None
+    _fresh["through"] = None
+
+
+def _utc_day(column):
+    # Literal zone rather than a bind param, so the SELECT and GROUP BY expressions
+    # match
+    return cast(func.timezone(literal_column("'UTC'"), column), Date)
+
+
+def source_of(heroku_db: AsyncSession) -> str:
+    """Identify the Heroku DB a session points at (host:port/database, no secrets)."""
+    # Follower sessions report their primary, so reads from a replica keep the rollups
+    if "source" in heroku_db.info:
+        return heroku_db.info["source"]
+    url = heroku_db.bind.url
+    return f"{url.host}:{url.port}/{url.database}"
+
+
+# --- Refresh ---
+
+async def _load_state(local_db: AsyncSession, source: str) -> AnalyticsRollupState:
+    state = await local_db.get(AnalyticsRollupState, source)
+    if state is not None:
+        return state
+
+    # First run, or the Heroku DB was switched: rollups from another source are invalid.
+    await local_db.execute(delete(AnalyticsDailyRollup))
+    await local_db.execute(delete(AnalyticsRollupState))
+    start = _today() - timedelta(days=settings.analytics_rollup_backfill_days)
+    state = AnalyticsRollupState(
+        source=source, sessions_through=start, messages_through=start
+    )
+    local_db.add(state)
+    return state
+
+
+async def _upsert(
+    local_db: AsyncSession,
+    rows: List[Tuple[date, str, Optional[str], int]],
+    column: str,
+) -> None:
+    if not rows:
+        return
+    values = [
+        {
+            "day": day,
+            "account_unique_id": account_unique_id,
+            "sentiment": sentiment if sentiment is not None else UNCLASSIFIED,
+            column: count,
+        }
+        for day, account_unique_id, sentiment, count in rows
+    ]
+    for i in range(0, len(values), _UPSERT_BATCH):
+        stmt = sqlite_insert(AnalyticsDailyRollup).values(values[i : i + _UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "account_unique_id", "sentiment"],
+            set_={column: getattr(stmt.excluded, column)},
+        )
+        await local_db.execute(stmt)
+
+
+async def _reset(
+    local_db: AsyncSession, start: datetime, end: datetime, column: str
+) -> None:
+    # Days rolled up again are recounted from scratch, not added to
+    day = AnalyticsDailyRollup.day
+    await local_db.execute(
+        update(AnalyticsDailyRollup)
+        .where(day >= start.date(), day < end.date())
+        .values({column: 0})
+    )
+
+
+async def _roll_sessions(
+    heroku_db: AsyncSession, local_db: AsyncSession, start: datetime, end: datetime
+) -> None:
+    await _reset(local_db, start, end, "session_count")
+    day = _utc_day(HChatSession.start_time)
+    result = await heroku_db.execute(
+        select(
+            day,
+            HChatSession.account_unique_id,
+            HChatSession.initial_query_sentiment,
+            func.count(),
+        )
+        .where(HChatSession.start_time >= start, HChatSession.start_time < end)
+        .group_by(
+            day, HChatSession.account_unique_id, HChatSession.initial_query_sentiment
+        )
+    )
+    await _upsert(local_db, [tuple(row) for row in result.all()], "session_count")
+
+
+async def _roll_messages(
+    heroku_db: AsyncSession, local_db: AsyncSession, start: datetime, end: datetime
+) -> None:
+    await _reset(local_db, start, end, "message_count")
+    day = _utc_day(HChatMessage.timestamp)
+    result = await heroku_db.execute(
+        select(
+            day,
+            HChatSession.account_unique_id,
+            HChatSession.initial_query_sentiment,
+            func.count(HChatMessage.message_id),
+        )
+        .select_from(HChatMessage)
+        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+        .where(HChatMessage.timestamp >= start, HChatMessage.timestamp < end)
+        .group_by(
+            day, HChatSession.account_unique_id, HChatSession.initial_query_sentiment
+        )
+    )
+    await _upsert(local_db, [tuple(row) for row in result.all()], "message_count")
+
+
+async def refresh_rollups(heroku_db: AsyncSession, local_db: AsyncSession) -> datetime:
+    """
+    Roll up every complete day past the stored high-water marks, plus the trailing
+    overlap window. Returns the new (exclusive) high-water mark, i.e. today's UTC
+    midnight.
+    """
+    source = source_of(heroku_db)
+    today = _today()
+    async with _refresh_lock:
+        if _fresh["source"] == source and _fresh["through"] == today:
+            return today
+
+        state = await _load_state(local_db, source)
+        overlap = today - timedelta(days=settings.analytics_rollup_overlap_days)
+        sessions_from = min(_as_utc(state.sessions_through), overlap)
+        messages_from = min(_as_utc(state.messages_through), overlap)
+
+        if sessions_from < today:
+            await _roll_sessions(heroku_db, local_db, sessions_from, today)
+            state.sessions_through = today
+        if messages_from < today:
+            await _roll_messages(heroku_db, local_db, messages_from, today)
+            state.messages_through = today
+        state.refreshed_at = datetime.now(timezone.utc)
+        await local_db.commit()
+
+        _fresh["source"] = source
+        _fresh["through"] = today
+    return today
+
+
+# --- Reads ---
+
+async def read_rollup_totals(local_db: AsyncSession, since: date) -> Tuple[int, int]:
+    """Return (sessions, messages) summed over rolled-up days from `since` onwards."""
+    result = await local_db.execute(
+        select(
+            func.coalesce(func.sum(AnalyticsDailyRollup.session_count), 0),
+            func.coalesce(func.sum(AnalyticsDailyRollup.message_count), 0),
+        ).where(AnalyticsDailyRollup.day >= since)
+    )
+    sessions, messages = result.one()
+    return int(sessions), int(messages)
+
+
+async def read_rollup_sentiments(
+    local_db: AsyncSession, since: date
+) -> Dict[Optional[str], int]:
+    """Return message counts per sentiment over rolled-up days from `since` onwards."""
+    result = await local_db.execute(
+        select(
+            AnalyticsDailyRollup.sentiment, func.sum(AnalyticsDailyRollup.message_count)
+        )
+        .where(AnalyticsDailyRollup.day >= since)
+        .group_by(AnalyticsDailyRollup.sentiment)
+    )
+    return {
+        (sentiment if sentiment != UNCLASSIFIED else None): int(count)
+        for sentiment, count in result.all()
+    }
+
+
+async def session_count(
+    heroku_db: AsyncSession, local_db: AsyncSession, cutoff: datetime
+) -> int:
+    """Sessions since the cutoff: rollups for whole days, partial days counted live."""
+    today = await refresh_rollups(heroku_db, local_db)
+    rolled, _ = await read_rollup_totals(local_db, next_midnight(cutoff).date())
+    result = await heroku_db.execute(
+        select(func.count())
+        .select_from(HChatSession)
+        .where(live_filter(HChatSession.start_time, cutoff, today))
+    )
+    return rolled + result.scalar_one()
+
+
+async def message_count(
+    heroku_db: AsyncSession, local_db: AsyncSession, cutoff: datetime
+) -> int:
+    """Messages since the cutoff: rollups for whole days, partial days counted live."""
+    today = await refresh_rollups(heroku_db, local_db)
+    _, rolled = await read_rollup_totals(local_db, next_midnight(cutoff).date())
+    result = await heroku_db.execute(
+        select(func.count())
+        .select_from(HChatMessage)
+        .where(live_filter(HChatMessage.timestamp, cutoff, today))
+    )
+    return rolled + result.scalar_one()
+
+
+async def messages_by_sentiment(
+    heroku_db: AsyncSession, local_db: AsyncSession, cutoff: datetime
+) -> List[Tuple[Optional[str], int]]:
+    """Message counts per sentiment, most frequent first (rollups + partial days)."""
+    today = await refresh_rollups(heroku_db, local_db)
+    counts = await read_rollup_sentiments(local_db, next_midnight(cutoff).date())
+    result = await heroku_db.execute(
+        select(
+            HChatSession.initial_query_sentiment, func.count(HChatMessage.message_id)
+        )
+        .select_from(HChatMessage)
+        .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+        .where(live_filter(HChatMessage.timestamp, cutoff, today))
+        .group_by(HChatSession.initial_query_sentiment)
+    )
+    for sentiment, count in result.all():
+        counts[sentiment] = counts.get(sentiment, 0) + count
+    return sorted(
+        ((s, c) for s, c in counts.items() if c), key=lambda item: item[1], reverse=True
+    )
@@ -0,0 +1,286 @@
+"""
+Full-text search over chat message history.
+
+Message text is copied from Heroku into a local SQLite FTS5 index incrementally, in
+(timestamp, message_id) order from a stored high-water mark, by a background task.
+Each batch is a keyset seek that needs a chatmessage (timestamp, message_id) index on
+Heroku to avoid sorting the table; `app.advise_indexes` recommends it when missing.
+Every refresh starts search_index_overlap_seconds before the mark, so a message that
+commits late with an earlier timestamp is still picked up; messages already indexed
+are skipped by id. Searches only ever touch the local index; Heroku is never scanned
+with ILIKE.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import LocalSessionFactory, get_heroku_read_session_factory
+from app.models.heroku import HChatMessage, HChatSession
+from app.models.message_search import (
+    MESSAGE_SEARCH_TABLE,
+    SearchIndexedMessage,
+    SearchIndexState,
+)
+from app.services.rollup_service import source_of
+
+logger = logging.getLogger(__name__)
+
+# Serialises index refreshes so a message is never indexed twice.
+_refresh_lock = asyncio.Lock()
+
+_INSERT = text(
+    f"INSERT INTO {MESSAGE_SEARCH_TABLE} "
+    "(message_text, message_id, chat_session_id, account_unique_id, sender_type, "
+    "timestamp) "
+    "VALUES (:message_text, :message_id, :chat_session_id, :account_unique_id, "
+    ":sender_type, :timestamp)"
+)
+
+SNIPPET_OPEN = "**"
+SNIPPET_CLOSE = "**"
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite drops tzinfo on the way back out
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# --- Indexing ---
+
+async def _load_state(local_db: AsyncSession, source: str) -> SearchIndexState:
+    state = await local_db.get(SearchIndexState, source)
+    if state is not None:
+        return state
+
+    # First run, or the Heroku DB was switched: entries from another source are invalid.
+    await local_db.execute(text(f"DELETE FROM {MESSAGE_SEARCH_TABLE}"))
+    await local_db.execute(delete(SearchIndexedMessage))
+    await local_db.execute(delete(SearchIndexState))
+    state = SearchIndexState(source=source, messages_indexed=0)
+    local_db.add(state)
+    return state
+
+
+async def refresh_index(
+    heroku_db: AsyncSession,
+    local_db: AsyncSession,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Index messages past the high-water mark, re-reading the overlap window before it;
+    returns how many were added.
+    """
+    batch_size = batch_size or settings.search_index_batch_size
+    source = source_of(heroku_db)
+    indexed = 0
+    async with _refresh_lock:
+        state = await _load_state(local_db, source)
+        start = None
+        if state.indexed_through is not None:
+            overlap = timedelta(seconds=settings.search_index_overlap_seconds)
+            start = (_as_utc(state.indexed_through) - overlap, "")
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            stmt = (
+                select(
+                    HChatMessage.message_id,
+                    HChatMessage.chat_session_id,
+                    HChatSession.account_unique_id,
+                    HChatMessage.sender_type,
+                    HChatMessage.message_text,
+                    HChatMessage.timestamp,
+                )
+                .join(HChatSession, HChatMessage.chat_session_id == HChatSession.id)
+                .order_by(HChatMessage.timestamp, HChatMessage.message_id)
+                .limit(batch_size)
+            )
+            if start is not None:
+                stmt = stmt.where(
+                    tuple_(HChatMessage.timestamp, HChatMessage.message_id)
+                    > tuple_(*start)
+                )
+            rows = (await heroku_db.execute(stmt)).mappings().all()
+            # Don't hold a read transaction open on Heroku between batches
+            await heroku_db.rollback()
+            if not rows:
+                break
+            last = (_as_utc(rows[-1]["timestamp"]), rows[-1]["message_id"])
+            start = last
+
+            ids = [row["message_id"] for row in rows]
+            seen = set(
+                await local_db.scalars(
+                    select(SearchIndexedMessage.message_id).where(
+                        SearchIndexedMessage.message_id.in_(ids)
+                    )
+                )
+            )
+            new = [row for row in rows if row["message_id"] not in seen]
+            if new:
+                await local_db.execute(
+                    _INSERT,
+                    [
+                        {**row, "timestamp": _as_utc(row["timestamp"]).isoformat()}
+                        for row in new
+                    ],
+                )
+                await local_db.execute(
+                    insert(SearchIndexedMessage),
+                    [{"message_id": row["message_id"]} for row in new],
+                )
+            # Entries and high-water mark are committed together; the overlap re-read
+            # never moves the mark back
+            mark = state.indexed_through
+            if mark is None or last > (_as_utc(mark), state.last_message_id):
+                state.indexed_through, state.last_message_id = last
+            state.messages_indexed += len(new)
+            state.refreshed_at = datetime.now(timezone.utc)
+            await local_db.commit()
+            indexed += len(new)
+            batches += 1
+            if len(rows) < batch_size:
+                break
+        if not indexed:
+            state.refreshed_at = datetime.now(timezone.utc)
+            await local_db.commit()
+    return indexed
+
+
+async def index_loop() -> None:
+    """Background task (started in the app lifespan) that keeps the index current."""
+    while True:
+        factory = get_heroku_read_session_factory()
+        if factory is not None:
+            try:
+                async with factory() as heroku_db, LocalSessionFactory() as local_db:
+                    await refresh_index(heroku_db, local_db)
+            except Exception:
+                # Heroku unreachable or mid-swap; the next pass picks up from the mark
+                logger.exception("Search index refresh failed")
+        await asyncio.sleep(settings.search_index_interval_seconds)
+
+
+# --- Search ---
+
+@dataclass
+class SearchHit:
+    message_id: str
+    chat_session_id: int
+    account_unique_id: str
+    sender_type: str
+    timestamp: datetime
+    snippet: str
+    rank: float
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match (as a literal phrase,
+    so FTS5 operators in the input are inert); a trailing * makes it a prefix match.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    return " ".join(terms)
+
+
+def _encode_cursor(rank: float, rowid: int, through_rowid: int) -> str:
+    raw = json.dumps([rank, rowid, through_rowid], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, rowid, through_rowid = json.loads(raw)
+        return float(rank), int(rowid), int(through_rowid)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+async def search(
+    local_db: AsyncSession,
+    query: str,
+    account_unique_id: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[SearchHit], Optional[str]]:
+    """
+    Best matches first (BM25), one page at a time. Returns (hits, next_cursor).
+
+    Pages are a keyset on (rank, rowid) after the previous page's last hit, within a
+    snapshot: the highest rowid when the first page was served, so messages indexed
+    later never show up on later pages. BM25 scores use statistics of the whole index
+    though, snapshot or not, so a refresh between pages shifts the ranks a little:
+    the order across pages is approximate, and a hit whose rank crosses a page
+    boundary may be skipped or shown twice.
+    """
+    params = {
+        "match": match_expression(query),
+        "open": SNIPPET_OPEN,
+        "close": SNIPPET_CLOSE,
+        "limit": limit + 1,
+    }
+    where = [f"{MESSAGE_SEARCH_TABLE} MATCH :match", "rowid <= :through"]
+    if cursor is not None:
+        params["rank"], params["after"], params["through"] = _decode_cursor(cursor)
+        where.append("(rank > :rank OR (rank = :rank AND rowid > :after))")
+    else:
+        newest = text(f"SELECT max(rowid) FROM {MESSAGE_SEARCH_TABLE}")
+        params["through"] = (await local_db.execute(newest)).scalar() or 0
+    if account_unique_id is not None:
+        where.append("account_unique_id = :account")
+        params["account"] = account_unique_id
+
+    result = await local_db.execute(
+        text(
+            "SELECT rowid, message_id, chat_session_id, account_unique_id, "
+            "sender_type, timestamp, "
+            f"snippet({MESSAGE_SEARCH_TABLE}, 0, :open, :close, '…', 16) "
+            f"AS snippet, rank FROM {MESSAGE_SEARCH_TABLE} "
+            f"WHERE {' AND '.join(where)} ORDER BY rank, rowid LIMIT :limit"
+        ),
+        params,
+    )
+    rows = result.mappings().all()
+    page = rows[:limit]
+    hits = [
+        SearchHit(
+            message_id=row["message_id"],
+            chat_session_id=int(row["chat_session_id"]),
+            account_unique_id=row["account_unique_id"],
+            sender_type=row["sender_type"],
+            timestamp=datetime.fromisoformat(row["timestamp"]),
+            snippet=row["snippet"],
+            rank=row["rank"],
+        )
+        for row in page
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(last["rank"], last["rowid"], params["through"])
+    return hits, next_cursor
+
+
+async def index_state(local_db: AsyncSession) -> Optional[SearchIndexState]:
+    """The current index high-water mark (None before the first refresh)."""
+    result = await local_db.execute(select(SearchIndexState).limit(1))
+    return result.scalar_one_or_none()
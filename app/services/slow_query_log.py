@@ -0,0 +1,219 @@
+"""
+Opt-in slow-query log for Heroku queries (settings.slow_query_log_enabled).
+
+Every statement run on a Heroku engine (primary or follower) is timed; any over
+slow_query_threshold_ms is logged with its compiled SQL, the types of its bound
+parameters and its duration, and kept in a local ring-buffer table. A sampled
+fraction (slow_query_explain_sample_rate) is re-run under EXPLAIN (ANALYZE, BUFFERS)
+on a separate connection and the plan stored alongside it.
+
+Recording happens in background tasks so the request that ran the query is not
+slowed down further. Note that EXPLAIN ANALYZE executes the statement again, which is
+why only plain SELECTs are explained (a WITH query may hide a data-modifying CTE),
+only a sample of them, and always in a transaction that is rolled back.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.config import Settings, settings
+from app.models.slow_query import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Execution option that keeps the EXPLAIN itself out of the log
+_SKIP = "skip_slow_query_log"
+
+_state: Dict[str, Any] = {"session_factory": None, "exclude": None, "config": settings}
+# Strong references to in-flight recording tasks (the loop only keeps weak ones)
+_tasks: Set[asyncio.Task] = set()
+
+
+def parameter_shapes(parameters: Any) -> Any:
+    """
+    Describe bound parameters by type (element-wise for sequences), never by
+    value.
+    """
+    if isinstance(parameters, dict):
+        return {key: parameter_shapes(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [parameter_shapes(value) for value in parameters]
+    return type(parameters).__name__
+
+
+def _source(engine: Engine) -> str:
+    url = engine.url
+    return f"{url.host}:{url.port}/{url.database}" if url.host else str(url.database)
+
+
+def _explainable(engine: Engine, statement: str) -> bool:
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return engine.dialect.name == "postgresql" and head == "SELECT"
+
+
+async def _explain(engine: Engine, statement: str, parameters: Any) -> Optional[str]:
+    try:
+        async with AsyncEngine(engine).connect() as conn:
+            conn = await conn.execution_options(**{_SKIP: True})
+            # Whatever the re-run statement does (e.g. a volatile function) is undone
+            transaction = await conn.begin()
+            try:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+                )
+                return "\n".join(row[0] for row in result)
+            finally:
+                await transaction.rollback()
+    except Exception:
+        logger.exception("EXPLAIN of slow query failed")
+        return None
+
+
+async def _record(
+    engine: Engine, statement: str, parameters: Any, duration_ms: float, explain: bool
+) -> None:
+    plan = await _explain(engine, statement, parameters) if explain else None
+    config: Settings = _state["config"]
+    factory: async_sessionmaker = _state["session_factory"]
+    try:
+        async with factory() as local_db:
+            local_db.add(
+                SlowQuery(
+                    recorded_at=datetime.now(timezone.utc),
+                    source=_source(engine),
+                    statement=statement,
+                    parameter_shapes=json.dumps(parameter_shapes(parameters)),
+                    duration_ms=duration_ms,
+                    plan=plan,
+                )
+            )
+            await local_db.flush()
+            # Ring buffer: keep only the newest slow_query_buffer_size entries
+            newest = select(func.max(SlowQuery.id)).scalar_subquery()
+            await local_db.execute(
+                delete(SlowQuery).where(
+                    SlowQuery.id <= newest - config.slow_query_buffer_size
+                )
+            )
+            await local_db.commit()
+    except Exception:
+        logger.exception("Recording slow query failed")
+
+
+# --- Engine events ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+    config: Settings = _state["config"]
+    if duration_ms < config.slow_query_threshold_ms:
+        return
+    if conn.engine in _state["exclude"] or conn.get_execution_options().get(_SKIP):
+        return
+    logger.warning(
+        "Slow query (%.1f ms) on %s: %s -- parameters: %s",
+        duration_ms,
+        _source(conn.engine),
+        statement,
+        json.dumps(parameter_shapes(parameters)),
+    )
+    explain = (
+        _explainable(conn.engine, statement)
+        and random.random() < config.slow_query_explain_sample_rate
+    )
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:  # a plain sync engine outside the app; nothing to record into
+        return
+    task = loop.create_task(
+        _record(conn.engine, statement, parameters, duration_ms, explain)
+    )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _handle_error(context) -> None:
+    if context.connection is None:
+        return
+    stack = context.connection.info.get("slow_query_started")
+    if stack:
+        stack.pop()
+
+
+def install(
+    session_factory: async_sessionmaker,
+    exclude: List[AsyncEngine],
+    config: Settings = settings,
+) -> None:
+    """
+    Start logging slow queries into `session_factory`'s database. Listeners are set on
+    the Engine class so engines created later (hot swaps, followers) are covered too;
+    `exclude` lists the engines that aren't Heroku (the local SQLite DB).
+    """
+    _state["session_factory"] = session_factory
+    _state["exclude"] = {engine.sync_engine for engine in exclude}
+    _state["config"] = config
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def uninstall() -> None:
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.remove(Engine, "handle_error", _handle_error)
+
+
+async def flush() -> None:
+    """Wait for pending recordings (on shutdown, and in tests)."""
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+
+
+# --- Reporting ---
+
+async def worst_offenders(
+    local_db: AsyncSession, limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Recorded statements grouped by SQL text, slowest first, with the plan of the slowest
+    explained run of each.
+    """
+    result = await local_db.execute(
+        select(
+            SlowQuery.statement,
+            func.count().label("calls"),
+            func.max(SlowQuery.duration_ms).label("max_ms"),
+            func.avg(SlowQuery.duration_ms).label("mean_ms"),
+            func.max(SlowQuery.recorded_at).label("last_seen"),
+        )
+        .group_by(SlowQuery.statement)
+        .order_by(func.max(SlowQuery.duration_ms).desc())
+        .limit(limit)
+    )
+    offenders = [dict(row) for row in result.mappings()]
+    for offender in offenders:
+        latest = await local_db.execute(
+            select(SlowQuery.source, SlowQuery.parameter_shapes, SlowQuery.plan)
+            .where(SlowQuery.statement == offender["statement"])
+            .order_by(SlowQuery.plan.is_(None), SlowQuery.duration_ms.desc())
+            .limit(1)
+        )
+        source, shapes, plan = latest.one()
+        offender.update(source=source, parameter_shapes=json.loads(shapes), plan=plan)
+    return offenders
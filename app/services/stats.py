@@ -0,0 +1,12 @@
+"""Small statistics helpers shared by the admin benchmark commands."""
+from __future__ import annotations
+
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of raw samples; 0.0 if there are none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
@@ -0,0 +1,183 @@
+"""
+TTL + stale-while-revalidate cache for Stripe lookups.
+
+Entries are keyed by object type and Stripe customer id. A fresh entry is served
+as-is; a stale one (past its TTL but within the stale window) is served immediately
+while a background refresh runs; anything older is a miss. Concurrent misses and
+refreshes for the same key share a single fetch.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.database import LocalSessionFactory
+from app.models.stripe_cache import StripeCacheEntry
+
+CUSTOMER = "customer"
+PAYMENT_METHODS = "payment_methods"
+INVOICES = "invoices"
+KINDS = (CUSTOMER, PAYMENT_METHODS, INVOICES)
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+
+
+# --- Backends ---
+
+class CacheBackend(ABC):
+    """Storage interface for StripeCache. Values must be JSON-serialisable."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]: ...
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+
+class MemoryLRUBackend(CacheBackend):
+    """In-process LRU; the least recently used entry is evicted past max_entries."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """Persistent backend in the local SQLite DB; survives restarts."""
+
+    def __init__(
+        self, session_factory: async_sessionmaker = LocalSessionFactory
+    ) -> None:
+        self.session_factory = session_factory
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        async with self.session_factory() as db:
+            row = await db.get(StripeCacheEntry, key)
+            if row is None:
+                return None
+            return CacheEntry(value=row.value, stored_at=row.stored_at)
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        async with self.session_factory() as db:
+            await db.merge(
+                StripeCacheEntry(key=key, value=entry.value, stored_at=entry.stored_at)
+            )
+            await db.commit()
+
+    async def delete(self, key: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                delete(StripeCacheEntry).where(StripeCacheEntry.key == key)
+            )
+            await db.commit()
+
+
+# --- Cache ---
+
+class StripeCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttls: Dict[str, float],
+        stale_seconds: float,
+    ) -> None:
+        self.backend = backend
+        self.ttls = ttls
+        self.stale_seconds = stale_seconds
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _key(kind: str, customer_id: str) -> str:
+        return f"{kind}:{customer_id}"
+
+    async def get_or_fetch(
+        self,
+        customer_id: str,
+        kind: str,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for (kind, customer_id), fetching it if needed."""
+        key = self._key(kind, customer_id)
+        entry = await self.backend.get(key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age < self.ttls[kind]:
+                return entry.value
+            if age < self.ttls[kind] + self.stale_seconds:
+                self._refresh(key, fetch)
+                return entry.value
+        # Shield so a cancelled request doesn't abort a fetch other callers share
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    async def invalidate(self, customer_id: str, kind: Optional[str] = None) -> None:
+        """Drop one cached object type for a customer, or all of them."""
+        for k in (kind,) if kind else KINDS:
+            await self.backend.delete(self._key(k, customer_id))
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _fetch_and_store(
+        self, key: str, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        value = await fetch()
+        await self.backend.set(key, CacheEntry(value=value, stored_at=time.time()))
+        return value
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Background refreshes have no awaiter; failures just leave the stale entry.
+        if not task.cancelled():
+            task.exception()
+
+
+def _make_backend() -> CacheBackend:
+    if settings.stripe_cache_backend == "sqlite":
+        return SQLiteBackend()
+    return MemoryLRUBackend(settings.stripe_cache_max_entries)
+
+
+stripe_cache = StripeCache(
+    backend=_make_backend(),
+    ttls={
+        CUSTOMER: settings.stripe_cache_ttl_customer_seconds,
+        PAYMENT_METHODS: settings.stripe_cache_ttl_payment_methods_seconds,
+        INVOICES: settings.stripe_cache_ttl_invoices_seconds,
+    },
+    stale_seconds=settings.stripe_cache_stale_seconds,
+)
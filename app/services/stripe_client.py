@@ -0,0 +1,174 @@
+"""
+Native async access to the Stripe REST API.
+
+One long-lived httpx.AsyncClient (keep-alive connection pool) is created in the app
+lifespan and shared by all requests. Concurrency is bounded by a semaphore, and
+429 rate-limit responses are retried with exponential backoff (honouring
+Retry-After when Stripe sends it).
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.services.metrics import stripe_endpoint, stripe_request_duration
+
+
+class StripeAPIError(Exception):
+    def __init__(
+        self, status_code: int, message: str, code: Optional[str] = None
+    ) -> None:
+        super().__init__(f"Stripe API error {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+        # Stripe's machine-readable error code, e.g. "resource_missing"
+        self.code = code
+
+    @property
+    def permanent(self) -> bool:
+        """A 4xx other than 429: retrying the same request will fail the same way."""
+        return 400 <= self.status_code < 500 and self.status_code != 429
+
+
+class StripeClient:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.stripe.com",
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        timeout_seconds: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    def _retry_delay(self, attempt: int, response: httpx.Response) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff_seconds * (2**attempt))
+
+    async def request(
+        self, method: str, path: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Send one API request and return the decoded JSON object."""
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                started = time.perf_counter()
+                response = await self._http.request(method, path, params=params)
+                stripe_request_duration.observe(
+                    time.perf_counter() - started,
+                    method,
+                    stripe_endpoint(path),
+                    str(response.status_code),
+                )
+            if response.status_code == 429 and attempt < self.max_retries:
+                # Sleep outside the semaphore so other calls can proceed meanwhile
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+            if response.is_error:
+                code = None
+                try:
+                    error = response.json()["error"]
+                    message, code = error["message"], error.get("code")
+                except (ValueError, KeyError, TypeError):
+                    message = response.text
+                raise StripeAPIError(response.status_code, message, code)
+            return response.json()
+
+    # --- Resources ---
+
+    async def retrieve_customer(self, customer_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/v1/customers/{customer_id}")
+
+    async def list_payment_methods(
+        self, customer_id: str, type: str = "card"
+    ) -> Dict[str, Any]:
+        return await self.request(
+            "GET", "/v1/payment_methods", {"customer": customer_id, "type": type}
+        )
+
+    async def list_invoices(
+        self,
+        customer_id: Optional[str] = None,
+        limit: int = 10,
+        starting_after: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"limit": limit}
+        if customer_id is not None:
+            params["customer"] = customer_id
+        if starting_after is not None:
+            params["starting_after"] = starting_after
+        return await self.request("GET", "/v1/invoices", params)
+
+    async def iterate_list(
+        self, path: str, params: Optional[Dict[str, Any]] = None, page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every object of a list endpoint, following has_more/starting_after."""
+        params = {**(params or {}), "limit": page_size}
+        while True:
+            page = await self.request("GET", path, params)
+            data = page.get("data", [])
+            for obj in data:
+                yield obj
+            if not page.get("has_more") or not data:
+                return
+            params["starting_after"] = data[-1]["id"]
+
+
+# --- Shared client (created in the app lifespan) ---
+# Using a dict so init/close functions can mutate it without `global`.
+_stripe: dict = {"client": None}
+
+
+def init_stripe_client() -> None:
+    """Create the shared Stripe client if a secret key is configured."""
+    if not settings.stripe_secret_key:
+        return
+    _stripe["client"] = StripeClient(
+        api_key=settings.stripe_secret_key,
+        base_url=settings.stripe_api_base,
+        max_concurrency=settings.stripe_max_concurrency,
+        max_retries=settings.stripe_max_retries,
+        timeout_seconds=settings.stripe_timeout_seconds,
+    )
+
+
+async def close_stripe_client() -> None:
+    """Close the shared client's connection pool on shutdown."""
+    client: StripeClient | None = _stripe.get("client")
+    if client is not None:
+        await client.aclose()
+        _stripe["client"] = None
+
+
+def get_stripe_client() -> StripeClient | None:
+    """Return the shared Stripe client, or None if Stripe is not configured."""
+    return _stripe.get("client")
@@ -0,0 +1,191 @@
+"""
+Local mirror of Stripe customers, invoices and payment methods.
+
+Kept up to date by the Stripe webhook receiver (and the bulk sync job), so account
+pages can read billing data from SQLite instead of calling the Stripe API. A customer
+is only read from the mirror once the bulk sync has backfilled it; until then webhooks
+may have delivered some of its objects but not all of them. Without a webhook secret
+nothing keeps the mirror current between sync runs, so a customer is then only read
+from it for stripe_mirror_max_age_seconds after its last sync.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import stripe as stripe_lib
+from sqlalchemy import and_, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.models.stripe_mirror import StripeMirrorBackfill, StripeMirrorObject
+
+MIRRORED_TYPES = ("customer", "invoice", "payment_method")
+
+
+class InvalidWebhook(Exception):
+    """The webhook payload or its signature could not be verified."""
+
+
+def verify_webhook(
+    payload: bytes, signature: Optional[str], secret: str
+) -> Dict[str, Any]:
+    """Check the Stripe-Signature header and return the decoded event."""
+    try:
+        stripe_lib.WebhookSignature.verify_header(
+            payload, signature, secret, tolerance=300
+        )
+        return json.loads(payload)
+    except (stripe_lib.SignatureVerificationError, ValueError) as exc:
+        raise InvalidWebhook(str(exc)) from exc
+
+
+def _customer_of(obj: Dict[str, Any]) -> Optional[str]:
+    if obj.get("object") == "customer":
+        return obj["id"]
+    customer = obj.get("customer")
+    if isinstance(customer, dict):  # expanded
+        return customer.get("id")
+    return customer
+
+
+async def upsert_object(
+    db: AsyncSession, obj: Dict[str, Any], source_ts: int, deleted: bool = False
+) -> None:
+    """Insert or update one Stripe object unless the stored one is newer. No commit."""
+    values = {
+        "id": obj["id"],
+        "object_type": obj["object"],
+        "customer_id": _customer_of(obj),
+        "created": obj.get("created") or 0,
+        "deleted": deleted or bool(obj.get("deleted")),
+        "data": obj,
+        "source_ts": source_ts,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    stmt = sqlite_insert(StripeMirrorObject).values(values)
+    update = {k: getattr(stmt.excluded, k) for k in values if k != "id"}
+    if obj.get("deleted"):
+        # Deleted objects arrive as stubs; keep the last full copy of the data
+        update.pop("data")
+        update.pop("created")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_=update,
+        where=StripeMirrorObject.source_ts <= stmt.excluded.source_ts,
+    )
+    await db.execute(stmt)
+
+
+async def apply_event(db: AsyncSession, event: Dict[str, Any]) -> Optional[str]:
+    """
+    Mirror a customer.*, invoice.* or payment_method.* webhook event.
+    Returns the affected customer id, or None if the event was ignored.
+    """
+    obj = event.get("data", {}).get("object", {})
+    event_type = event.get("type", "")
+    object_type = obj.get("object")
+    mirrored = object_type in MIRRORED_TYPES
+    if not mirrored or not event_type.startswith(f"{object_type}."):
+        return None
+    await upsert_object(
+        db, obj, source_ts=event["created"], deleted=event_type.endswith(".deleted")
+    )
+    await db.commit()
+    return _customer_of(obj)
+
+
+async def mark_backfilled(db: AsyncSession, customer_id: str) -> None:
+    """Record that all of a customer's objects are in the mirror. Does not commit."""
+    now = datetime.now(timezone.utc)
+    stmt = sqlite_insert(StripeMirrorBackfill).values(
+        customer_id=customer_id, backfilled_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["customer_id"], set_={"backfilled_at": now}
+    )
+    await db.execute(stmt)
+
+
+async def read_customer(
+    db: AsyncSession,
+    customer_id: str,
+    invoice_limit: int = 10,
+    invoices_starting_after: Optional[str] = None,
+) -> Optional[Tuple[Optional[dict], List[dict], List[dict], bool]]:
+    """
+    Return (customer, payment_methods, invoices, has_more_invoices) from the mirror,
+    or None if the customer hasn't been backfilled (or, without webhooks, was last
+    synced too long ago). Invoices are newest first and paginated like the Stripe API
+    (starting_after = last invoice id of the previous page), by a (created, id)
+    keyset. Everything is read by one query on the customer index.
+    """
+    obj = StripeMirrorObject
+    backfilled = StripeMirrorBackfill.customer_id == obj.customer_id
+    if not settings.stripe_webhook_secret:
+        max_age = timedelta(seconds=settings.stripe_mirror_max_age_seconds)
+        backfilled = and_(
+            backfilled,
+            StripeMirrorBackfill.backfilled_at >= datetime.now(timezone.utc) - max_age,
+        )
+
+    inv = aliased(StripeMirrorObject)
+    page = select(inv.id).where(
+        inv.customer_id == customer_id,
+        inv.object_type == "invoice",
+        inv.deleted.is_(False),
+    )
+    if invoices_starting_after is not None:
+        # Keyset on (created, id), the sort key, from the previous page's last invoice;
+        # an unknown starting_after compares with NULL and yields an empty page
+        anchor = aliased(StripeMirrorObject)
+
+        def of_anchor(column):
+            return (
+                select(column)
+                .where(
+                    anchor.id == invoices_starting_after,
+                    anchor.customer_id == customer_id,
+                    anchor.object_type == "invoice",
+                )
+                .scalar_subquery()
+            )
+
+        created, last_id = of_anchor(anchor.created), of_anchor(anchor.id)
+        page = page.where(
+            or_(inv.created < created, and_(inv.created == created, inv.id < last_id))
+        )
+    page = page.order_by(inv.created.desc(), inv.id.desc()).limit(invoice_limit + 1)
+
+    live = obj.deleted.is_(False)
+    rows = (
+        await db.execute(
+            select(obj)
+            .join(StripeMirrorBackfill, backfilled)
+            .where(
+                obj.customer_id == customer_id,
+                or_(
+                    obj.object_type == "customer",
+                    and_(obj.object_type == "payment_method", live),
+                    obj.id.in_(page),
+                ),
+            )
+            .order_by(obj.created.desc(), obj.id.desc())
+        )
+    ).scalars()
+    by_type: Dict[str, List[StripeMirrorObject]] = {t: [] for t in MIRRORED_TYPES}
+    for row in rows:
+        by_type[row.object_type].append(row)
+    if not by_type["customer"]:
+        return None
+    customer = by_type["customer"][0]
+    invoices = by_type["invoice"]
+    return (
+        None if customer.deleted else customer.data,
+        [r.data for r in by_type["payment_method"]],
+        [r.data for r in invoices[:invoice_limit]],
+        len(invoices) > invoice_limit,
+    )
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.services.auth_service import hash_password
+from app.services.principal_cache import principal_cache
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
@@ -28,7 +29,7 @@ async def list_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[
 async def create_user(db: AsyncSession, data: UserCreate) -> User:
     user = User(
         email=data.email,
-        hashed_password=hash_password(data.password),
+        hashed_password=await hash_password(data.password),
         full_name=data.full_name,
         is_superuser=data.is_superuser,
     )
@@ -41,14 +42,23 @@ async def create_user(db: AsyncSession, data: UserCreate) -> User:
 async def update_user(db: AsyncSession, user: User, data: UserUpdate) -> User:
     update_data = data.model_dump(exclude_unset=True)
     if "password" in update_data:
-        update_data["hashed_password"] = hash_password(update_data.pop("password"))
+        password = update_data.pop("password")
+        update_data["hashed_password"] = await hash_password(password)
     for field, value in update_data.items():
         setattr(user, field, value)
     await db.commit()
     await db.refresh(user)
+    principal_cache.invalidate_user(user.id)
     return user
 
 
+async def upgrade_password_hash(db: AsyncSession, user: User, plain: str) -> None:
+    """Re-hash a just-verified password with the configured cost factor."""
+    user.hashed_password = await hash_password(plain)
+    await db.commit()
+
+
 async def delete_user(db: AsyncSession, user: User) -> None:
     await db.delete(user)
     await db.commit()
+    principal_cache.invalidate_user(user.id)
@@ -0,0 +1,246 @@
+"""
+Bulk Stripe sync: backfill the local Stripe mirror for every subscribed account.
+
+Walks HStripeSubscription in id order, one batch at a time. For each customer it
+fetches the customer plus every invoice and card payment method (following Stripe's
+list pagination) under a bounded concurrency limit, and writes them to the local
+mirror. Progress is checkpointed after every batch, so an interrupted run resumes
+where it stopped.
+
+Customers Stripe rejects permanently (a 4xx other than 429, e.g. a deleted customer's
+404 resource_missing) are recorded in stripe_sync_failures and skipped. The
+checkpoint never moves past a customer whose fetch failed transiently (5xx, 429 after
+the client's retries, timeouts): the run stops after that batch and the next run
+starts again from that customer.
+
+Usage:
+    uv run python -m app.sync_stripe [--batch-size 100] [--concurrency 8] [--restart]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import LocalSessionFactory, init_local_db, make_heroku_engine
+from app.models.heroku import HStripeSubscription
+from app.models.stripe_mirror import StripeSyncCheckpoint, StripeSyncFailure
+from app.services.stripe_client import StripeAPIError, StripeClient
+from app.services.stripe_mirror_service import mark_backfilled, upsert_object
+
+JOB_NAME = "stripe_backfill"
+
+
+async def fetch_customer_objects(client: StripeClient, customer_id: str) -> List[dict]:
+    """The customer, all of its invoices and all of its card payment methods."""
+    objects = [await client.retrieve_customer(customer_id)]
+    async for invoice in client.iterate_list("/v1/invoices", {"customer": customer_id}):
+        objects.append(invoice)
+    async for pm in client.iterate_list(
+        "/v1/payment_methods", {"customer": customer_id, "type": "card"}
+    ):
+        objects.append(pm)
+    return objects
+
+
+async def sync_batch(
+    client: StripeClient,
+    local_db: AsyncSession,
+    customer_ids: List[str],
+    concurrency: int,
+) -> Tuple[int, Dict[str, BaseException]]:
+    """
+    Fetch and mirror one batch of customers. Returns (objects written, the error of
+    each customer whose fetch failed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(customer_id: str) -> List[dict]:
+        async with semaphore:
+            return await fetch_customer_objects(client, customer_id)
+
+    results = await asyncio.gather(
+        *(fetch(c) for c in customer_ids), return_exceptions=True
+    )
+
+    written = 0
+    failed: Dict[str, BaseException] = {}
+    fetched_at = int(time.time())
+    for customer_id, result in zip(customer_ids, results):
+        if isinstance(result, BaseException):
+            failed[customer_id] = result
+            print(f"  ! {customer_id}: {result}", file=sys.stderr)
+            continue
+        for obj in result:
+            await upsert_object(local_db, obj, source_ts=fetched_at)
+        # From now on the account pages read this customer from the mirror
+        await mark_backfilled(local_db, customer_id)
+        await local_db.execute(
+            delete(StripeSyncFailure).where(
+                StripeSyncFailure.customer_id == customer_id
+            )
+        )
+        written += len(result)
+    return written, failed
+
+
+def is_permanent(exc: BaseException) -> bool:
+    """Retrying won't help (Stripe rejected the request itself, e.g. 404)."""
+    return isinstance(exc, StripeAPIError) and exc.permanent
+
+
+async def record_failure(
+    local_db: AsyncSession, subscription_id: int, customer_id: str, exc: StripeAPIError
+) -> None:
+    """Remember a permanently failed customer so the sync can move past it."""
+    values = {
+        "customer_id": customer_id,
+        "subscription_id": subscription_id,
+        "status_code": exc.status_code,
+        "code": exc.code,
+        "message": exc.message[:1024],
+        "failed_at": datetime.now(timezone.utc),
+    }
+    stmt = sqlite_insert(StripeSyncFailure).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["customer_id"],
+        set_={k: getattr(stmt.excluded, k) for k in values if k != "customer_id"},
+    )
+    await local_db.execute(stmt)
+
+
+async def _load_checkpoint(
+    local_db: AsyncSession, restart: bool
+) -> StripeSyncCheckpoint:
+    checkpoint = await local_db.get(StripeSyncCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = StripeSyncCheckpoint(
+            job=JOB_NAME, last_subscription_id=0, objects_synced=0
+        )
+        local_db.add(checkpoint)
+    elif restart:
+        checkpoint.last_subscription_id = 0
+        checkpoint.objects_synced = 0
+    return checkpoint
+
+
+async def run(
+    heroku_factory: async_sessionmaker,
+    local_factory: async_sessionmaker,
+    client: StripeClient,
+    batch_size: int = 100,
+    concurrency: int = 8,
+    restart: bool = False,
+) -> int:
+    """Sync every remaining batch; returns the number of objects written this run."""
+    started = time.monotonic()
+    total = 0
+    async with local_factory() as local_db:
+        checkpoint = await _load_checkpoint(local_db, restart)
+        await local_db.commit()
+        if checkpoint.last_subscription_id:
+            print(f"Resuming after subscription id {checkpoint.last_subscription_id}")
+
+        while True:
+            # Short-lived session per batch: no transaction held open on Heroku
+            async with heroku_factory() as heroku_db:
+                result = await heroku_db.execute(
+                    select(
+                        HStripeSubscription.id, HStripeSubscription.stripe_customer_id
+                    )
+                    .where(HStripeSubscription.id > checkpoint.last_subscription_id)
+                    .order_by(HStripeSubscription.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+            if not rows:
+                break
+
+            batch_started = time.monotonic()
+            written, failed = await sync_batch(
+                client, local_db, [cid for _, cid in rows], concurrency
+            )
+            for subscription_id, cid in rows:
+                if cid in failed and is_permanent(failed[cid]):
+                    await record_failure(local_db, subscription_id, cid, failed[cid])
+            retry = {cid for cid, exc in failed.items() if not is_permanent(exc)}
+            # Advance only through the customers before the first transient failure,
+            # so it (and everything after it) is fetched again on the next run
+            done = rows
+            if retry:
+                first = next(i for i, (_, cid) in enumerate(rows) if cid in retry)
+                done = rows[:first]
+            # Mirror rows and checkpoint are committed together
+            if done:
+                checkpoint.last_subscription_id = done[-1][0]
+            checkpoint.objects_synced += written
+            checkpoint.updated_at = datetime.now(timezone.utc)
+            await local_db.commit()
+
+            total += written
+            batch_rate = written / max(time.monotonic() - batch_started, 1e-9)
+            overall_rate = total / max(time.monotonic() - started, 1e-9)
+            print(
+                f"{len(rows)} customers, {written} objects, {len(failed)} failed "
+                f"(up to subscription id {checkpoint.last_subscription_id}): "
+                f"{batch_rate:.1f} objects/s, {overall_rate:.1f} objects/s overall"
+            )
+            if retry:
+                print(
+                    f"Stopping: resume after subscription id "
+                    f"{checkpoint.last_subscription_id} to retry the failed customers",
+                    file=sys.stderr,
+                )
+                break
+
+    print(f"Done: {total} objects in {time.monotonic() - started:.1f}s")
+    return total
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill the local Stripe mirror.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.stripe_max_concurrency
+    )
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    args = parser.parse_args()
+
+    if not settings.database_url or not settings.stripe_secret_key:
+        sys.exit("DATABASE_URL and STRIPE_SECRET_KEY must both be set.")
+
+    await init_local_db()
+    engine = make_heroku_engine(settings.database_url)
+    client = StripeClient(
+        api_key=settings.stripe_secret_key,
+        base_url=settings.stripe_api_base,
+        max_concurrency=args.concurrency,
+        max_retries=settings.stripe_max_retries,
+        timeout_seconds=settings.stripe_timeout_seconds,
+    )
+    try:
+        await run(
+            async_sessionmaker(engine, expire_on_commit=False),
+            LocalSessionFactory,
+            client,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            restart=args.restart,
+        )
+    except StripeAPIError as exc:
+        sys.exit(f"Stripe error: {exc}")
+    finally:
+        await client.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,10 +4,17 @@ import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 
 from app.database import Base
-from app.dependencies import get_local_db
+from app.dependencies import get_heroku_db, get_heroku_read_db, get_local_db
 from app.main import app
+from app.models.heroku import HerokuBase
+from app.schemas.user import UserCreate
+from app.services import login_throttle, matview_service, rollup_service
+from app.services.db_health import db_health
+from app.services.principal_cache import principal_cache
+from app.services.user_service import create_user
 
 TEST_DB_URL = "sqlite+aiosqlite:///./test.db"
 
@@ -40,6 +47,50 @@ async def client(db_session: AsyncSession):
         yield db_session
 
     app.dependency_overrides[get_local_db] = override_get_local_db
+    # Tokens minted in different tests can collide; don't carry principals across
+    principal_cache.clear()
+    login_throttle.clear()
+    db_health.clear()
+    matview_service.clear()
+    rollup_service.clear()
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
     app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def user_token(client: AsyncClient, db_session: AsyncSession):
+    """Bearer token of a regular (non-superuser) user."""
+    await create_user(
+        db_session, UserCreate(email="user@example.com", password="secret")
+    )
+    login = await client.post(
+        "/auth/login", json={"email": "user@example.com", "password": "secret"}
+    )
+    return login.json()["access_token"]
+
+
+@pytest_asyncio.fixture
+async def heroku_session():
+    """In-memory SQLite stand-in for the Heroku DB, with the HerokuBase tables."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(HerokuBase.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def heroku_client(client: AsyncClient, heroku_session: AsyncSession):
+    async def override_get_heroku_db():
+        yield heroku_session
+
+    app.dependency_overrides[get_heroku_db] = override_get_heroku_db
+    app.dependency_overrides[get_heroku_read_db] = override_get_heroku_db
+    yield client
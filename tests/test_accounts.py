@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.heroku import HAccount, HChatMessage, HChatSession
+from app.services import analytics_service, matview_service
+from app.services.rollup_service import source_of
+
+
+@pytest.fixture
+async def seeded(heroku_session: AsyncSession):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=45)
+    heroku_session.add_all([
+        HAccount(id=1, account_organisation="Acme", account_unique_id="acme"),
+        HAccount(id=2, account_organisation="Globex", account_unique_id="globex"),
+        HChatSession(id=1, account_unique_id="acme", visitor_uuid="v1",
+                     start_time=now, initial_query_sentiment="positive"),
+        HChatSession(id=2, account_unique_id="acme", visitor_uuid="v2",
+                     start_time=now, initial_query_sentiment=None),
+        # Old session, but with one message inside the window
+        HChatSession(id=3, account_unique_id="acme", visitor_uuid="v3",
+                     start_time=old, initial_query_sentiment="negative"),
+        HChatSession(id=4, account_unique_id="globex", visitor_uuid="v4",
+                     start_time=now, initial_query_sentiment="positive"),
+        HChatMessage(message_id="m1", chat_session_id=1, sender_type="user",
+                     message_text="hi", timestamp=now),
+        HChatMessage(message_id="m2", chat_session_id=1, sender_type="bot",
+                     message_text="hello", timestamp=now),
+        HChatMessage(message_id="m3", chat_session_id=2, sender_type="user",
+                     message_text="?", timestamp=now),
+        HChatMessage(message_id="m4", chat_session_id=3, sender_type="user",
+                     message_text="old", timestamp=old),
+        HChatMessage(message_id="m5", chat_session_id=3, sender_type="user",
+                     message_text="back", timestamp=now),
+        HChatMessage(message_id="m6", chat_session_id=4, sender_type="user",
+                     message_text="other", timestamp=now),
+    ])
+    await heroku_session.commit()
+
+
+async def test_overview_combines_analytics_and_stripe(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    response = await heroku_client.get(
+        "/accounts/acme/overview", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["account"]["account_organisation"] == "Acme"
+    assert data["session_count"] == 2
+    assert data["message_count"] == 4
+    assert data["sentiments"][0] == {"sentiment": "positive", "count": 2}
+    assert {s["sentiment"]: s["count"] for s in data["sentiments"]} == {
+        "positive": 2,
+        None: 1,
+        "negative": 1,
+    }
+    assert data["stripe"]["subscription"] is None
+
+
+async def test_overview_unknown_account(heroku_client: AsyncClient, user_token, seeded):
+    response = await heroku_client.get(
+        "/accounts/nope/overview", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 404
+
+
+async def test_overview_waits_for_the_cancelled_stripe_fetch(
+    heroku_client: AsyncClient, user_token, seeded, monkeypatch
+):
+    import app.routers.accounts as accounts_router
+
+    unwound = []
+
+    async def slow_stripe(sub, local_db):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            unwound.append(True)
+
+    monkeypatch.setattr(accounts_router, "_fetch_stripe", slow_stripe)
+    monkeypatch.setattr(
+        accounts_router,
+        "_activity_by_sentiment",
+        lambda cutoff, account_ids=None: text("SELECT no_such_function()"),
+    )
+    with pytest.raises(OperationalError):
+        await heroku_client.get(
+            "/accounts/acme/overview", headers={"Authorization": f"Bearer {user_token}"}
+        )
+    # The Stripe task was cancelled and had finished before the error propagated
+    assert unwound == [True]
+
+
+async def test_list_accounts_with_metrics(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    response = await heroku_client.get(
+        "/accounts/?include=metrics", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 200
+    accounts = response.json()["accounts"]
+    metrics = {a["account_unique_id"]: a["metrics"] for a in accounts}
+    assert metrics["acme"] == {
+        "session_count": 2,
+        "message_count": 4,
+        "dominant_sentiment": "positive",
+    }
+    assert metrics["globex"]["message_count"] == 1
+
+
+async def test_list_accounts_without_metrics(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    response = await heroku_client.get(
+        "/accounts/", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 200
+    assert all("metrics" not in a for a in response.json()["accounts"])
+
+
+async def test_list_accounts_keyset_pages(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    first = (await heroku_client.get("/accounts/?limit=1", headers=headers)).json()
+    assert [a["account_unique_id"] for a in first["accounts"]] == ["acme"]
+    assert first["next_cursor"]
+    assert first["total"] == 2
+
+    second = (
+        await heroku_client.get(
+            f"/accounts/?limit=1&cursor={first['next_cursor']}", headers=headers
+        )
+    ).json()
+    assert [a["account_unique_id"] for a in second["accounts"]] == ["globex"]
+    assert second.get("next_cursor") is None
+
+
+async def test_list_accounts_search_sort_and_fields(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    response = await heroku_client.get(
+        "/accounts/?sort=-organisation&fields=k_value", headers=headers
+    )
+    accounts = response.json()["accounts"]
+    assert [a["account_unique_id"] for a in accounts] == ["globex", "acme"]
+    assert set(accounts[0]) == {
+        "id", "account_organisation", "account_unique_id", "k_value"
+    }
+
+    response = await heroku_client.get("/accounts/?search=glo", headers=headers)
+    assert [a["account_unique_id"] for a in response.json()["accounts"]] == ["globex"]
+    assert response.json()["total"] == 1
+
+    response = await heroku_client.get("/accounts/?fields=nope", headers=headers)
+    assert response.status_code == 400
+
+
+async def test_session_list_pages_and_batches_messages(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    response = await heroku_client.get(
+        "/accounts/acme/sessions",
+        params={"limit": 2, "include": "messages"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    # Newest first; sessions 1 and 2 share a start_time, so id breaks the tie
+    assert [s["id"] for s in body["sessions"]] == [2, 1]
+    assert [m["message_id"] for m in body["sessions"][1]["messages"]] == ["m1", "m2"]
+    assert body["sessions"][0]["initial_query_sentiment"] is None
+
+    response = await heroku_client.get(
+        "/accounts/acme/sessions",
+        params={"limit": 2, "cursor": body["next_cursor"]},
+        headers=headers,
+    )
+    body = response.json()
+    assert [s["id"] for s in body["sessions"]] == [3]
+    assert "messages" not in body["sessions"][0]
+    assert body.get("next_cursor") is None
+
+
+async def test_transcript_loads_older_messages_by_range(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    response = await heroku_client.get(
+        "/accounts/acme/sessions/3", params={"limit": 1}, headers=headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["session"]["initial_query_sentiment"] == "negative"
+    assert [m["message_id"] for m in body["messages"]] == ["m5"]
+
+    response = await heroku_client.get(
+        "/accounts/acme/sessions/3",
+        params={"limit": 1, "before": body["next_before"]},
+        headers=headers,
+    )
+    body = response.json()
+    assert [m["message_id"] for m in body["messages"]] == ["m4"]
+    assert body["next_before"] is None
+
+    # Another account's session is not reachable through this account
+    response = await heroku_client.get("/accounts/acme/sessions/4", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_approximate_count_is_exact_where_sampling_does_not_apply(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    response = await heroku_client.get(
+        "/accounts/acme/sessions/count?accuracy=approx",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    # SQLite has no TABLESAMPLE: the exact count comes back, flagged as such
+    assert response.json() == {
+        "count": 2, "period_days": 30, "approximate": False, "error_bound": None
+    }
+
+
+async def test_counts_read_fresh_materialized_views_then_fall_back_when_stale(
+    heroku_client: AsyncClient,
+    heroku_session: AsyncSession,
+    user_token,
+    seeded,
+    monkeypatch,
+):
+    # Plain tables standing in for the Postgres materialized views
+    day = (datetime.now(timezone.utc) - timedelta(days=5)).date().isoformat()
+    # The cutoff's day is only partly in the window, so it is counted live instead
+    cutoff_day = analytics_service.cutoff().date().isoformat()
+    for view, rows in (
+        (matview_service.SESSIONS_VIEW, [("acme", "positive", 10), ("acme", "", 3)]),
+        (matview_service.MESSAGES_VIEW, [("acme", "positive", 4), ("globex", "", 7)]),
+    ):
+        await heroku_session.execute(
+            text(
+                f"CREATE TABLE {view} "
+                "(day DATE, account_unique_id TEXT, sentiment TEXT, n INT)"
+            )
+        )
+        for row_day, (account, sentiment, n) in [(day, r) for r in rows] + [
+            (cutoff_day, ("acme", "positive", 100))
+        ]:
+            await heroku_session.execute(
+                text(f"INSERT INTO {view} VALUES (:day, :account, :sentiment, :n)"),
+                {"day": row_day, "account": account, "sentiment": sentiment, "n": n},
+            )
+    await heroku_session.commit()
+
+    monkeypatch.setattr(settings, "analytics_matviews_enabled", True)
+    for state in matview_service.refresh_states():
+        state.source = source_of(heroku_session)
+        state.refreshed_at = datetime.now(timezone.utc)
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    # View days plus the live tail since the last refresh's midnight
+    response = await heroku_client.get("/accounts/acme/sessions/count", headers=headers)
+    assert response.json()["count"] == 13 + 2
+    response = await heroku_client.get(
+        "/accounts/acme/messages/by-sentiment", headers=headers
+    )
+    assert response.json()["sentiments"] == [
+        {"sentiment": "positive", "count": 6},
+        {"sentiment": None, "count": 1},
+        {"sentiment": "negative", "count": 1},
+    ]
+
+    stale = timedelta(seconds=settings.analytics_matview_max_staleness_seconds + 1)
+    for state in matview_service.refresh_states():
+        state.refreshed_at -= stale
+    response = await heroku_client.get("/accounts/acme/sessions/count", headers=headers)
+    assert response.json()["count"] == 2
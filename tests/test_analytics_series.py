@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.services.analytics_service import (
+    bucket_starts,
+    resolve_window,
+    sampled_count_statement,
+    sampled_total,
+    top_sources_statement,
+    truncate,
+)
+
+UTC = timezone.utc
+
+
+def test_truncate_matches_postgres_date_trunc():
+    ts = datetime(2025, 3, 13, 15, 42, 7, tzinfo=UTC)  # a Thursday
+    assert truncate(ts, "hour") == datetime(2025, 3, 13, 15, tzinfo=UTC)
+    assert truncate(ts, "day") == datetime(2025, 3, 13, tzinfo=UTC)
+    assert truncate(ts, "week") == datetime(2025, 3, 10, tzinfo=UTC)
+
+
+def test_bucket_starts_cover_partial_edges():
+    starts = bucket_starts(
+        datetime(2025, 3, 1, 12, tzinfo=UTC), datetime(2025, 3, 4, 6, tzinfo=UTC), "day"
+    )
+    assert [s.day for s in starts] == [1, 2, 3, 4]
+
+
+def test_resolve_window_defaults_and_naive_input():
+    start, end = resolve_window(None, datetime(2025, 3, 31), "day")
+    assert end.tzinfo is UTC
+    assert (end - start).days == 30
+
+
+def test_resolve_window_rejects_bad_ranges():
+    with pytest.raises(HTTPException):
+        resolve_window(datetime(2025, 3, 2), datetime(2025, 3, 1), "day")
+    with pytest.raises(HTTPException):
+        resolve_window(datetime(2020, 1, 1), datetime(2025, 1, 1), "hour")
+
+
+def test_top_sources_is_one_grouped_postgres_query():
+    stmt = top_sources_statement(
+        datetime(2025, 3, 1, tzinfo=UTC), datetime(2025, 4, 1, tzinfo=UTC), 5, "acme"
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "jsonb_array_elements" in sql
+    # The source label is built from literals only, so SELECT and GROUP BY match
+    select_expr = sql.split("SELECT ", 1)[1].split(" AS anon_1", 1)[0]
+    assert f"GROUP BY {select_expr} ORDER BY" in sql
+    assert "%(" not in select_expr
+
+
+def test_sampled_total_scales_block_counts_with_an_error_bound():
+    # Every block sampled: exact, no uncertainty
+    assert sampled_total([3, 5, 4, 0], 4) == (12, 0)
+    estimate, bound = sampled_total([3, 5, 4, 0], 400)
+    assert estimate == 1200
+    assert 0 < bound < estimate
+    # Uniform blocks leave nothing to be uncertain about
+    assert sampled_total([7, 7, 7], 300) == (2100, 0)
+
+
+def test_sampled_total_counts_missing_sampled_blocks_as_empty():
+    # Four blocks sampled, but two had no rows at all and yielded no group
+    estimate, bound = sampled_total([6, 6], 100, sampled_blocks=4)
+    assert estimate == 300
+    assert bound > 0
+    assert sampled_total([6, 6, 0, 0], 100) == (estimate, bound)
+    # A sample that came out larger than expected is used as it is
+    assert sampled_total([6, 6, 6], 300, sampled_blocks=2) == (1800, 0)
+
+
+def test_sampled_count_keeps_every_sampled_block():
+    since = datetime(2025, 3, 1, tzinfo=UTC)
+    stmt = sampled_count_statement("messages", since, 1.0, "acme")
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "FROM chatmessage AS sampled TABLESAMPLE system(1)" in sql
+    # The account filter is on an outer join inside FILTER, so non-matching
+    # blocks count 0
+    assert "LEFT OUTER JOIN chatsession" in sql
+    assert "count(*) FILTER (WHERE" in sql
+    assert "WHERE" not in sql.split("FILTER (WHERE", 1)[1].split(")", 1)[1]
@@ -4,7 +4,10 @@ import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.schemas.user import UserCreate
+from app.services import auth_service
+from app.services.auth_service import needs_rehash, verify_password
 from app.services.user_service import create_user
 
 
@@ -46,3 +49,82 @@ async def test_me_returns_current_user(client: AsyncClient, superuser):
 async def test_me_unauthenticated(client: AsyncClient):
     response = await client.get("/auth/me")
     assert response.status_code == 401
+
+
+async def test_repeat_requests_skip_user_lookup(
+    client: AsyncClient, superuser, monkeypatch
+):
+    import app.dependencies as deps
+
+    login = await client.post(
+        "/auth/login", json={"email": "admin@example.com", "password": "secret"}
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    await client.post("/auth/logout", headers=headers)
+
+    lookups = []
+    original = deps.get_user_by_email
+
+    async def counting_lookup(db, email):
+        lookups.append(email)
+        return await original(db, email)
+
+    monkeypatch.setattr(deps, "get_user_by_email", counting_lookup)
+    assert (await client.post("/auth/logout", headers=headers)).status_code == 204
+    assert lookups == []
+
+
+async def test_deactivated_user_token_rejected_immediately(
+    client: AsyncClient, superuser, db_session: AsyncSession
+):
+    other = await create_user(
+        db_session, UserCreate(email="temp@example.com", password="pw")
+    )
+    admin_login = await client.post(
+        "/auth/login", json={"email": "admin@example.com", "password": "secret"}
+    )
+    admin = {"Authorization": f"Bearer {admin_login.json()['access_token']}"}
+    login = await client.post(
+        "/auth/login", json={"email": "temp@example.com", "password": "pw"}
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+
+    await client.patch(f"/users/{other.id}", json={"is_active": False}, headers=admin)
+    assert (await client.get("/auth/me", headers=headers)).status_code == 401
+
+
+async def test_login_throttled_after_repeated_failures(client: AsyncClient, superuser):
+    for _ in range(settings.login_max_failures_per_email):
+        response = await client.post(
+            "/auth/login", json={"email": "admin@example.com", "password": "wrong"}
+        )
+        assert response.status_code == 401
+    # Even the right password is refused until the window passes
+    response = await client.post(
+        "/auth/login", json={"email": "admin@example.com", "password": "secret"}
+    )
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+async def test_login_rehashes_when_cost_factor_changes(
+    client: AsyncClient, superuser, db_session: AsyncSession, monkeypatch
+):
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    assert needs_rehash(superuser.hashed_password)
+    response = await client.post(
+        "/auth/login", json={"email": "admin@example.com", "password": "secret"}
+    )
+    assert response.status_code == 200
+    await db_session.refresh(superuser)
+    assert superuser.hashed_password.startswith("$2b$04$")
+    assert await verify_password("secret", superuser.hashed_password)
+
+
+async def test_hasher_rejects_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_workers", 1)
+    monkeypatch.setattr(settings, "password_hash_max_queue", 0)
+    monkeypatch.setitem(auth_service._hasher, "pending", 1)
+    with pytest.raises(auth_service.PasswordHasherBusy):
+        await auth_service.hash_password("x")
@@ -2,9 +2,21 @@ from __future__ import annotations
 
 import pytest
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from app import database
+from app.config import Settings
+from app.database import (
+    HerokuFollower,
+    check_followers,
+    get_heroku_read_session_factory,
+    heroku_engine_options,
+    make_heroku_engine,
+)
 from app.schemas.user import UserCreate
+from app.services import db_connection_service, slow_query_log
 from app.services.user_service import create_user
 
 
@@ -37,14 +49,10 @@ async def test_test_connection_invalid_url(client: AsyncClient, superuser_token)
 
 
 async def test_status_not_configured(client: AsyncClient, superuser_token, tmp_path, monkeypatch):
-    # Point dotenv_values to a temp dir with no DATABASE_URL
+    # No active Heroku engine
     import app.routers.db_connection as db_conn_router
 
-    monkeypatch.setattr(
-        db_conn_router,
-        "dotenv_values",
-        lambda path: {},
-    )
+    monkeypatch.setattr(db_conn_router, "get_heroku_url", lambda: None)
     response = await client.get(
         "/db-connection/status",
         headers={"Authorization": f"Bearer {superuser_token}"},
@@ -53,3 +61,195 @@ async def test_status_not_configured(client: AsyncClient, superuser_token, tmp_p
     data = response.json()
     assert data["configured"] is False
     assert data["reachable"] is False
+
+
+@pytest.fixture
+def followers():
+    engines = [create_async_engine("sqlite+aiosqlite:///:memory:") for _ in range(2)]
+    followers = [
+        HerokuFollower(
+            source=f"replica-{i}:5432/db",
+            engine=engine,
+            session_factory=async_sessionmaker(
+                engine, info={"source": "primary:5432/db"}
+            ),
+        )
+        for i, engine in enumerate(engines)
+    ]
+    database._followers["followers"] = followers
+    yield followers
+    database._followers["followers"] = []
+
+
+async def test_read_factory_falls_back_to_primary_without_healthy_followers(followers):
+    assert get_heroku_read_session_factory() is database.get_heroku_session_factory()
+
+
+async def test_read_factory_round_robins_healthy_followers(followers):
+    followers[0].healthy = followers[1].healthy = True
+    picked = {get_heroku_read_session_factory() for _ in range(4)}
+    assert picked == {f.session_factory for f in followers}
+
+
+async def test_failed_health_check_takes_follower_out_of_rotation(followers):
+    followers[0].healthy = True
+    # SQLite has no pg_is_in_recovery(), so the probe fails
+    await check_followers()
+    assert not followers[0].healthy
+    assert followers[0].last_error
+
+
+async def test_engine_stats_lists_followers(
+    client: AsyncClient, superuser_token, followers
+):
+    response = await client.get(
+        "/db-connection/engines", headers={"Authorization": f"Bearer {superuser_token}"}
+    )
+    assert response.status_code == 200
+    engines = response.json()["engines"]
+    assert [e["source"] for e in engines if e["role"] == "follower"] == [
+        "replica-0:5432/db",
+        "replica-1:5432/db",
+    ]
+
+
+def test_engine_options_follow_pool_settings():
+    config = Settings(
+        heroku_pool_size=3, heroku_max_overflow=0, heroku_statement_cache_size=50
+    )
+    engine = make_heroku_engine("postgres://u:p@localhost:5432/db", config)
+    assert engine.pool.size() == 3
+    assert heroku_engine_options(config)["connect_args"] == {"statement_cache_size": 50}
+
+
+def test_pgbouncer_mode_disables_statement_caches():
+    options = heroku_engine_options(Settings(heroku_pgbouncer=True))
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name = connect_args["prepared_statement_name_func"]
+    assert name() != name()
+
+
+async def test_status_is_served_from_the_last_check(
+    client: AsyncClient, superuser_token, monkeypatch
+):
+    import app.routers.db_connection as db_conn_router
+
+    calls = []
+
+    async def fake_test_connection(url):
+        calls.append(url)
+        return True, "Connection successful", "PostgreSQL 16"
+
+    monkeypatch.setattr(db_conn_router, "get_heroku_url", lambda: "postgres://h/db")
+    monkeypatch.setattr(db_connection_service, "test_connection", fake_test_connection)
+    for _ in range(3):
+        response = await client.get(
+            "/db-connection/status",
+            headers={"Authorization": f"Bearer {superuser_token}"},
+        )
+        assert response.json()["reachable"] is True
+        assert response.json()["latency_ms"] is not None
+    assert calls == ["postgres://h/db"]
+
+
+async def test_live_engine_is_reused_for_its_own_url():
+    database.init_heroku_engine("postgres://u:p@localhost:5432/db")
+    try:
+        live = database.get_live_heroku_engine("postgresql://u:p@localhost:5432/db")
+        assert live is database._heroku["engine"]
+        other = "postgres://u:p@localhost:5432/other"
+        assert database.get_live_heroku_engine(other) is None
+    finally:
+        await database.dispose_heroku_engine()
+
+
+@pytest.fixture
+def sqlite_heroku_engines(tmp_path, monkeypatch):
+    """
+    make_heroku_engine() returning SQLite engines:
+    postgres://h/<file> -> tmp_path/<file>.
+    """
+    monkeypatch.setattr(
+        database,
+        "make_heroku_engine",
+        lambda url, config=None: create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / url.split('://h/')[1]}"
+        ),
+    )
+    yield
+    database._publish(None)
+
+
+async def test_swap_keeps_old_engine_until_in_flight_sessions_finish(
+    sqlite_heroku_engines,
+):
+    database.init_heroku_engine("postgres://h/old.db")
+    old = database._heroku["handle"]
+
+    async with database.heroku_session():
+        await database.swap_heroku_engine("postgres://h/new.db")
+        # New requests already get the new engine; the old one is still serving this one
+        assert database.get_heroku_url() == "postgres://h/new.db"
+        assert old.retired and not old.drained.is_set()
+
+    assert old.drained.is_set()
+    await old.drain_task
+    assert old not in database._heroku["draining"]
+    await database.dispose_heroku_engine()
+
+
+async def test_failed_warm_up_leaves_active_engine_in_place(sqlite_heroku_engines):
+    database.init_heroku_engine("postgres://h/old.db")
+    with pytest.raises(OperationalError):
+        await database.swap_heroku_engine("postgres://h/missing-dir/new.db")
+    assert database.get_heroku_url() == "postgres://h/old.db"
+    await database.dispose_heroku_engine()
+
+
+async def test_slow_queries_are_recorded_and_reported(
+    client: AsyncClient, superuser_token, test_engine
+):
+    config = Settings(slow_query_threshold_ms=0, slow_query_buffer_size=3)
+    slow_query_log.install(
+        async_sessionmaker(test_engine, expire_on_commit=False), [test_engine], config
+    )
+    heroku = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with heroku.connect() as conn:
+            for _ in range(4):
+                await conn.execute(text("SELECT :n AS n"), {"n": 1})
+            await conn.execute(text("SELECT 'x' AS other"))
+        await slow_query_log.flush()
+    finally:
+        slow_query_log.uninstall()
+        await heroku.dispose()
+
+    response = await client.get(
+        "/db-connection/slow-queries",
+        headers={"Authorization": f"Bearer {superuser_token}"},
+    )
+    assert response.status_code == 200
+    offenders = response.json()["offenders"]
+    # Ring buffer of 3: the oldest two SELECT :n runs were dropped
+    assert sorted(o["calls"] for o in offenders) == [1, 2]
+    by_calls = {o["calls"]: o for o in offenders}
+    assert by_calls[2]["statement"] == "SELECT ? AS n"
+    assert by_calls[2]["parameter_shapes"] == ["int"]
+    assert by_calls[2]["plan"] is None  # EXPLAIN is Postgres-only
+
+
+async def test_only_plain_selects_are_explained():
+    engine = create_async_engine("postgresql+asyncpg://u@localhost/db")
+    try:
+        assert slow_query_log._explainable(engine.sync_engine, "  select 1")
+        # EXPLAIN ANALYZE runs the statement: a data-modifying CTE would run twice
+        assert not slow_query_log._explainable(
+            engine.sync_engine,
+            "WITH gone AS (DELETE FROM chatmessage RETURNING 1) "
+            "SELECT count(*) FROM gone",
+        )
+        assert not slow_query_log._explainable(engine.sync_engine, "UPDATE t SET x = 1")
+    finally:
+        await engine.dispose()
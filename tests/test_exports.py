@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.heroku import HAccount, HChatMessage, HChatSession
+from app.services import export_service
+
+
+@pytest.fixture
+async def seeded(heroku_session: AsyncSession):
+    heroku_session.add_all([
+        HAccount(id=1, account_organisation="Acme", account_unique_id="acme"),
+        HChatSession(id=1, account_unique_id="acme", visitor_uuid="v1",
+                     start_time=datetime(2025, 3, 1, tzinfo=timezone.utc)),
+        HChatSession(id=2, account_unique_id="globex", visitor_uuid="v2",
+                     start_time=datetime(2025, 3, 1, tzinfo=timezone.utc)),
+    ])
+    heroku_session.add_all([
+        HChatMessage(message_id=f"m{i}", chat_session_id=1 + i % 2, sender_type="user",
+                     message_text=f"msg, {i}", timestamp=datetime(2025, 3, 1, i),
+                     source_files=[{"file": f"doc{i}.pdf"}] if i % 3 == 0 else None)
+        for i in range(10)
+    ])
+    await heroku_session.commit()
+
+
+async def test_ndjson_export_streams_every_row_in_batches(
+    heroku_session: AsyncSession, seeded, monkeypatch
+):
+    monkeypatch.setattr(export_service.settings, "export_batch_size", 3)
+    stmt = export_service.export_statement("messages")
+    stream = export_service.stream_export(heroku_session, stmt, "ndjson")
+    chunks = [c async for c in stream]
+    assert len(chunks) == 4  # 10 rows in batches of 3
+    rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [r["message_id"] for r in rows] == [f"m{i}" for i in range(10)]
+    assert rows[0]["source_files"] == [{"file": "doc0.pdf"}]
+    assert rows[1]["source_files"] is None
+
+
+async def test_account_csv_export_filters_by_account_and_date(
+    heroku_client: AsyncClient, user_token, seeded
+):
+    response = await heroku_client.get(
+        "/accounts/acme/export/messages",
+        params={
+            "format": "csv",
+            "from": "2025-03-01T04:00:00",
+            "to": "2025-03-01T09:00:00",
+        },
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["message_id"] for r in rows] == ["m4", "m6", "m8"]
+    assert rows[0]["message_text"] == "msg, 4"
+
+    # A naive bound is taken as UTC, so it can be compared with an aware one
+    response = await heroku_client.get(
+        "/accounts/acme/export/messages",
+        params={"format": "csv", "from": "2025-03-01T04:00:00",
+                "to": "2025-03-01T09:00:00+00:00"},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 200
+    assert [r["message_id"] for r in csv.DictReader(io.StringIO(response.text))] == [
+        "m4", "m6", "m8"
+    ]
+
+
+async def test_gzip_export(heroku_client: AsyncClient, user_token, seeded):
+    response = await heroku_client.get(
+        "/analytics/export/sessions",
+        params={"gzip": "true"},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 200
+    disposition = response.headers["content-disposition"]
+    assert 'filename="sessions-all.ndjson.gz"' in disposition
+    rows = gzip.decompress(response.content).splitlines()
+    assert [json.loads(r)["account_unique_id"] for r in rows] == ["acme", "globex"]
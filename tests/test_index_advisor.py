@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from app.services.index_advisor import (
+    ACCESS_PATHS,
+    BRIN_MIN_ROWS,
+    ExistingIndex,
+    Recommendation,
+    TableStats,
+    apply,
+    parse_indexdef,
+    recommend,
+)
+
+
+def test_parse_indexdef_keeps_key_columns_only():
+    index = parse_indexdef(
+        "chatsession",
+        "ix_a",
+        "CREATE INDEX ix_a ON public.chatsession USING btree "
+        '(account_unique_id, "start_time" DESC) INCLUDE (id) WHERE (end_time IS NULL)',
+    )
+    assert index.method == "btree"
+    assert index.columns == ("account_unique_id", "start_time")
+
+
+def _stats(table: str, rows: int, correlation: float) -> TableStats:
+    columns = {"start_time": correlation, "timestamp": correlation}
+    return TableStats(table, rows, 0, 0, 0, columns)
+
+
+def test_model_indexes_leave_time_access_paths_uncovered():
+    indexes = [
+        ExistingIndex("chatsession", "ix_chatsession_account_unique_id", "btree",
+                      ("account_unique_id",)),
+        ExistingIndex("chatmessage", "ix_chatmessage_chat_session_id", "btree",
+                      ("chat_session_id",)),
+    ]
+    stats = {t: _stats(t, 10_000, 1.0) for t in ("chatsession", "chatmessage")}
+    recommendations = recommend(indexes, stats)
+    covered = {
+        (rec.path.table, rec.path.columns): rec.covered_by for rec in recommendations
+    }
+    # The search keyset's (timestamp, message_id) B-tree also serves timestamp ranges
+    assert covered.pop(("chatmessage", ("timestamp",))) == (
+        "ix_chatmessage_timestamp_message_id"
+    )
+    assert all(name is None for name in covered.values())
+    assert [rec.method for rec in recommendations] == ["btree"] * 5
+    assert recommendations[0].ddl == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        "ix_chatsession_account_unique_id_start_time_id ON chatsession "
+        "USING btree (account_unique_id, start_time, id)"
+    )
+
+
+def test_large_time_ordered_tables_get_brin_and_wider_indexes_cover_prefixes():
+    indexes = [
+        ExistingIndex("chatmessage", "ix_wide", "btree",
+                      ("chat_session_id", "timestamp", "message_id", "sender_type")),
+    ]
+    stats = {
+        "chatsession": _stats("chatsession", BRIN_MIN_ROWS, 0.2),
+        "chatmessage": _stats("chatmessage", BRIN_MIN_ROWS, 0.99),
+    }
+    by_path = {(r.path.table, r.path.columns): r for r in recommend(indexes, stats)}
+    per_session = ("chat_session_id", "timestamp", "message_id")
+    assert by_path[("chatmessage", per_session)].covered_by == "ix_wide"
+    assert by_path[("chatmessage", ("timestamp",))].method == "brin"
+    assert by_path[("chatmessage", ("timestamp",))].covered_by is None
+    # Poorly correlated (updated/backfilled) tables keep a B-tree
+    assert by_path[("chatsession", ("start_time",))].method == "btree"
+
+
+class _Catalog:
+    """Stands in for an AUTOCOMMIT connection: answers the validity lookup, logs DDL."""
+
+    def __init__(self, valid: Optional[bool]) -> None:
+        self.valid = valid
+        self.executed: List[str] = []
+
+    async def execute(self, statement, parameters=None):
+        self.executed.append(str(statement))
+        return self
+
+    def scalar(self) -> Optional[bool]:
+        return self.valid
+
+
+async def test_apply_rebuilds_an_invalid_index_left_by_an_interrupted_build():
+    rec = Recommendation(ACCESS_PATHS[1], "btree")
+    conn = _Catalog(valid=False)
+    await apply(conn, rec)
+    # IF NOT EXISTS would keep the INVALID index, so it is dropped first
+    assert conn.executed[1:] == [
+        f"DROP INDEX CONCURRENTLY IF EXISTS {rec.name}",
+        rec.ddl,
+        "ANALYZE chatsession",
+    ]
+
+    conn = _Catalog(valid=None)
+    await apply(conn, rec)
+    assert conn.executed[1:] == [rec.ddl, "ANALYZE chatsession"]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.services import metrics
+
+
+async def test_metrics_records_route_templates(client: AsyncClient):
+    await client.get("/health")
+    await client.get("/accounts/acct-1/sessions")  # 401, but still a matched route
+    await client.get("/no-such-page")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}'
+        in body
+    )
+    assert 'route="/accounts/{account_unique_id}/sessions",status="401"' in body
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'http_response_size_bytes_count{method="GET",route="/health"}' in body
+
+
+async def test_instrumented_engine_records_queries_and_checkouts():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    metrics.instrument_engine(engine, "metrics_test")
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await conn.execute(text("SELECT 2"))
+    # dispose() replaces the pool; the instrumentation must carry over to the new one
+    await engine.dispose()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 3"))
+    await engine.dispose()
+
+    body = metrics.render()
+    assert 'db_query_duration_seconds_count{engine="metrics_test"} 3' in body
+    assert 'db_pool_checkouts_total{engine="metrics_test"} 2.0' in body
+    assert 'db_pool_connect_seconds_count{engine="metrics_test"} 2' in body
+    assert 'db_pool_hold_seconds_count{engine="metrics_test"} 2' in body
+
+
+async def test_timed_pool_records_checkout_wait(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/wait.db",
+        poolclass=metrics.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    waits = []
+    metrics.listen_pool_timings(
+        engine, on_connect=lambda s: None, on_hold=lambda s: None, on_wait=waits.append
+    )
+
+    async def contend() -> None:
+        async with engine.connect() as held:
+            await held.execute(text("SELECT 1"))
+            # The only connection is taken: this checkout queues until it returns
+            waiter = asyncio.create_task(engine.connect().start())
+            await asyncio.sleep(0.1)
+        await (await waiter).close()
+
+    await contend()
+    # dispose() recreates the pool with the same class
+    await engine.dispose()
+    await contend()
+    await engine.dispose()
+
+    assert len(waits) == 4
+    assert waits[1] >= 0.09 and waits[3] >= 0.09
+    assert max(waits[0], waits[2]) < 0.09
+
+
+def test_stripe_endpoint_collapses_object_ids():
+    assert metrics.stripe_endpoint("/v1/customers/cus_Abc123") == "/v1/customers/{id}"
+    assert metrics.stripe_endpoint("/v1/payment_methods") == "/v1/payment_methods"
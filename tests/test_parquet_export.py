@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.heroku import HChatMessage, HChatSession
+from app.services import parquet_export
+from app.services.parquet_export import run_export
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _session(id: int, account: str, start: datetime) -> HChatSession:
+    return HChatSession(
+        id=id, account_unique_id=account, visitor_uuid=f"v{id}", start_time=start
+    )
+
+
+async def test_export_partitions_by_account_and_month_and_appends(
+    heroku_session: AsyncSession, db_session: AsyncSession, tmp_path
+):
+    heroku_session.add_all([
+        _session(1, "acme", datetime(2025, 1, 31, 23, tzinfo=timezone.utc)),
+        _session(2, "acme", datetime(2025, 2, 1, 1, tzinfo=timezone.utc)),
+        _session(3, "globex", datetime(2025, 2, 3, tzinfo=timezone.utc)),
+        HChatMessage(message_id="m1", chat_session_id=1, sender_type="user",
+                     message_text="hi", timestamp=datetime(2025, 1, 31, 23, 5),
+                     source_files=[{"file": "a.pdf"}]),
+    ])
+    await heroku_session.commit()
+
+    first = {r.kind: r for r in await run_export(heroku_session, db_session, tmp_path)}
+    assert first["sessions"].rows == 3
+    assert sorted(p.relative_to(tmp_path / "sessions").parent.as_posix()
+                  for p in (tmp_path / "sessions").rglob("*.parquet")) == [
+        "account=acme/month=2025-01",
+        "account=acme/month=2025-02",
+        "account=globex/month=2025-02",
+    ]
+    messages = pq.read_table(first["messages"].files[0]).to_pylist()
+    assert messages[0]["account_unique_id"] == "acme"
+    assert messages[0]["source_files"] == '[{"file": "a.pdf"}]'
+
+    # Only rows newer than the previous run's mark are exported next time
+    late = first["sessions"].exported_through + timedelta(microseconds=1)
+    heroku_session.add(_session(4, "acme", late))
+    await heroku_session.commit()
+    second = {r.kind: r for r in await run_export(heroku_session, db_session, tmp_path)}
+    assert second["sessions"].rows == 1
+    assert second["messages"].rows == 0
+    sessions = pq.read_table(second["sessions"].files[0]).to_pylist()
+    assert [row["id"] for row in sessions] == [4]
+    assert len(list((tmp_path / "sessions").rglob("*.parquet"))) == 4
+
+
+async def test_rows_committed_late_within_the_overlap_are_exported_once(
+    heroku_session: AsyncSession, db_session: AsyncSession, tmp_path
+):
+    now = datetime.now(timezone.utc)
+    heroku_session.add(_session(1, "acme", now - timedelta(minutes=20)))
+    await heroku_session.commit()
+    first = await run_export(heroku_session, db_session, tmp_path, kinds=["sessions"])
+    assert first[0].rows == 1
+
+    # Committed after the run, but timestamped before its mark
+    late = first[0].exported_through - timedelta(minutes=5)
+    heroku_session.add(_session(2, "acme", late))
+    await heroku_session.commit()
+    second = await run_export(heroku_session, db_session, tmp_path, kinds=["sessions"])
+    assert second[0].rows == 1
+    assert [row["id"] for row in pq.read_table(second[0].files[0]).to_pylist()] == [2]
+    third = await run_export(heroku_session, db_session, tmp_path, kinds=["sessions"])
+    assert third[0].rows == 0
+    ids = [
+        row["id"]
+        for path in (tmp_path / "sessions").rglob("*.parquet")
+        for row in pq.read_table(path).to_pylist()
+    ]
+    assert sorted(ids) == [1, 2]
+
+
+async def test_export_job_runs_in_background_and_rejects_overlap(
+    heroku_session: AsyncSession, db_session: AsyncSession, tmp_path
+):
+    heroku_session.add(_session(1, "acme", datetime(2025, 1, 31, tzinfo=timezone.utc)))
+    await heroku_session.commit()
+    heroku_factory = async_sessionmaker(heroku_session.bind, expire_on_commit=False)
+    local_factory = async_sessionmaker(db_session.bind, expire_on_commit=False)
+
+    task = parquet_export.start_export_job(heroku_factory, local_factory, root=tmp_path)
+    assert parquet_export.export_job().status == "running"
+    with pytest.raises(parquet_export.ExportAlreadyRunning):
+        parquet_export.start_export_job(heroku_factory, local_factory, root=tmp_path)
+    await task
+
+    job = parquet_export.export_job()
+    assert job.status == "succeeded", job.error
+    assert {r.kind: r.rows for r in job.results} == {"sessions": 1, "messages": 0}
+    assert job.finished_at is not None
+
+
+async def test_restart_keeps_old_snapshot_until_new_one_is_complete(
+    heroku_session: AsyncSession, db_session: AsyncSession, tmp_path, monkeypatch
+):
+    heroku_session.add(_session(1, "acme", datetime(2025, 1, 31, tzinfo=timezone.utc)))
+    await heroku_session.commit()
+    await run_export(heroku_session, db_session, tmp_path, kinds=["sessions"])
+    old_files = sorted((tmp_path / "sessions").rglob("*.parquet"))
+
+    async def broken_stream(*args, **kwargs):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(heroku_session, "stream", broken_stream)
+    with pytest.raises(RuntimeError):
+        await run_export(
+            heroku_session, db_session, tmp_path, kinds=["sessions"], restart=True
+        )
+    assert sorted((tmp_path / "sessions").rglob("*.parquet")) == old_files
+    assert [p.name for p in tmp_path.iterdir()] == ["sessions"]
+
+
+async def test_switching_source_db_replaces_snapshot(
+    heroku_session: AsyncSession, db_session: AsyncSession, tmp_path
+):
+    heroku_session.add(_session(1, "acme", datetime(2025, 1, 31, tzinfo=timezone.utc)))
+    await heroku_session.commit()
+    await run_export(heroku_session, db_session, tmp_path, kinds=["sessions"])
+
+    heroku_session.info["source"] = "other-host:5432/chat"
+    heroku_session.add(_session(2, "globex", datetime(2025, 2, 3, tzinfo=timezone.utc)))
+    await heroku_session.commit()
+    (result,) = await run_export(
+        heroku_session, db_session, tmp_path, kinds=["sessions"]
+    )
+
+    # The new source's mark starts empty, so everything is exported afresh
+    assert result.rows == 2
+    files = sorted((tmp_path / "sessions").rglob("*.parquet"))
+    assert [str(f) for f in files] == sorted(result.files)
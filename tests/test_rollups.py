@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from httpx import AsyncClient
+from sqlalchemy import Date, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies import get_current_user
+from app.main import app
+from app.models.analytics_rollup import AnalyticsDailyRollup, AnalyticsRollupState
+from app.models.heroku import HChatMessage, HChatSession
+from app.services import analytics_service, rollup_service
+from app.services.principal_cache import Principal
+
+
+async def test_upsert_merges_session_and_message_counts(db_session: AsyncSession):
+    day = date(2025, 1, 10)
+    await rollup_service._upsert(
+        db_session, [(day, "acc-1", "positive", 3)], "session_count"
+    )
+    await rollup_service._upsert(
+        db_session, [(day, "acc-1", "positive", 7)], "message_count"
+    )
+    await db_session.commit()
+
+    rows = (await db_session.execute(select(AnalyticsDailyRollup))).scalars().all()
+    assert len(rows) == 1
+    assert (rows[0].session_count, rows[0].message_count) == (3, 7)
+
+
+async def test_read_rollups_respects_since_and_maps_unclassified(
+    db_session: AsyncSession,
+):
+    await rollup_service._upsert(
+        db_session,
+        [
+            (date(2025, 1, 1), "acc-1", "positive", 5),
+            (date(2025, 1, 2), "acc-1", None, 2),
+            (date(2025, 1, 3), "acc-2", "positive", 4),
+        ],
+        "message_count",
+    )
+    await db_session.commit()
+
+    _, messages = await rollup_service.read_rollup_totals(db_session, date(2025, 1, 2))
+    assert messages == 6
+    sentiments = await rollup_service.read_rollup_sentiments(
+        db_session, date(2025, 1, 2)
+    )
+    assert sentiments == {"positive": 4, None: 2}
+
+
+async def test_switching_source_discards_old_rollups(db_session: AsyncSession):
+    await rollup_service._load_state(db_session, "old-host:5432/app")
+    await rollup_service._upsert(
+        db_session, [(date(2025, 1, 1), "acc-1", "positive", 5)], "session_count"
+    )
+    await db_session.commit()
+
+    await rollup_service._load_state(db_session, "new-host:5432/app")
+    await db_session.commit()
+
+    assert (await db_session.execute(select(AnalyticsDailyRollup))).first() is None
+    states = (await db_session.execute(select(AnalyticsRollupState))).scalars().all()
+    assert [s.source for s in states] == ["new-host:5432/app"]
+
+
+async def test_count_endpoints_match_exact_counts(
+    heroku_client: AsyncClient, heroku_session: AsyncSession, monkeypatch
+):
+    # timezone() is Postgres-only; the stand-in stores naive UTC timestamps
+    monkeypatch.setattr(
+        rollup_service, "_utc_day", lambda column: func.date(column, type_=Date)
+    )
+    today = rollup_service._today()
+    # Mid-day cutoff, so its day is only partly inside the window
+    cutoff = today - timedelta(days=10) + timedelta(hours=12)
+    monkeypatch.setattr(analytics_service, "cutoff", lambda: cutoff)
+    app.dependency_overrides[get_current_user] = lambda: Principal(
+        id=1, email="a@example.com", is_active=True, is_superuser=False
+    )
+    times = [
+        cutoff - timedelta(days=1),
+        cutoff - timedelta(hours=1),  # the cutoff's day, before the cutoff
+        cutoff + timedelta(hours=1),  # the cutoff's day, after the cutoff
+        today - timedelta(days=5),
+        today - timedelta(hours=3),
+        today + timedelta(minutes=1),
+    ]
+
+    def add(n: int, start_time):
+        heroku_session.add_all([
+            HChatSession(id=n, account_unique_id="acme", visitor_uuid=f"v{n}",
+                         start_time=start_time, initial_query_sentiment="positive"),
+            HChatMessage(message_id=f"m{n}", chat_session_id=n, sender_type="user",
+                         message_text="hi", timestamp=start_time),
+        ])
+
+    for n, start_time in enumerate(times):
+        add(n, start_time)
+    await heroku_session.commit()
+
+    async def exact(column) -> int:
+        stmt = select(func.count()).where(column >= cutoff)
+        return (await heroku_session.execute(stmt)).scalar_one()
+
+    async def counts():
+        sessions = await heroku_client.get("/analytics/sessions/count")
+        messages = await heroku_client.get("/analytics/messages/count")
+        sentiments = await heroku_client.get("/analytics/messages/by-sentiment")
+        return (
+            sessions.json()["count"],
+            messages.json()["count"],
+            sentiments.json()["sentiments"][0]["count"],
+        )
+
+    expected = await exact(HChatSession.start_time)
+    assert expected == 4
+    assert await counts() == (expected, expected, expected)
+
+    # A row for yesterday arriving after yesterday was rolled up is picked up by the
+    # next refresh's overlap window
+    add(len(times), today - timedelta(hours=2))
+    await heroku_session.commit()
+    rollup_service.clear()
+    assert await counts() == (5, 5, 5)
+    assert await exact(HChatMessage.timestamp) == 5
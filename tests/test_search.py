@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.heroku import HChatMessage, HChatSession
+from app.services import search_service
+
+
+@pytest.fixture
+async def indexed(heroku_session: AsyncSession, db_session: AsyncSession):
+    await db_session.execute(text("DELETE FROM message_search"))
+    start = datetime(2025, 3, 1)
+    heroku_session.add_all([
+        HChatSession(
+            id=1, account_unique_id="acme", visitor_uuid="v1", start_time=start
+        ),
+        HChatSession(
+            id=2, account_unique_id="globex", visitor_uuid="v2", start_time=start
+        ),
+    ])
+    texts = [
+        "How do I reset my password?",
+        "Password reset link expired",
+        "Where is the invoice for March?",
+        "Refund for a duplicate invoice",
+        "Passwords must be long",
+    ]
+    heroku_session.add_all([
+        HChatMessage(message_id=f"m{i}", chat_session_id=1 + i % 2, sender_type="user",
+                     message_text=t, timestamp=start + timedelta(minutes=i))
+        for i, t in enumerate(texts)
+    ])
+    await heroku_session.commit()
+    count = await search_service.refresh_index(
+        heroku_session, db_session, batch_size=2
+    )
+    assert count == 5
+
+
+async def test_refresh_is_incremental(
+    heroku_session: AsyncSession, db_session, indexed
+):
+    assert await search_service.refresh_index(heroku_session, db_session) == 0
+    heroku_session.add(HChatMessage(message_id="m9", chat_session_id=1,
+                                    sender_type="bot",
+                                    message_text="Your password was reset",
+                                    timestamp=datetime(2025, 3, 2)))
+    await heroku_session.commit()
+    assert await search_service.refresh_index(heroku_session, db_session) == 1
+
+
+async def test_refresh_picks_up_late_commits_within_the_overlap(
+    heroku_session: AsyncSession, db_session, indexed
+):
+    # Committed after m4 was indexed, but timestamped before it
+    heroku_session.add(HChatMessage(message_id="late", chat_session_id=1,
+                                    sender_type="user", message_text="late password",
+                                    timestamp=datetime(2025, 3, 1, 0, 2, 30)))
+    await heroku_session.commit()
+    assert await search_service.refresh_index(heroku_session, db_session) == 1
+    # Re-reading the overlap window doesn't index anything twice
+    assert await search_service.refresh_index(heroku_session, db_session) == 0
+    hits, _ = await search_service.search(db_session, "late")
+    assert [hit.message_id for hit in hits] == ["late"]
+    state = await search_service.index_state(db_session)
+    assert (state.last_message_id, state.messages_indexed) == ("m4", 6)
+
+
+async def test_search_ranks_filters_and_paginates(
+    client: AsyncClient, user_token, indexed
+):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    response = await client.get(
+        "/search/", params={"q": "password reset"}, headers=headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert {r["message_id"] for r in body["results"]} == {"m0", "m1"}
+    assert "**password**" in body["results"][0]["snippet"].lower()
+    assert body["indexed_through"] is not None
+
+    response = await client.get(
+        "/search/", params={"q": "invoice", "account": "globex"}, headers=headers
+    )
+    assert [r["message_id"] for r in response.json()["results"]] == ["m3"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "pass*", "limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/search/", params=params, headers=headers)).json()
+        seen += [r["message_id"] for r in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == ["m0", "m1", "m4"]
+
+
+async def test_later_pages_ignore_messages_indexed_after_the_first(
+    heroku_session: AsyncSession, db_session: AsyncSession, indexed
+):
+    first, cursor = await search_service.search(db_session, "pass*", limit=2)
+    # Indexing more matches reweights BM25 for every entry between page requests
+    heroku_session.add_all([
+        HChatMessage(message_id=f"n{i}", chat_session_id=1, sender_type="bot",
+                     message_text="password password password",
+                     timestamp=datetime(2025, 3, 2) + timedelta(minutes=i))
+        for i in range(3)
+    ])
+    await heroku_session.commit()
+    assert await search_service.refresh_index(heroku_session, db_session) == 3
+
+    ids = [hit.message_id for hit in first]
+    while cursor is not None:
+        page, cursor = await search_service.search(
+            db_session, "pass*", limit=2, cursor=cursor
+        )
+        ids += [hit.message_id for hit in page]
+    # The reweighting makes the order across pages approximate (a hit near the page
+    # boundary may repeat), but nothing indexed after the first page shows up
+    assert set(ids) == {"m0", "m1", "m4"}
+
+
+def test_match_expression_neutralises_fts_syntax():
+    expression = search_service.match_expression('foo OR "bar" baz*')
+    assert expression == '"foo" "OR" """bar""" "baz"*'
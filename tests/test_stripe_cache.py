@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.services.stripe_cache import (
+    CUSTOMER,
+    INVOICES,
+    CacheEntry,
+    MemoryLRUBackend,
+    SQLiteBackend,
+    StripeCache,
+)
+
+TTLS = {CUSTOMER: 60, INVOICES: 60}
+
+
+def _counting_fetch(value):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return value
+
+    return fetch, calls
+
+
+async def test_fresh_entry_is_served_without_fetching():
+    cache = StripeCache(MemoryLRUBackend(10), TTLS, stale_seconds=60)
+    fetch, calls = _counting_fetch({"id": "cus_1"})
+    assert await cache.get_or_fetch("cus_1", CUSTOMER, fetch) == {"id": "cus_1"}
+    assert await cache.get_or_fetch("cus_1", CUSTOMER, fetch) == {"id": "cus_1"}
+    assert len(calls) == 1
+
+
+async def test_concurrent_misses_share_one_fetch():
+    cache = StripeCache(MemoryLRUBackend(10), TTLS, stale_seconds=60)
+    fetch, calls = _counting_fetch({"id": "cus_1"})
+    results = await asyncio.gather(
+        *(cache.get_or_fetch("cus_1", CUSTOMER, fetch) for _ in range(5))
+    )
+    assert results == [{"id": "cus_1"}] * 5
+    assert len(calls) == 1
+
+
+async def test_stale_entry_is_served_while_revalidating():
+    backend = MemoryLRUBackend(10)
+    cache = StripeCache(backend, TTLS, stale_seconds=600)
+    await backend.set("customer:cus_1", CacheEntry({"v": "old"}, time.time() - 120))
+    fetch, calls = _counting_fetch({"v": "new"})
+
+    assert await cache.get_or_fetch("cus_1", CUSTOMER, fetch) == {"v": "old"}
+    await asyncio.sleep(0.05)
+    assert len(calls) == 1
+    assert await cache.get_or_fetch("cus_1", CUSTOMER, fetch) == {"v": "new"}
+
+
+async def test_expired_entry_is_refetched():
+    backend = MemoryLRUBackend(10)
+    cache = StripeCache(backend, TTLS, stale_seconds=10)
+    await backend.set("customer:cus_1", CacheEntry({"v": "old"}, time.time() - 3600))
+    fetch, _ = _counting_fetch({"v": "new"})
+    assert await cache.get_or_fetch("cus_1", CUSTOMER, fetch) == {"v": "new"}
+
+
+async def test_lru_backend_evicts_least_recently_used():
+    backend = MemoryLRUBackend(2)
+    await backend.set("a", CacheEntry(1, 0))
+    await backend.set("b", CacheEntry(2, 0))
+    await backend.get("a")
+    await backend.set("c", CacheEntry(3, 0))
+    assert await backend.get("b") is None
+    assert (await backend.get("a")).value == 1
+
+
+async def test_sqlite_backend_round_trip(test_engine, db_session):
+    backend = SQLiteBackend(async_sessionmaker(test_engine, expire_on_commit=False))
+    cache = StripeCache(backend, TTLS, stale_seconds=60)
+    fetch, calls = _counting_fetch({"data": [{"id": "in_1"}]})
+    await cache.get_or_fetch("cus_1", INVOICES, fetch)
+    assert (await backend.get("invoices:cus_1")).value == {"data": [{"id": "in_1"}]}
+
+    await cache.invalidate("cus_1")
+    assert await backend.get("invoices:cus_1") is None
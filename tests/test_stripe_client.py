@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.stripe_client import StripeAPIError, StripeClient
+
+
+def _client(handler, **kwargs) -> StripeClient:
+    return StripeClient(
+        api_key="sk_test_x",
+        base_url="http://stripe.test",
+        backoff_seconds=0,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+async def test_retries_rate_limited_requests():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(429, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json={"id": "cus_1", "object": "customer"})
+
+    client = _client(handler)
+    try:
+        assert (await client.retrieve_customer("cus_1"))["id"] == "cus_1"
+    finally:
+        await client.aclose()
+    assert len(calls) == 3
+    assert calls[0].headers["Authorization"] == "Bearer sk_test_x"
+    assert calls[0].url.path == "/v1/customers/cus_1"
+
+
+async def test_gives_up_after_max_retries():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, json={"error": {"message": "slow down"}})
+
+    client = _client(handler, max_retries=1)
+    try:
+        with pytest.raises(StripeAPIError) as exc_info:
+            await client.list_invoices("cus_1")
+    finally:
+        await client.aclose()
+    assert exc_info.value.status_code == 429
+
+
+async def test_concurrency_is_bounded():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"data": [], "has_more": False})
+
+    client = _client(handler, max_concurrency=2)
+    try:
+        await asyncio.gather(
+            *(client.list_payment_methods(f"cus_{i}") for i in range(6))
+        )
+    finally:
+        await client.aclose()
+    assert peak == 2
+
+
+async def test_iterate_list_follows_pages():
+    pages = {
+        None: {"data": [{"id": "in_1"}, {"id": "in_2"}], "has_more": True},
+        "in_2": {"data": [{"id": "in_3"}], "has_more": False},
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=pages[request.url.params.get("starting_after")])
+
+    client = _client(handler)
+    try:
+        invoices = client.iterate_list("/v1/invoices", page_size=2)
+        ids = [obj["id"] async for obj in invoices]
+    finally:
+        await client.aclose()
+    assert ids == ["in_1", "in_2", "in_3"]
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.heroku import HAccount, HStripeSubscription
+from app.models.stripe_mirror import StripeMirrorBackfill
+from app.services import stripe_mirror_service
+
+SECRET = "whsec_test"
+
+
+@pytest.fixture(autouse=True)
+def webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings, "stripe_webhook_secret", SECRET)
+
+
+def _event(event_type: str, obj: dict, created: int = 1_700_000_000) -> dict:
+    return {"id": f"evt_{created}", "type": event_type, "created": created,
+            "data": {"object": obj}}
+
+
+async def _post(client: AsyncClient, event: dict, secret: str = SECRET):
+    payload = json.dumps(event)
+    ts = int(time.time())
+    signed = f"{ts}.{payload}".encode()
+    sig = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return await client.post(
+        "/stripe/webhook",
+        content=payload,
+        headers={
+            "Stripe-Signature": f"t={ts},v1={sig}",
+            "Content-Type": "application/json",
+        },
+    )
+
+
+CUSTOMER = {"id": "cus_1", "object": "customer", "email": "a@acme.test",
+            "name": "Acme", "created": 1_600_000_000}
+
+
+async def test_rejects_bad_signature(client: AsyncClient):
+    response = await _post(client, _event("customer.created", CUSTOMER), secret="wrong")
+    assert response.status_code == 400
+
+
+async def test_mirrors_events_and_ignores_stale_deliveries(
+    client: AsyncClient, db_session: AsyncSession
+):
+    newer = {**CUSTOMER, "email": "new@acme.test"}
+    response = await _post(client, _event("customer.updated", newer, 200))
+    assert response.status_code == 200
+    # An older event delivered late must not overwrite the newer copy
+    await _post(client, _event("customer.created", CUSTOMER, 100))
+    for i, created in enumerate((1_700_000_000, 1_700_100_000, 1_700_200_000)):
+        invoice = {"id": f"in_{i}", "object": "invoice", "customer": "cus_1",
+                   "created": created, "amount_paid": 1000, "currency": "gbp",
+                   "status": "paid"}
+        await _post(client, _event("invoice.paid", invoice))
+
+    # Webhooks alone don't make the mirror complete for a customer
+    assert await stripe_mirror_service.read_customer(db_session, "cus_1") is None
+    await stripe_mirror_service.mark_backfilled(db_session, "cus_1")
+    await db_session.commit()
+
+    customer, pms, invoices, has_more = await stripe_mirror_service.read_customer(
+        db_session, "cus_1", invoice_limit=2
+    )
+    assert customer["email"] == "new@acme.test"
+    assert pms == []
+    assert [i["id"] for i in invoices] == ["in_2", "in_1"]
+    assert has_more
+
+    _, _, invoices, has_more = await stripe_mirror_service.read_customer(
+        db_session, "cus_1", invoice_limit=2, invoices_starting_after="in_1"
+    )
+    assert [i["id"] for i in invoices] == ["in_0"]
+    assert not has_more
+
+    _, _, invoices, has_more = await stripe_mirror_service.read_customer(
+        db_session, "cus_1", invoices_starting_after="in_unknown"
+    )
+    assert (invoices, has_more) == ([], False)
+
+
+async def test_mirror_expires_without_webhooks(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch
+):
+    await _post(client, _event("customer.created", CUSTOMER))
+    await stripe_mirror_service.mark_backfilled(db_session, "cus_1")
+    await db_session.commit()
+    backfill = await db_session.get(StripeMirrorBackfill, "cus_1")
+    backfill.backfilled_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    await db_session.commit()
+
+    # Webhooks keep the mirror current, however long ago the sync ran
+    assert await stripe_mirror_service.read_customer(db_session, "cus_1") is not None
+    # Without them the two-hour-old sync is too old to trust
+    monkeypatch.setattr(settings, "stripe_webhook_secret", None)
+    assert await stripe_mirror_service.read_customer(db_session, "cus_1") is None
+    monkeypatch.setattr(settings, "stripe_mirror_max_age_seconds", 3 * 3600)
+    assert await stripe_mirror_service.read_customer(db_session, "cus_1") is not None
+
+
+async def test_account_stripe_reads_from_mirror(
+    heroku_client: AsyncClient,
+    heroku_session: AsyncSession,
+    db_session: AsyncSession,
+    user_token,
+):
+    heroku_session.add_all([
+        HAccount(id=1, account_organisation="Acme", account_unique_id="acme"),
+        HStripeSubscription(id=1, account_unique_id="acme",
+                            stripe_subscription_id="sub_1", stripe_customer_id="cus_1"),
+    ])
+    await heroku_session.commit()
+    await _post(heroku_client, _event("customer.created", CUSTOMER))
+    card = {"id": "pm_1", "object": "payment_method", "customer": "cus_1",
+            "card": {"brand": "visa", "last4": "4242",
+                     "exp_month": 1, "exp_year": 2030}}
+    await _post(heroku_client, _event("payment_method.attached", card))
+    await stripe_mirror_service.mark_backfilled(db_session, "cus_1")
+    await db_session.commit()
+
+    response = await heroku_client.get(
+        "/accounts/acme/stripe", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["customer"]["email"] == "a@acme.test"
+    assert data["payment_methods"][0]["last4"] == "4242"
+
+
+async def test_account_stripe_skips_mirror_until_backfilled(
+    heroku_client: AsyncClient, heroku_session: AsyncSession, user_token
+):
+    heroku_session.add_all([
+        HAccount(id=1, account_organisation="Acme", account_unique_id="acme"),
+        HStripeSubscription(id=1, account_unique_id="acme",
+                            stripe_subscription_id="sub_1", stripe_customer_id="cus_1"),
+    ])
+    await heroku_session.commit()
+    # Only the customer has been mirrored, by a webhook; its invoices are unknown
+    await _post(heroku_client, _event("customer.created", CUSTOMER))
+
+    response = await heroku_client.get(
+        "/accounts/acme/stripe", headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 200
+    # Stripe isn't configured in tests, so the miss falls through to no live data
+    # rather than an incomplete billing page from the mirror
+    assert response.json()["customer"] is None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.heroku import HStripeSubscription
+from app.models.stripe_mirror import (
+    StripeMirrorObject,
+    StripeSyncCheckpoint,
+    StripeSyncFailure,
+)
+from app.services.stripe_client import StripeClient
+from app.services.stripe_mirror_service import read_customer
+from app.sync_stripe import JOB_NAME, run
+
+
+def _stripe_stub(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path.startswith("/v1/customers/"):
+        cid = path.rsplit("/", 1)[1]
+        return httpx.Response(200, json={"id": cid, "object": "customer", "created": 1})
+    cid = request.url.params["customer"]
+    if path == "/v1/invoices":
+        invoices = [
+            {"id": f"in_{cid}_{i}", "object": "invoice", "customer": cid, "created": i}
+            for i in range(3)
+        ]
+        return httpx.Response(200, json={"data": invoices, "has_more": False})
+    return httpx.Response(200, json={"data": [], "has_more": False})
+
+
+async def test_sync_writes_mirror_and_resumes_from_checkpoint(
+    heroku_session: AsyncSession, test_engine, db_session: AsyncSession
+):
+    heroku_session.add_all([
+        HStripeSubscription(id=i, stripe_subscription_id=f"sub_{i}",
+                            stripe_customer_id=f"cus_{i}")
+        for i in range(1, 4)
+    ])
+    await heroku_session.commit()
+    heroku_factory = async_sessionmaker(heroku_session.bind, expire_on_commit=False)
+    local_factory = async_sessionmaker(test_engine, expire_on_commit=False)
+    client = StripeClient("sk_test", base_url="http://stripe.test",
+                          transport=httpx.MockTransport(_stripe_stub))
+    try:
+        assert await run(heroku_factory, local_factory, client, batch_size=2) == 12
+        # Nothing left past the checkpoint
+        assert await run(heroku_factory, local_factory, client, batch_size=2) == 0
+    finally:
+        await client.aclose()
+
+    checkpoint = await db_session.get(StripeSyncCheckpoint, JOB_NAME)
+    assert (checkpoint.last_subscription_id, checkpoint.objects_synced) == (3, 12)
+    count = await db_session.scalar(
+        select(func.count()).select_from(StripeMirrorObject)
+    )
+    assert count == 12
+    # Synced customers are served from the mirror
+    _, _, invoices, _ = await read_customer(db_session, "cus_1")
+    assert len(invoices) == 3
+
+
+async def test_sync_does_not_checkpoint_past_a_failed_customer(
+    heroku_session: AsyncSession, test_engine, db_session: AsyncSession
+):
+    heroku_session.add_all([
+        HStripeSubscription(id=i, stripe_subscription_id=f"sub_{i}",
+                            stripe_customer_id=f"cus_{i}")
+        for i in range(1, 5)
+    ])
+    await heroku_session.commit()
+    heroku_factory = async_sessionmaker(heroku_session.bind, expire_on_commit=False)
+    local_factory = async_sessionmaker(test_engine, expire_on_commit=False)
+    failing = {"cus_2"}
+
+    def flaky_stub(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/customers/cus_2" and "cus_2" in failing:
+            return httpx.Response(503, json={"error": {"message": "Try again later"}})
+        return _stripe_stub(request)
+
+    client = StripeClient("sk_test", base_url="http://stripe.test",
+                          transport=httpx.MockTransport(flaky_stub))
+    try:
+        # cus_1 and cus_3 succeed, but the run stops at the batch with the failure
+        assert await run(heroku_factory, local_factory, client, batch_size=3) == 8
+        checkpoint = await db_session.get(StripeSyncCheckpoint, JOB_NAME)
+        assert checkpoint.last_subscription_id == 1
+
+        failing.clear()
+        # The next run retries from cus_2
+        assert await run(heroku_factory, local_factory, client, batch_size=3) == 12
+    finally:
+        await client.aclose()
+
+    await db_session.refresh(checkpoint)
+    assert checkpoint.last_subscription_id == 4
+    count = await db_session.scalar(
+        select(func.count()).select_from(StripeMirrorObject)
+    )
+    assert count == 16
+
+
+async def test_sync_records_and_skips_a_permanently_failing_customer(
+    heroku_session: AsyncSession, test_engine, db_session: AsyncSession
+):
+    heroku_session.add_all([
+        HStripeSubscription(id=i, stripe_subscription_id=f"sub_{i}",
+                            stripe_customer_id=f"cus_{i}")
+        for i in range(1, 5)
+    ])
+    await heroku_session.commit()
+    heroku_factory = async_sessionmaker(heroku_session.bind, expire_on_commit=False)
+    local_factory = async_sessionmaker(test_engine, expire_on_commit=False)
+
+    def deleted_stub(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/customers/cus_2":
+            error = {"message": "No such customer: 'cus_2'", "code": "resource_missing"}
+            return httpx.Response(404, json={"error": error})
+        return _stripe_stub(request)
+
+    client = StripeClient("sk_test", base_url="http://stripe.test",
+                          transport=httpx.MockTransport(deleted_stub))
+    try:
+        # cus_2 never succeeds, but the run goes on past it
+        assert await run(heroku_factory, local_factory, client, batch_size=3) == 12
+        assert await run(heroku_factory, local_factory, client, batch_size=3) == 0
+    finally:
+        await client.aclose()
+
+    checkpoint = await db_session.get(StripeSyncCheckpoint, JOB_NAME)
+    assert checkpoint.last_subscription_id == 4
+    failure = await db_session.get(StripeSyncFailure, "cus_2")
+    assert (failure.subscription_id, failure.status_code, failure.code) == (
+        2, 404, "resource_missing"
+    )
+    assert await read_customer(db_session, "cus_2") is None